@@ -1,13 +1,85 @@
 from core.stt.stt import STT
-from core.tts.tts import TTS
+from core.tts.registry import resolve_model_name
+from core.tts.scheduler import tts_scheduler
+from core.tts.cache import tts_cache
+from core.tts.chunker import split_for_synthesis
+from core.utils.resample_utils import normalize_pcm
+from dotenv import load_dotenv
+import asyncio
+import os
 import io
 
+load_dotenv(dotenv_path="ops/.env")
+
+# Chunks synthesised ahead of the one being sent
+TTS_STREAM_LOOKAHEAD = int(os.getenv("TTS_STREAM_LOOKAHEAD", "2"))
+
 async def speech_to_text(audio_buffer: io.BytesIO, language: str):
     stt = STT(language=language)
-    async for partial_transcription in stt.transcribe_stream(audio_buffer):
-        yield partial_transcription
+    try:
+        async for partial_transcription in stt.transcribe_stream(memoryview(normalize_pcm(audio_buffer.getvalue(), stt.sample_rate))):
+            yield partial_transcription
+    finally:
+        await stt.close()
+
+# Cache keys being synthesised right now, so concurrent requests for one phrase share the work
+_in_flight = {}  # key -> {"task": synthesis task, "waiters": callers awaiting it}
+
+async def _synthesize_and_cache(key: str, text: str, base_model: str, language: str, session: str):
+    audio = await tts_scheduler.speech(text, base_model, language, session)
+    if audio:
+        await tts_cache.set(key, audio)
+    return audio
+
+def _forget_in_flight(key: str, entry: dict):
+    if _in_flight.get(key) is entry:
+        del _in_flight[key]
+
+async def text_to_speech(
+    text: str, base_model: str, language: str, voice: str = "default", session: str = None
+) -> bytes:
+    """session identifies the caller so the batch scheduler can share model time fairly."""
+    if not tts_cache.cacheable(text):
+        return await tts_scheduler.speech(text, base_model, language, session)
+
+    key = tts_cache.make_key(resolve_model_name(base_model, language), language, voice, text)
+    audio = await tts_cache.get(key)
+    if audio is not None:
+        return audio
+
+    entry = _in_flight.get(key)
+    if entry is None:
+        task = asyncio.ensure_future(_synthesize_and_cache(key, text, base_model, language, session))
+        entry = _in_flight[key] = {"task": task, "waiters": 0}
+        task.add_done_callback(lambda _: _forget_in_flight(key, entry))
+    entry["waiters"] += 1
+    try:
+        # Shielded so one caller going away does not cancel the result for the others
+        return await asyncio.shield(entry["task"])
+    finally:
+        entry["waiters"] -= 1
+        if not entry["waiters"] and not entry["task"].done():
+            # The last caller went away; stop the synthesis, which also withdraws it from the scheduler
+            _forget_in_flight(key, entry)
+            entry["task"].cancel()
 
-def text_to_speech(text: str, base_model: str, language: str) -> bytes:
-    if base_model.startswith("ai4bharat"):
-        base_model = base_model + "-" + language
-    return TTS(model_name=base_model, language=language).speech(text)
+async def stream_text_to_speech(text: str, base_model: str, language: str, session: str = None):
+    """
+    Synthesise text sentence by sentence and yield (index, total, chunk_text,
+    audio) in order as each chunk is ready. Up to TTS_STREAM_LOOKAHEAD later
+    chunks are synthesised while earlier ones are sent, so playback can start
+    after the first sentence.
+    """
+    chunks = split_for_synthesis(text)
+    tasks = []
+    try:
+        for index, chunk in enumerate(chunks):
+            while len(tasks) < min(len(chunks), index + 1 + TTS_STREAM_LOOKAHEAD):
+                tasks.append(asyncio.create_task(
+                    text_to_speech(chunks[len(tasks)], base_model, language, session=session)
+                ))
+            yield index, len(chunks), chunk, await tasks[index]
+    finally:
+        # The client may disconnect mid-message; do not keep synthesising for it
+        for task in tasks:
+            task.cancel()
@@ -1,12 +1,23 @@
 import json
+import os
+import asyncio
+import traceback
 from core.llm.llm import LLM
+from core.llm.cache import llm_cache
 from groq import Groq
 from core.models.instructor import (
     ProcessedText, 
-    ProcessingDecision
+    ProcessingDecision,
+    ProcessedCaption
 )
 from core.utils.instructor_utils import patch_client
 
+# "combined" (one call), "sequential" (decision then processing) or "speculative"
+PROCESSING_MODE = os.getenv("LLM_PROCESSING_MODE", "combined")
+
+# LLM calls each flow makes for one segment, charged to the caller's budget as they start
+MODE_CALLS = {"combined": 1, "sequential": 2, "speculative": 3}
+
 with open("prompts/concise.txt", "r") as f:
     concise_prompt = f.read()
 
@@ -19,31 +30,151 @@ with open("prompts/decision.txt", "r") as f:
 with open("prompts/correction.txt", "r") as f:
     correction_prompt = f.read()
 
-def concise_transcription(transcription: str, language: str) -> str:
+with open("prompts/combined.txt", "r") as f:
+    combined_prompt = f.read()
+
+async def concise_transcription(transcription: str, language: str) -> str:
     prompt = concise_prompt.format(transcription)
-    response = LLM(language).inference(prompt, ProcessedText)
+    response = await LLM(language).inference(prompt, ProcessedText)
     return response.processed_text
 
-def highlight_keywords(transcription: str, language: str) -> str:
+async def highlight_keywords(transcription: str, language: str) -> str:
     prompt = highlight_prompt.format(transcription)
-    response = LLM(language).inference(prompt, ProcessedText)
+    response = await LLM(language).inference(prompt, ProcessedText)
     return response.processed_text
 
-def should_summarize(transcription: str, language: str) -> bool:
+async def should_summarize(transcription: str, language: str) -> bool:
     prompt = decision_prompt.format(transcription)
-    response = LLM(language).inference(prompt, ProcessingDecision)
+    response = await LLM(language).inference(prompt, ProcessingDecision)
     return response.decision
 
-def correct_transcription(transcription: str, base_model: str) -> str:
+async def correct_transcription(transcription: str, base_model: str) -> str:
     prompt = correction_prompt.format(transcription)
-    response = LLM(base_model).inference(prompt, ProcessedText)
+    response = await LLM(base_model).inference(prompt, ProcessedText)
     return response.processed_text
 
-def process_transcription(transcription: str, language: str) -> str:
-    if should_summarize(transcription, language):
-        response = concise_transcription(transcription, language)
+async def process_transcription_sequential(transcription: str, language: str) -> dict:
+    if await should_summarize(transcription, language):
+        response = await concise_transcription(transcription, language)
         type = "concise"
     else:
-        response = highlight_keywords(transcription, language)
+        response = await highlight_keywords(transcription, language)
         type = "highlight"
-    return {"text": response, "type": type} if response else {} 
\ No newline at end of file
+    return {"text": response, "type": type} if response else {}
+
+async def process_transcription_combined(transcription: str, language: str) -> dict:
+    prompt = combined_prompt.format(transcription)
+    response = await LLM(language).inference(prompt, ProcessedCaption)
+    type = "concise" if response.decision else "highlight"
+    return {"text": response.processed_text, "type": type} if response.processed_text else {}
+
+async def process_transcription_speculative(transcription: str, language: str) -> dict:
+    """
+    Start the decision and both processing branches at once, then keep the
+    branch the decision picks and cancel the other one.
+    """
+    decision = asyncio.create_task(should_summarize(transcription, language))
+    branches = {
+        "concise": asyncio.create_task(concise_transcription(transcription, language)),
+        "highlight": asyncio.create_task(highlight_keywords(transcription, language)),
+    }
+
+    try:
+        type = "concise" if await decision else "highlight"
+        for name, future in branches.items():
+            if name != type:
+                future.cancel()
+
+        response = await branches[type]
+        return {"text": response, "type": type} if response else {}
+    finally:
+        # Also runs when the caller is cancelled, so no call keeps using LLM quota after that
+        for future in (decision, *branches.values()):
+            if not future.done():
+                future.cancel()
+
+def _charge(charge, mode: str):
+    if charge is not None:
+        charge(MODE_CALLS[mode])
+
+async def process_transcription(transcription: str, language: str, mode: str = None, charge=None) -> dict:
+    """
+    Processed text for a segment, or {} if there is none. charge, when given,
+    is called with the number of LLM calls each time calls are made, so
+    cache hits are free and fallbacks are paid for.
+    """
+    mode = mode or PROCESSING_MODE
+
+    # The key covers every prompt the mode may use, so editing a prompt invalidates old results
+    prompts = [combined_prompt] if mode == "combined" else []
+    template = "\n".join([mode] + prompts + [decision_prompt, concise_prompt, highlight_prompt])
+    cache_key = llm_cache.make_key(template, LLM(language).cache_id(), transcription)
+    cached = await llm_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    result = await _process_transcription(transcription, language, mode, charge)
+    if result:
+        await llm_cache.set(cache_key, result)
+    return result
+
+async def stream_process_transcription(transcription: str, language: str, charge=None):
+    """
+    Yield {"text", "type", "final"} dicts while the combined response streams
+    in. Partials carry the processed text received so far; the last item has
+    final=True. Cached results are yielded once as final. charge works as in
+    process_transcription.
+    """
+    template = "\n".join(["combined", combined_prompt, decision_prompt, concise_prompt, highlight_prompt])
+    cache_key = llm_cache.make_key(template, LLM(language).cache_id(), transcription)
+    cached = await llm_cache.get(cache_key)
+    if cached is not None:
+        yield {**cached, "final": True}
+        return
+
+    prompt = combined_prompt.format(transcription)
+    text = ""
+    type = None
+    _charge(charge, "combined")
+    try:
+        async for partial in LLM(language).stream_inference(prompt, ProcessedCaption):
+            # The decision field comes first, so wait for it before sending text
+            if partial.decision is None:
+                continue
+            type = "concise" if partial.decision else "highlight"
+            if partial.processed_text and partial.processed_text != text:
+                text = partial.processed_text
+                yield {"text": text, "type": type, "final": False}
+    except Exception:
+        traceback.print_exc()
+        if text:
+            # The client already shows this text; close it as final rather than dropping the connection.
+            # It is not cached because the response was cut short.
+            yield {"text": text, "type": type, "final": True}
+            return
+        # Nothing was streamed, so fall back to the regular pipeline
+        result = await process_transcription(transcription, language, charge=charge)
+        if result:
+            yield {**result, "final": True}
+        return
+
+    if text:
+        result = {"text": text, "type": type}
+        await llm_cache.set(cache_key, result)
+        yield {**result, "final": True}
+
+async def _process_transcription(transcription: str, language: str, mode: str, charge=None) -> dict:
+    if mode == "speculative":
+        _charge(charge, "speculative")
+        return await process_transcription_speculative(transcription, language)
+    if mode == "combined":
+        _charge(charge, "combined")
+        try:
+            result = await process_transcription_combined(transcription, language)
+            if result:
+                return result
+        except Exception:
+            # Fall back to the two-step flow if the combined response cannot be produced
+            traceback.print_exc()
+    _charge(charge, "sequential")
+    return await process_transcription_sequential(transcription, language)
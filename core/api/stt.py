@@ -4,29 +4,41 @@ from fastapi import (
     WebSocketDisconnect, 
     HTTPException,
     APIRouter,
-    Depends
+    Depends,
+    Query,
+    Request
 )
 from core.models.stt import (
     TranscriptionResponse,
     SingleTranscriptionResponse,
-    WebSocketResponse
+    TranscriptionSearchResponse,
+    WebSocketResponse,
+    AudioStreamReady,
+    AdmissionStatus
 )
 from core.utils.speech_utils import (
     decode_audio_data,
-    generate_message_id
+    generate_message_id,
+    negotiate_audio_format
 )
+from core.utils.websocket_utils import receive_frame
+from core.utils.admission_utils import admission_controller, connection_identity, session_key, close_overloaded
+from core.utils.pagination_utils import encode_cursor, decode_cursor
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import tuple_
 from sqlmodel import select
+from typing import Optional
 from core.models.db import TranscriptionDB
 from core.db.database import get_session
-from core.utils.executor_utils import executor
-from core.ai.speech import speech_to_text
-from core.ai.text import process_transcription
-from core.db.redis_client import redis_client
+from core.db.writer import db_writer
+from core.db.search import search_transcriptions
+from core.stt.session import TranscriptionSession
+from core.stt.segmenter import Segmenter
+from core.ai.text import process_transcription, stream_process_transcription
+from core.db.session_store import transcript_store
 import traceback
 import asyncio
 import json
-import io
 import os
 import time
 
@@ -38,10 +50,68 @@ router = APIRouter()
 
 user_sessions = {}
 
+# Formats accepted for binary audio frames, the first one is the default
+STT_CODECS = ["pcm_s16le", "wav", "opus", "webm", "ogg"]
+STT_SAMPLE_RATES = [16000, 8000, 11025, 22050, 24000, 32000, 44100, 48000]
+
+# How often results from streaming providers are collected while no audio arrives
+STT_POLL_INTERVAL = float(os.getenv("STT_POLL_INTERVAL", "0.25"))
+
+# History pages; the large text columns are only read when asked for in `fields`
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "20"))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "100"))
+HISTORY_TEXT_FIELDS = ["transcription", "processed_text"]
+
 @router.get("/v1/transcriptions", response_model=TranscriptionResponse)
-async def get_transcriptions(session: AsyncSession = Depends(get_session)):
-    transcriptions = await session.execute(select(TranscriptionDB))
-    return {"transcriptions": transcriptions.scalars().all()}
+async def get_transcriptions(
+    user_id: str,
+    language: Optional[str] = None,
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: str = "",
+    session: AsyncSession = Depends(get_session)
+):
+    """A user's transcriptions, newest first, one page at a time."""
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = set(requested) - set(HISTORY_TEXT_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    columns = [TranscriptionDB.id, TranscriptionDB.language, TranscriptionDB.word_count, TranscriptionDB.created_at]
+    columns += [getattr(TranscriptionDB, field) for field in HISTORY_TEXT_FIELDS if field in requested]
+
+    query = select(*columns).where(TranscriptionDB.user_id == user_id)
+    if language:
+        query = query.where(TranscriptionDB.language == language)
+    if cursor:
+        try:
+            created_at, last_id = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        # Keyset pagination: continue after the last row of the previous page, served from the index
+        query = query.where(tuple_(TranscriptionDB.created_at, TranscriptionDB.id) < tuple_(created_at, last_id))
+    query = query.order_by(TranscriptionDB.created_at.desc(), TranscriptionDB.id.desc()).limit(limit + 1)
+
+    rows = (await session.execute(query)).mappings().all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return {"transcriptions": rows, "next_cursor": next_cursor}
+
+# Declared before /v1/transcriptions/{transcription_id} so "search" is not taken for an id
+@router.get("/v1/transcriptions/search", response_model=TranscriptionSearchResponse)
+async def search_transcription_history(
+    user_id: str,
+    q: str = Query(..., min_length=1, max_length=500),
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    session: AsyncSession = Depends(get_session)
+):
+    """Full-text search over a user's transcriptions, best match first."""
+    results = await search_transcriptions(session, user_id, q, limit + 1, offset)
+    next_offset = offset + limit if len(results) > limit else None
+    return {"results": results[:limit], "next_offset": next_offset}
 
 # API endpoint to retrieve a specific transcription by ID
 @router.get("/v1/transcriptions/{transcription_id}", response_model=SingleTranscriptionResponse)
@@ -55,187 +125,276 @@ async def get_transcription(transcription_id: int, session: AsyncSession = Depen
 async def websocket_transcribe_and_process(websocket: WebSocket):
     await websocket.accept()
 
-    full_transcription = ""
-    processing_candidate = ""
-    processed_transcription = ""
-    word_count = 0
-    audio_buffer = io.BytesIO()
-    WORD_THRESHOLD = 30
+    # The cookie's user_id, when there is one, takes the place of the one sent in messages
+    authenticated_user_id, quota_key = connection_identity(websocket)
+    admission = admission_controller.admit(quota_key)
+    if admission is None:
+        await close_overloaded(websocket, "Too many active sessions, try again later")
+        return
+
+    pending_transcription = []  # Raw segments not yet appended to the session store
+    stored_user_id = None  # The user whose session state this connection has started writing
     message_id = None
+    user_id = authenticated_user_id or "default_user"
+    selected_language = "en"
+    degraded = False  # Out of LLM budget: raw transcription only
+    stt_session = None
+    segmenter = Segmenter()
+    audio_format = {"codec": STT_CODECS[0], "sample_rate": STT_SAMPLE_RATES[0]}
+    stream_processed = os.getenv("LLM_STREAMING", "false").lower() == "true"
+
+    async def store_segments(processed_segments: list = ()):
+        nonlocal pending_transcription, stored_user_id
+
+        # Only the new segments go to Redis; the first write for a user replaces older unsaved state
+        await transcript_store.append(
+            session_key(authenticated_user_id, quota_key, user_id),
+            pending_transcription,
+            list(processed_segments),
+            reset=stored_user_id != user_id,
+        )
+        pending_transcription = []
+        stored_user_id = user_id
+
+    async def set_degraded(value: bool):
+        nonlocal degraded
+
+        if value == degraded:
+            return
+        degraded = value
+        if degraded:
+            status = AdmissionStatus(status="degraded", reason="LLM rate limit reached, sending raw transcription only")
+        else:
+            status = AdmissionStatus(status="normal")
+        await websocket.send_text(
+            status.model_dump_json()
+        )
+
+    async def process_candidate(reason: str, send: bool = True, language: str = None):
+        nonlocal message_id
+
+        language = language or selected_language
+        processing_candidate = segmenter.pop(reason)
+        if not processing_candidate:
+            return
+
+        # Processing charges each LLM call it makes, including fallbacks, so cache hits are free
+        if not admission.llm_allowed():
+            # The raw text was already sent; keep it for the session and skip processing
+            if send:
+                await set_degraded(True)
+            await store_segments()
+            message_id = None
+            return
+        if send:
+            await set_degraded(False)
+
+        if stream_processed and send:
+            processed_result = {}
+            response_id = message_id or generate_message_id()
+            # Every partial reuses the message_id so the client replaces the caption in place
+            async for partial in stream_process_transcription(processing_candidate, language, charge=admission.charge_llm_calls):
+                processed_result = partial
+                response = WebSocketResponse(
+                    message_id=response_id,
+                    text=partial["text"],
+                    type=partial["type"],
+                    is_final=partial["final"]
+                )
+                await websocket.send_text(
+                    response.model_dump_json()
+                )
+            send = False
+        else:
+            processed_result = await process_transcription(processing_candidate, language, charge=admission.charge_llm_calls)
+        if "text" not in processed_result:
+            return
+
+        await store_segments([processed_result["text"]])
+
+        if send:
+            response = WebSocketResponse(
+                message_id=message_id or generate_message_id(),
+                text=processed_result["text"],
+                type=processed_result["type"]
+            )
+            await websocket.send_text(
+                response.model_dump_json()
+            )
+
+        # Reset message_id for the next round of transcription
+        message_id = None
+
+    async def handle_partial(partial_transcription: str, language: str = None):
+        nonlocal message_id
+
+        if not message_id:
+            message_id = generate_message_id()
+        # Check for <EOF> signal
+        if partial_transcription == "<EOF>":
+            # The provider saw the end of an utterance, so close the segment
+            await process_candidate("end_of_speech", language=language)
+            return
+
+        pending_transcription.append(partial_transcription)
+        segmenter.add(partial_transcription)
+
+        response = WebSocketResponse(
+            message_id=message_id,
+            text=partial_transcription,
+            type="transcription"
+        )
+        await websocket.send_text(
+            response.model_dump_json()
+        )
+
+        reason = segmenter.ready(stt_session.trailing_silence)
+        if reason:
+            await process_candidate(reason, language=language)
 
     try:
         while True:
             start_time = time.time()
-            data = await websocket.receive_text()
+            # Wake up when the latency budget of the waiting text runs out, even without new audio,
+            # and regularly for streaming providers whose results arrive between audio frames
+            timeout = segmenter.time_until_deadline()
+            if stt_session is not None and stt_session.streaming:
+                timeout = STT_POLL_INTERVAL if timeout is None else min(timeout, STT_POLL_INTERVAL)
+            try:
+                data, audio_data = await asyncio.wait_for(receive_frame(websocket), timeout=timeout)
+            except asyncio.TimeoutError:
+                if stt_session is not None:
+                    for partial_transcription in stt_session.poll():
+                        await handle_partial(partial_transcription)
+                reason = segmenter.ready(stt_session.trailing_silence if stt_session else 0.0)
+                if reason:
+                    await process_candidate(reason)
+                continue
             receive_latency = time.time() - start_time
             print(f"Receive latency: {receive_latency:.4f} seconds")  # Log receive latency
 
-            message = json.loads(data)
+            # Binary frames carry raw audio in the negotiated format; text frames carry JSON
+            if data is not None:
+                message = json.loads(data)
 
-            user_id = message.get("user_id", "default_user")
+                if not authenticated_user_id:
+                    # Only names a session within this client's quota key; see session_key
+                    user_id = message.get("user_id", user_id)
 
-            if not user_id:
-                raise HTTPException(status_code=400, detail="User ID not provided")
-            
-            selected_language = message.get("language", "en")
-            
-            if "audio" in message:
-                audio_data = decode_audio_data(message)
-                audio_buffer.write(audio_data)
-
-                # Reset buffer position to the beginning
-                audio_buffer.seek(0)
-
-                async for partial_transcription in speech_to_text(audio_buffer, selected_language):
-
-                    if not message_id:
-                        message_id = generate_message_id()
-                    # Check for <EOF> signal
-                    if partial_transcription == "<EOF>":
-                        # Process the current candidate if EOF is detected
-                        if processing_candidate.strip():
-                            processed_result = await asyncio.get_event_loop().run_in_executor(
-                                executor, 
-                                process_transcription, 
-                                processing_candidate.strip(), 
-                                selected_language
-                            )
-                            if "text" in processed_result:
-                                processed_transcription += processed_result["text"] + " "
-                                processing_candidate = ""
-                                word_count = 0
-
-                                await redis_client.hset(f"transcription:{user_id}", mapping={
-                                    "transcription": full_transcription.strip(),
-                                    "processed_transcription": processed_transcription.strip()
-                                })
-
-                                response = WebSocketResponse(
-                                    message_id=message_id,
-                                    text=processed_result["text"],
-                                    type=processed_result["type"]
-                                )
-                                await websocket.send_text(
-                                    response.model_dump_json()
-                                )
-
-                                # Reset message_id for the next round of transcription
-                                message_id = None
-
-                        continue  # Skip the loop if EOF is detected
-
-                    full_transcription += partial_transcription + " "
-                    processing_candidate += partial_transcription + " "
-                    word_count += len(partial_transcription.split())
-
-                    response = WebSocketResponse(
-                        message_id=message_id,
-                        text=partial_transcription,
-                        type="transcription"
-                    )
+                if not user_id:
+                    raise HTTPException(status_code=400, detail="User ID not provided")
+                
+                selected_language = message.get("language", selected_language)
+
+                if message.get("type") == "start":
+                    audio_format = negotiate_audio_format(message, STT_CODECS, STT_SAMPLE_RATES)
                     await websocket.send_text(
-                        response.model_dump_json()
+                        AudioStreamReady(**audio_format).model_dump_json()
                     )
 
-                    if word_count >= WORD_THRESHOLD:
-                        processed_result = await asyncio.get_event_loop().run_in_executor(
-                            executor, 
-                            process_transcription, 
-                            processing_candidate.strip(), 
-                            selected_language
-                        )
-                        if "text" in processed_result:
-                            processed_transcription += processed_result["text"] + " "
-                            processing_candidate = ""
-                            word_count = 0
-
-                            await redis_client.hset(f"transcription:{user_id}", mapping={
-                                "transcription": full_transcription.strip(),
-                                "processed_transcription": processed_transcription.strip()
-                            })
-
-                            response = WebSocketResponse(
-                                message_id=message_id,
-                                text=processed_result["text"],
-                                type=processed_result["type"]
-                            )
-                            await websocket.send_text(
-                                response.model_dump_json()
-                            )
-
-                            # Reset message_id for the next round of transcription
-                            message_id = None
-
-                # Clear the buffer for the next chunk
-                audio_buffer = io.BytesIO()
+                if "stream" in message:
+                    stream_processed = bool(message["stream"])
+
+                if "segmentation" in message:
+                    rejected = segmenter.configure(message["segmentation"])
+                    if rejected:
+                        print(f"Ignoring invalid segmentation settings: {rejected}")
+
+                if "audio" in message:
+                    audio_data = decode_audio_data(message)
+
+            # One session per connection, rebuilt only if the client switches language or audio format
+            if (
+                stt_session is None
+                or stt_session.language != selected_language
+                or stt_session.codec != audio_format["codec"]
+                or stt_session.input_rate != audio_format["sample_rate"]
+            ):
+                if stt_session is not None:
+                    # Transcribe and process what the old session still buffers, in its own language
+                    old_language = stt_session.language
+                    try:
+                        async for partial_transcription in stt_session.transcribe_stream(flush=True):
+                            if partial_transcription != "<EOF>":
+                                await handle_partial(partial_transcription, language=old_language)
+                    finally:
+                        await stt_session.close()
+                        stt_session = None  # Already flushed, so the cleanup below skips it
+                    await process_candidate("session_change", language=old_language)
+                stt_session = TranscriptionSession(
+                    selected_language,
+                    codec=audio_format["codec"],
+                    input_rate=audio_format["sample_rate"],
+                )
+            
+            if audio_data and not admission.audio_allowed():
+                await close_overloaded(websocket, "Audio rate limit exceeded", admission.audio_retry_after())
+                break
 
-    except WebSocketDisconnect:
+            if audio_data:
+                received_seconds = stt_session.received_seconds
+                async for partial_transcription in stt_session.transcribe_stream(audio_data):
+                    await handle_partial(partial_transcription)
 
-        # Process any remaining transcription
-        if processing_candidate.strip():
-            processed_result = await asyncio.get_event_loop().run_in_executor(
-                executor, process_transcription, processing_candidate.strip(), selected_language
-            )
-            if processed_result:
-                processed_transcription += processed_result["text"] + " "
-                await redis_client.hset(f"transcription:{user_id}", mapping={
-                    "transcription": full_transcription.strip(),
-                    "processed_transcription": processed_transcription.strip()
-            })
+                admission.charge_audio(stt_session.received_seconds - received_seconds)
 
-    except Exception as e:
-        traceback.print_exc()
+                # A pause may have arrived with audio that produced no new words
+                reason = segmenter.ready(stt_session.trailing_silence)
+                if reason:
+                    await process_candidate(reason)
 
-        # Process any remaining transcription in case of an exception
-        if processing_candidate.strip():
-            processed_result = await asyncio.get_event_loop().run_in_executor(
-                executor, process_transcription, processing_candidate.strip(), selected_language
-            )
-            processed_transcription += processed_result.get("text") + " "
+    except WebSocketDisconnect:
+        print("Transcription client disconnected")
 
-        await redis_client.hset(f"transcription:{user_id}", mapping={
-            "transcription": full_transcription.strip(),
-            "processed_transcription": processed_transcription.strip()
-        })
+    except Exception as e:
+        traceback.print_exc()
 
     finally:
+        admission.release()
+
+        # Transcribe the audio still buffered in the session
+        if stt_session is not None:
+            try:
+                async for partial_transcription in stt_session.transcribe_stream(flush=True):
+                    if partial_transcription != "<EOF>":
+                        pending_transcription.append(partial_transcription)
+                        segmenter.add(partial_transcription)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                await stt_session.close()
+
         # Final processing before closing
-        if processing_candidate.strip():
-            processed_result = await asyncio.get_event_loop().run_in_executor(
-                executor, process_transcription, processing_candidate.strip(), selected_language
-            )
-            processed_transcription += processed_result.get("text") + " "
+        await process_candidate("closed", send=False)
+        print(f"Segmentation metrics: {segmenter.metrics()}")
 
-        await redis_client.hset(f"transcription:{user_id}", mapping={
-            "transcription": full_transcription.strip(),
-            "processed_transcription": processed_transcription.strip()
-        })
+        if pending_transcription:
+            await store_segments()
 
 @router.post("/v1/transcription/save")
-async def save_transcription(user_id: str, language: str, session: AsyncSession = Depends(get_session)):
+async def save_transcription(user_id: str, language: str, request: Request):
+    # The session is found the same way the WebSocket stored it
+    authenticated_user_id, quota_key = connection_identity(request)
+    key = session_key(authenticated_user_id, quota_key, user_id)
+    user_id = authenticated_user_id or user_id
+
     # Retrieve the transcription data from Redis
-    session_data = await redis_client.hgetall(f"transcription:{user_id}")
+    transcription, processed_transcription = await transcript_store.load(key)
 
-    if not session_data:
+    if not (transcription or processed_transcription):
         raise HTTPException(status_code=404, detail="No active transcription session for this user.")
 
-    # Convert Redis data from bytes to string
-    transcription = session_data.get(b"transcription", b"").decode("utf-8")
-    processed_transcription = session_data.get(b"processed_transcription", b"").decode("utf-8")
-
-    if transcription or processed_transcription:
-        new_entry = TranscriptionDB(
-            user_id=user_id,
-            transcription=transcription,
-            processed_text=processed_transcription,
-            language=language
-        )
-        session.add(new_entry)
-        await session.commit()
+    new_entry = TranscriptionDB(
+        user_id=user_id,
+        transcription=transcription,
+        processed_text=processed_transcription,
+        word_count=len(transcription.split()),
+        language=language
+    )
+    # Written by the background writer in a batch with other saves
+    await db_writer.put(new_entry)
 
-        # Delete the session data from Redis after saving to the database
-        await redis_client.delete(f"transcription:{user_id}")
+    # Delete the session data from Redis once the entry is queued
+    await transcript_store.clear(key)
 
-        return {"status": "success", "message": "Transcription saved successfully."}
-    else:
-        raise HTTPException(status_code=500, detail="Failed to retrieve session data.")
\ No newline at end of file
+    return {"status": "success", "message": "Transcription saved successfully."}
@@ -1,21 +1,24 @@
 from fastapi import ( 
     WebSocket, 
     WebSocketDisconnect,
-    APIRouter,
-    Depends
+    APIRouter
 )
-from core.models.tts import TTSResponse
-from core.ai.speech import text_to_speech
-from core.utils.speech_utils import encode_wav_to_base64
+from core.models.tts import TTSResponse, TTSModelsResponse, TTSStreamEnd
+from core.models.stt import AudioStreamReady
+from core.ai.speech import text_to_speech, stream_text_to_speech
+from core.tts.registry import tts_registry
+from core.tts.cache import tts_cache
+from core.tts.storage import compact_speech_async
+from core.utils.speech_utils import encode_wav_to_base64, negotiate_audio_format
+from core.utils.resample_utils import normalize_wav
 from core.utils.executor_utils import executor
-from sqlalchemy.ext.asyncio import AsyncSession
-from core.db.database import get_session
+from core.utils.admission_utils import admission_controller, connection_identity, close_overloaded
 from core.models.db import SpeechDB
+from core.db.writer import db_writer
 from core.db.redis_client import redis_client
 from dotenv import load_dotenv
 import asyncio
 import base64
-import pickle
 import json
 import os
 
@@ -25,80 +28,144 @@ load_dotenv(
 )
 
 tts_model = os.getenv("TTS_BASE_MODEL", "coqui-tacotron2")
+TTS_STREAMING = os.getenv("TTS_STREAMING", "false").lower() == "true"
+
+# Formats for audio sent to the client. Sample rate 0 keeps each model's native rate;
+# any other value is resampled to on the server so the client gets one fixed rate.
+TTS_CODECS = ["wav"]
+TTS_SAMPLE_RATES = [0, 8000, 16000, 22050, 24000, 44100, 48000]
               
 router = APIRouter()
 
+@router.get("/v1/tts/models", response_model=TTSModelsResponse)
+async def get_tts_models():
+    """Configured TTS models, load time, memory and usage for those already loaded, and phrase cache statistics."""
+    return {**tts_registry.stats(), "cache": tts_cache.summary()}
+
 @router.websocket("/v1/ws/speech")
-async def tts_websocket(
-    websocket: WebSocket, 
-    session: AsyncSession = Depends(get_session)
-):
+async def tts_websocket(websocket: WebSocket):
     await websocket.accept()
 
+    authenticated_user_id, quota_key = connection_identity(websocket)
+    admission = admission_controller.admit(quota_key)
+    if admission is None:
+        await close_overloaded(websocket, "Too many active sessions, try again later")
+        return
+
+    pending_stores = set()  # Speech being compacted and stored after it was sent
+
     try:
         user_id = websocket.client.host
         cache_key = f"tts_session:{user_id}"
         await redis_client.delete(cache_key)  # Clear any existing data for this session
         
+        binary = False  # Set by a "start" control message; audio then goes out as binary frames
+        audio_format = {"codec": TTS_CODECS[0], "sample_rate": TTS_SAMPLE_RATES[0]}
+        stream = TTS_STREAMING  # Synthesise and send sentence by sentence
+        connection_id = str(id(websocket))  # Queue key for fair TTS batching
+
+        async def cache_audio(text: str, wav_data):
+            # Encoded once here into the form it is stored in (FLAC by default)
+            try:
+                stored = await compact_speech_async(wav_data)
+                admission.charge_audio(stored["duration"])
+                stored["audio"] = base64.b64encode(stored["audio"]).decode('utf-8')
+                await redis_client.rpush(cache_key, json.dumps({"text": text, **stored}))
+            except Exception as e:
+                print(f"Could not store synthesised speech: {e}")
+
+        def store_audio(text: str, wav_data):
+            # Runs after the audio is sent so encoding and Redis never delay playback
+            task = asyncio.create_task(cache_audio(text, wav_data))
+            pending_stores.add(task)
+            task.add_done_callback(pending_stores.discard)
+
+        async def send_audio(wav_data, chunk_index: int = 0, is_final: bool = True, text: str = None):
+            wav_bytes = base64.b64decode(wav_data) if tts_model.startswith("ai4bharat") else wav_data
+            audio = await asyncio.get_event_loop().run_in_executor(
+                executor, normalize_wav, wav_bytes, audio_format["sample_rate"]
+            )
+            if binary:
+                await websocket.send_bytes(audio)
+            else:
+                response = TTSResponse(
+                    audio=encode_wav_to_base64(audio), chunk_index=chunk_index, is_final=is_final, text=text
+                )
+                await websocket.send_json(response.model_dump())
+
         while True:
             message = await websocket.receive_text()
             print(f"Received message: {message}")
             message = json.loads(message)
             
             selected_language = message.get("language", "en") #This sets the lang everywhere for pipeline.
-            user_id = message.get("user_id", "default_user")
+            user_id = authenticated_user_id or message.get("user_id", "default_user")
 
-            if "text" in message:
-                text = message["text"]
-                print(f"Received text for TTS: {text}")
+            if "stream" in message:
+                stream = bool(message["stream"])
 
-                wav_data = await asyncio.get_event_loop().run_in_executor(
-                    executor, text_to_speech, text, tts_model, selected_language
+            if message.get("type") == "start":
+                binary = bool(message.get("binary", False))
+                audio_format = negotiate_audio_format(message, TTS_CODECS, TTS_SAMPLE_RATES)
+                await websocket.send_text(
+                    AudioStreamReady(**audio_format).model_dump_json()
                 )
-            else:
-                wav_data = None
-            print("tts_mdoel: ", tts_model)
-            if wav_data and tts_model.startswith("ai4bharat"):
-                # Cache in Redis
-                print(wav_data)
-                await redis_client.rpush(cache_key, json.dumps({"text": text, "wav_data": wav_data}))
-                
-                response = TTSResponse(audio=wav_data)
-                await websocket.send_json(response.model_dump())
-            elif wav_data and (tts_model == "coqui-glow-tts" or tts_model == "coqui-tacotron2"):
-                wav_data_pickled = pickle.dumps(wav_data)
-                audio_base64 = encode_wav_to_base64(wav_data)
-                wav_data_base64 = base64.b64encode(wav_data_pickled).decode('utf-8')
-                
-                # Cache in Redis
-                await redis_client.rpush(cache_key, json.dumps({"text": text, "wav_data": wav_data_base64}))
-                
-                response = TTSResponse(audio=audio_base64)
-                await websocket.send_json(response.model_dump())
-            else:
+                if "text" not in message:
+                    continue
+
+            if "text" not in message:
                 print("No audio data received from text_to_speech")
                 return {}
+
+            if not admission.audio_allowed():
+                await close_overloaded(websocket, "Speech rate limit exceeded", admission.audio_retry_after())
+                return
+
+            text = message["text"]
+            print(f"Received text for TTS: {text}")
+            print("tts_mdoel: ", tts_model)
+
+            if not stream:
+                wav_data = await text_to_speech(text, tts_model, selected_language, session=connection_id)
+                if not wav_data:
+                    print("No audio data received from text_to_speech")
+                    return {}
+                await send_audio(wav_data)
+                store_audio(text, wav_data)
+                continue
+
+            # Send each sentence as soon as it is synthesised while later ones are still in progress
+            total = 0
+            sent = 0
+            async for chunk_index, total, chunk_text, wav_data in stream_text_to_speech(
+                text, tts_model, selected_language, session=connection_id
+            ):
+                is_final = chunk_index == total - 1
+                if not wav_data:
+                    print(f"No audio data received for chunk {chunk_index}")
+                    continue
+                await send_audio(wav_data, chunk_index, is_final, chunk_text)
+                store_audio(chunk_text, wav_data)
+                sent += 1
+            # Always mark the end, since the chunk flagged is_final may have produced no audio
+            await websocket.send_text(TTSStreamEnd(chunks=total, sent=sent).model_dump_json())
     except WebSocketDisconnect:
         print("TTS client disconnected")
     finally:
-        # Persist cached data to DB at the end of the session
+        admission.release()
+
+        # Speech sent just before the disconnect may still be on its way to Redis
+        if pending_stores:
+            await asyncio.gather(*pending_stores, return_exceptions=True)
+
+        # Hand the session's speech to the background writer instead of writing it here
         cached_data = await redis_client.lrange(cache_key, 0, -1)
+        records = []
         for item in cached_data:
-            # Each item is a JSON string; first, deserialize it into a dictionary
-            item_dict = json.loads(item)
-    
-            # Now extract 'text' and 'wav_data' from the dictionary
-            text = item_dict["text"]
-            wav_data_base64 = item_dict["wav_data"]
-
-            # Decode the base64 string back to bytes
-            wav_data_bytes = base64.b64decode(wav_data_base64)
-
-            # Convert the bytes back to the original list of floats
-            wav_data = pickle.loads(wav_data_bytes)
-            speech_record = SpeechDB(user_id=user_id, audio=wav_data, text=text, language=selected_language)
-            session.add(speech_record)
-        await session.commit()
+            stored = json.loads(item)
+            stored["audio"] = base64.b64decode(stored["audio"])
+            records.append(SpeechDB(user_id=user_id, language=selected_language, **stored))
+        await db_writer.put_many(records)
 
         # Clear the cache for the session
         await redis_client.delete(cache_key)
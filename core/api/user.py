@@ -18,7 +18,7 @@ import os
 from dotenv import load_dotenv
 import logging
 
-from core.utils.jwt_utils import verify_access_cookie
+from core.utils.jwt_utils import verify_access_cookie, JWT_SECRET_KEY, JWT_ALGORITHM
 
 # Load environment variables
 load_dotenv(
@@ -28,11 +28,11 @@ load_dotenv(
 router = APIRouter()
 security = HTTPBearer()
 
-SECRET_KEY = os.getenv("JWT_SECRET_KEY")
+SECRET_KEY = JWT_SECRET_KEY
 if not SECRET_KEY:
     raise ValueError("No SECRET_KEY set for JWT. Please set it in the environment variables.")
 
-ALGORITHM = "HS256"
+ALGORITHM = JWT_ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 # Helper function to hash the password
@@ -81,7 +81,7 @@ async def register_user(
 
     # Create access token
     access_token = create_access_token(
-        data={"sub": new_user.email},
+        data={"sub": new_user.email, "user_id": new_user.user_id},
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
 
@@ -1,11 +1,12 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
-from sqlmodel import SQLModel
 from dotenv import load_dotenv
+from fastapi import HTTPException
+from core.db.migrations import run_migrations
+import asyncio
 import os
-import asyncpg
 import sqlalchemy as sa
-import time
 from sqlalchemy.exc import SQLAlchemyError
 
 from asyncpg.exceptions import DuplicatePreparedStatementError
@@ -15,12 +16,44 @@ load_dotenv(
         )
 
 DATABASE_URL = os.getenv("DATABASE_URL")
-#DATABASE_URL = os.getenv("DATABASE_URL") + "?prepared_statement_cache_size=0"
+
+
+def engine_options(
+    url: str,
+    pool_size: int = int(os.getenv("DB_POOL_SIZE", "5")),
+    max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    pool_recycle: int = int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    pool_pre_ping: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+    statement_cache_size: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100")),
+    echo: bool = os.getenv("DB_ECHO", "false").lower() == "true",
+) -> dict:
+    """
+    Keyword arguments for create_async_engine, from the environment.
+    SQLite has no server connections to pool, so the pool settings only
+    apply to server databases. For asyncpg, statement_cache_size sets both
+    asyncpg's and SQLAlchemy's prepared statement caches. Use 0 behind
+    pgbouncer in transaction mode, which cannot keep prepared statements.
+    """
+    url = make_url(url)
+    options = {"echo": echo, "future": True, "pool_pre_ping": pool_pre_ping}
+    if url.get_backend_name() != "sqlite":
+        options.update(
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_recycle=pool_recycle,
+        )
+    if url.get_driver_name() == "asyncpg":
+        options["connect_args"] = {
+            "statement_cache_size": statement_cache_size,
+            "prepared_statement_cache_size": statement_cache_size,
+        }
+    return options
 
 
 # Create the async engine
-engine = create_async_engine(DATABASE_URL, echo=True, future=True)
-#engine = create_async_engine(DATABASE_URL, echo=True, future=True, pool_size=5, max_overflow=10, connect_args={"statement_cache_size": 0}                     )
+engine = create_async_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 
 # Create the async session factory
 async_session = sessionmaker(
@@ -29,43 +62,53 @@ async_session = sessionmaker(
         expire_on_commit=False
         )
 
+# Set once the database is reachable and its schema is up to date
+schema_ready = asyncio.Event()
+
 
-# Dependency to get the async session
+# Dependency to get the async session; routes answer 503 until the schema is ready
 async def get_session() -> AsyncSession:
+    if not schema_ready.is_set():
+        raise HTTPException(status_code=503, detail="Database is not ready")
     async with async_session() as session:
         yield session
 
 
-
-# Function to initialize the database (creating tables)
-async def init_db(retry_attempts=10):
+# Function to initialize the database (bringing the schema up to date)
+async def init_db(retry_attempts=10, retry_delay=5):
     attempt = 0
-    retry_delay = 5
-    retry_attempts = 10
     while attempt < retry_attempts:
         try:
-            async with engine.begin() as conn:
-                # Optionally drop all tables for a fresh start
-                await conn.run_sync(SQLModel.metadata.drop_all)
-                # Create all tables
-                await conn.run_sync(SQLModel.metadata.create_all)
+            await run_migrations(engine)
             print("Database initialization successful.")
+            schema_ready.set()
             break
-        except (DuplicatePreparedStatementError, SQLAlchemyError) as e:  # Catch specific exceptions
+        except (DuplicatePreparedStatementError, SQLAlchemyError, OSError) as e:  # Catch specific exceptions
             print(f"Database initialization failed due to {type(e).__name__}: {e}. Retrying in {retry_delay} seconds...")
             attempt += 1
             if attempt < retry_attempts:
-                time.sleep(retry_delay)  # Delay before the next retry
+                await asyncio.sleep(retry_delay)  # Delay before the next retry without stalling the event loop
             else:
                 print("Max retries reached. Exiting...")
                 raise  # Re-raise after max retries
 
-# Dependency to get a session
-async def get_session() -> AsyncSession:
-    async with async_session() as session:
-        yield session
+
+async def check_ready(timeout: float = float(os.getenv("DB_READY_TIMEOUT", "2"))) -> bool:
+    """True when the schema is up to date and a pooled connection answers within timeout seconds."""
+    if not schema_ready.is_set():
+        return False
+
+    async def ping():
+        async with engine.connect() as connection:
+            await connection.execute(sa.text("SELECT 1"))
+
+    try:
+        await asyncio.wait_for(ping(), timeout=timeout)
+    except (SQLAlchemyError, OSError, asyncio.TimeoutError):
+        return False
+    return True
+
 
 # Graceful shutdown: Dispose engine on app shutdown
 async def shutdown():
     await engine.dispose()
-
@@ -0,0 +1,111 @@
+from sqlalchemy import inspect, text, Integer
+from sqlmodel import SQLModel
+from core.models.db import TranscriptionDB, SpeechDB
+from core.db.search import create_search_index
+import time
+
+# Serialises migrations when several workers start at once (Postgres only)
+MIGRATION_LOCK_ID = 727274
+
+MIGRATIONS = []  # (version, description, function taking a sync connection), in order
+
+
+def migration(version: int, description: str):
+    """
+    Register a schema migration. Versions must increase, and each one runs
+    once per database, in order, inside the same transaction as its
+    bookkeeping row. Version 1 creates the tables from the current models,
+    so a new database already has everything later migrations add. Later
+    migrations therefore have to check for what they add before adding it.
+    """
+    def register(function):
+        if MIGRATIONS and version <= MIGRATIONS[-1][0]:
+            raise ValueError(f"Migration {version} is out of order")
+        MIGRATIONS.append((version, description, function))
+        return function
+    return register
+
+
+def column_names(connection, table: str) -> set:
+    return {column["name"] for column in inspect(connection).get_columns(table)}
+
+
+def add_missing_columns(connection, table: str, columns: dict):
+    existing = column_names(connection, table)
+    for name, definition in columns.items():
+        if name not in existing:
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {definition}"))
+
+
+@migration(1, "create tables")
+def _create_tables(connection):
+    SQLModel.metadata.create_all(connection)
+
+
+@migration(2, "speech codec, sample_rate and duration")
+def _speech_storage_columns(connection):
+    # Rows from before this have no codec and are converted by core.tts.storage.migrate_speech_storage
+    add_missing_columns(connection, "speechdb", {
+        "codec": "VARCHAR NOT NULL DEFAULT 'legacy'",
+        "sample_rate": "INTEGER NOT NULL DEFAULT 0",
+        "duration": "FLOAT NOT NULL DEFAULT 0",
+    })
+
+
+@migration(3, "string user ids, transcription created_at and history indexes")
+def _history_indexes(connection):
+    for table in (TranscriptionDB.__tablename__, SpeechDB.__tablename__):
+        columns = {column["name"]: column for column in inspect(connection).get_columns(table)}
+        if connection.dialect.name == "postgresql" and isinstance(columns["user_id"]["type"], Integer):
+            # user_id was an integer foreign key to user.id but is given User.user_id strings
+            for foreign_key in inspect(connection).get_foreign_keys(table):
+                if foreign_key["constrained_columns"] == ["user_id"]:
+                    connection.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{foreign_key["name"]}"'))
+            connection.execute(text(f"ALTER TABLE {table} ALTER COLUMN user_id TYPE VARCHAR USING user_id::varchar"))
+        # SQLite keeps the declared type but stores the strings as given, so it needs no change
+
+    if "created_at" not in column_names(connection, TranscriptionDB.__tablename__):
+        # SQLite cannot add a column with a non-constant default, so existing rows are filled separately
+        connection.execute(text(f"ALTER TABLE {TranscriptionDB.__tablename__} ADD COLUMN created_at TIMESTAMP"))
+        connection.execute(text(
+            f"UPDATE {TranscriptionDB.__tablename__} SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL"
+        ))
+
+    for index in (*TranscriptionDB.__table__.indexes, *SpeechDB.__table__.indexes):
+        index.create(connection, checkfirst=True)
+
+
+@migration(4, "transcription full-text search")
+def _transcription_search(connection):
+    create_search_index(connection)
+
+
+def _apply(connection) -> list:
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations "
+        "(version INTEGER PRIMARY KEY, description VARCHAR NOT NULL, applied_at FLOAT NOT NULL)"
+    ))
+    applied = set(connection.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+    ran = []
+    for version, description, function in MIGRATIONS:
+        if version in applied:
+            continue
+        function(connection)
+        connection.execute(
+            text("INSERT INTO schema_migrations (version, description, applied_at) VALUES (:version, :description, :applied_at)"),
+            {"version": version, "description": description, "applied_at": time.time()},
+        )
+        ran.append(version)
+    return ran
+
+
+async def run_migrations(engine) -> list:
+    """Apply pending migrations in one transaction. Returns the versions applied."""
+    async with engine.begin() as connection:
+        ran = await connection.run_sync(_apply)
+    if ran:
+        print(f"Applied database migrations {ran}")
+    return ran
@@ -1,4 +1,41 @@
-from redis.asyncio import Redis
+from redis.asyncio import ConnectionPool, Redis
+from dotenv import load_dotenv
+import zlib
+import os
+
+load_dotenv("ops/.env")
+
+
+def create_redis_client(
+    url: str,
+    max_connections: int = int(os.getenv("REDIS_MAX_CONNECTIONS", "50")),
+    socket_timeout: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5")),
+    health_check_interval: int = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30")),
+) -> Redis:
+    """
+    Build a client on its own bounded connection pool. Create one per Redis
+    node and reuse it for the life of the process.
+    """
+    pool = ConnectionPool.from_url(
+        url,
+        max_connections=max_connections,
+        socket_timeout=socket_timeout,
+        socket_connect_timeout=socket_timeout,
+        health_check_interval=health_check_interval,
+    )
+    return Redis(connection_pool=pool)
+
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Comma separated node URLs that per-user session state is spread over; defaults to REDIS_URL alone
+REDIS_SHARD_URLS = [url.strip() for url in os.getenv("REDIS_SHARD_URLS", REDIS_URL).split(",") if url.strip()]
 
 # Initialize the Redis client
-redis_client = Redis(host='localhost', port=6379, db=0)
\ No newline at end of file
+redis_client = create_redis_client(REDIS_URL)
+redis_shards = [redis_client if url == REDIS_URL else create_redis_client(url) for url in REDIS_SHARD_URLS]
+
+
+def redis_for(shard_key: str) -> Redis:
+    """The node holding state for shard_key. crc32 is stable across processes, unlike hash()."""
+    return redis_shards[zlib.crc32(shard_key.encode("utf-8")) % len(redis_shards)]
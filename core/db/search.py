@@ -0,0 +1,90 @@
+from sqlalchemy import text, DateTime
+from core.models.db import TranscriptionDB
+
+# Markers around matched terms in snippets, the same tags highlighted text uses
+HIGHLIGHT_START = "<b>"
+HIGHLIGHT_STOP = "</b>"
+
+TABLE = TranscriptionDB.__tablename__
+FTS_TABLE = "transcription_fts"
+
+# Postgres: a stored tsvector over both text columns, maintained by the database on every insert or
+# update. The simple configuration only lowercases, which suits the mix of languages transcribed.
+POSTGRES_DDL = [
+    f"""ALTER TABLE {TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', coalesce(transcription, '') || ' ' || coalesce(processed_text, ''))) STORED""",
+    f"CREATE INDEX IF NOT EXISTS ix_{TABLE}_search_vector ON {TABLE} USING GIN (search_vector)",
+]
+
+# SQLite: an FTS5 index over the table's rows, kept in step by triggers
+SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE}
+        USING fts5(transcription, processed_text, content='{TABLE}', content_rowid='id')""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, transcription, processed_text) VALUES (new.id, new.transcription, new.processed_text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, transcription, processed_text)
+        VALUES ('delete', old.id, old.transcription, old.processed_text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF transcription, processed_text ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, transcription, processed_text)
+        VALUES ('delete', old.id, old.transcription, old.processed_text);
+        INSERT INTO {FTS_TABLE}(rowid, transcription, processed_text) VALUES (new.id, new.transcription, new.processed_text);
+    END""",
+    # Index the rows written before the triggers existed
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+# Rank the matches with the index alone, then build snippets only for the page returned
+POSTGRES_SEARCH = f"""
+    SELECT page.id, page.language, page.created_at, page.rank,
+           ts_headline('simple', coalesce(page.processed_text, page.transcription), page.query,
+                       'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, MaxWords=30, MinWords=10') AS snippet
+    FROM (
+        SELECT t.id, t.language, t.created_at, t.transcription, t.processed_text, q.query,
+               ts_rank_cd(t.search_vector, q.query) AS rank
+        FROM {TABLE} t, websearch_to_tsquery('simple', :query) AS q(query)
+        WHERE t.user_id = :user_id AND t.search_vector @@ q.query
+        ORDER BY rank DESC, t.id DESC
+        LIMIT :limit OFFSET :offset
+    ) AS page
+    ORDER BY page.rank DESC, page.id DESC
+"""
+
+# bm25() is lower for better matches, so it is negated to rank like Postgres, higher first
+SQLITE_SEARCH = f"""
+    SELECT t.id, t.language, t.created_at, -bm25({FTS_TABLE}) AS rank,
+           snippet({FTS_TABLE}, -1, '{HIGHLIGHT_START}', '{HIGHLIGHT_STOP}', '...', 16) AS snippet
+    FROM {FTS_TABLE}
+    JOIN {TABLE} t ON t.id = {FTS_TABLE}.rowid
+    WHERE {FTS_TABLE} MATCH :query AND t.user_id = :user_id
+    ORDER BY bm25({FTS_TABLE}), t.id DESC
+    LIMIT :limit OFFSET :offset
+"""
+
+
+def create_search_index(connection):
+    """Create the full-text index for the connection's database and index the existing rows."""
+    statements = POSTGRES_DDL if connection.dialect.name == "postgresql" else SQLITE_DDL
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def fts5_query(query: str) -> str:
+    """Quote every word so user input is matched as terms (all required) and never parsed as FTS5 syntax."""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+
+async def search_transcriptions(session, user_id: str, query: str, limit: int, offset: int = 0) -> list:
+    """A user's transcriptions matching query, best match first, with highlighted snippets."""
+    if session.bind.dialect.name == "postgresql":
+        statement = POSTGRES_SEARCH
+    else:
+        statement, query = SQLITE_SEARCH, fts5_query(query)
+    if not query.strip():
+        return []
+    result = await session.execute(
+        text(statement).columns(created_at=DateTime), {"query": query, "user_id": user_id, "limit": limit, "offset": offset}
+    )
+    return result.mappings().all()
@@ -0,0 +1,63 @@
+from dotenv import load_dotenv
+from core.db.redis_client import redis_for
+import os
+
+load_dotenv("ops/.env")
+
+
+class TranscriptSessionStore:
+    """
+    Per-user transcript state for live sessions, kept in Redis until it is
+    saved. Raw and processed text are stored as lists of segments, so an
+    update appends only the new segments instead of rewriting the whole
+    transcript. Each update is one pipeline: the appends and the TTL refresh
+    go to Redis in a single round trip. All of a user's keys live on the
+    shard picked from the user id.
+    """
+
+    def __init__(
+        self,
+        ttl: int = int(os.getenv("TRANSCRIPT_SESSION_TTL", "86400")),
+        prefix: str = "transcription:",
+    ):
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _keys(self, user_id: str) -> tuple:
+        return f"{self.prefix}{user_id}:raw", f"{self.prefix}{user_id}:processed"
+
+    async def append(self, user_id: str, raw_segments: list, processed_segments: list, reset: bool = False):
+        """
+        Append segments to the user's transcript and refresh its TTL. With
+        reset, earlier unsaved state is dropped first, as a new connection
+        for the same user replaces it.
+        """
+        raw_key, processed_key = self._keys(user_id)
+        async with redis_for(user_id).pipeline(transaction=reset) as pipe:
+            if reset:
+                pipe.delete(raw_key, processed_key)
+            if raw_segments:
+                pipe.rpush(raw_key, *raw_segments)
+            if processed_segments:
+                pipe.rpush(processed_key, *processed_segments)
+            pipe.expire(raw_key, self.ttl)
+            pipe.expire(processed_key, self.ttl)
+            await pipe.execute()
+
+    async def load(self, user_id: str) -> tuple:
+        """The raw and processed transcripts as strings, empty if there is no session."""
+        raw_key, processed_key = self._keys(user_id)
+        async with redis_for(user_id).pipeline(transaction=False) as pipe:
+            pipe.lrange(raw_key, 0, -1)
+            pipe.lrange(processed_key, 0, -1)
+            raw, processed = await pipe.execute()
+        return (
+            " ".join(segment.decode("utf-8") for segment in raw).strip(),
+            " ".join(segment.decode("utf-8") for segment in processed).strip(),
+        )
+
+    async def clear(self, user_id: str):
+        await redis_for(user_id).delete(*self._keys(user_id))
+
+
+transcript_store = TranscriptSessionStore()
@@ -0,0 +1,145 @@
+from collections import defaultdict
+from dotenv import load_dotenv
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError, InterfaceError, TimeoutError as PoolTimeoutError
+from sqlmodel import SQLModel
+from core.db.database import async_session, schema_ready
+import asyncio
+import time
+import os
+
+load_dotenv("ops/.env")
+
+# Worth retrying: the database is unreachable, restarting, locked or out of pooled connections.
+# Anything else is taken to be a problem with the records themselves.
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, PoolTimeoutError, OSError, asyncio.TimeoutError)
+
+
+def is_transient(error: Exception) -> bool:
+    # Drivers report some dropped connections as other DBAPI errors, flagged as invalidated
+    return isinstance(error, TRANSIENT_ERRORS) or getattr(error, "connection_invalidated", False)
+
+
+class PersistenceWriter:
+    """
+    Write-behind persistence for history records. Handlers put SQLModel
+    instances on a bounded queue and return immediately. A background task
+    drains the queue and writes each table's records with one multi-row
+    INSERT per flush. A flush happens when batch_size records are waiting or
+    flush_interval seconds after the first one arrived. When the queue is
+    full, put() waits, which slows producers down instead of growing memory
+    without bound. Flushes that fail for a transient reason are retried with
+    exponential backoff, and dropped after max_retries attempts. When the
+    records are at fault, the batch is split in halves until the bad records
+    are found, so only those are dropped.
+    """
+
+    def __init__(
+        self,
+        session_factory=async_session,
+        max_queue: int = int(os.getenv("DB_WRITER_QUEUE_SIZE", "10000")),
+        batch_size: int = int(os.getenv("DB_WRITER_BATCH_SIZE", "500")),
+        flush_interval: float = float(os.getenv("DB_WRITER_FLUSH_MS", "500")) / 1000,
+        max_retries: int = int(os.getenv("DB_WRITER_MAX_RETRIES", "5")),
+        backoff_base: float = float(os.getenv("DB_WRITER_BACKOFF_BASE", "0.5")),
+    ):
+        self.session_factory = session_factory
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.queue = None
+        self.worker = None
+        self.stats = {
+            "written": 0,
+            "flushes": 0,
+            "retries": 0,
+            "dropped": 0,
+            "rejected": 0,  # Of the dropped records, those that could not be written at all
+        }
+
+    def start(self):
+        if self.worker is None or self.worker.done():
+            if self.queue is None:
+                self.queue = asyncio.Queue(maxsize=self.max_queue)
+            self.worker = asyncio.create_task(self._run())
+
+    async def put(self, record: SQLModel):
+        self.start()
+        await self.queue.put(record)
+
+    async def put_many(self, records: list):
+        for record in records:
+            await self.put(record)
+
+    async def _run(self):
+        # Records queue up while the schema is still being prepared at startup
+        await schema_ready.wait()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout=timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+            for _ in batch:
+                self.queue.task_done()
+
+    async def _insert(self, batch: list):
+        tables = defaultdict(list)
+        for record in batch:
+            tables[type(record)].append(record.model_dump(exclude={"id"}))
+
+        async with self.session_factory() as session:
+            for model, rows in tables.items():
+                await session.execute(insert(model), rows)
+            await session.commit()
+
+    async def _flush(self, batch: list):
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self._insert(batch)
+                self.stats["written"] += len(batch)
+                self.stats["flushes"] += 1
+                return
+            except Exception as e:
+                if is_transient(e):
+                    if attempt == self.max_retries:
+                        print(f"Dropping {len(batch)} records after {attempt + 1} failed writes: {e}")
+                        self.stats["dropped"] += len(batch)
+                        return
+                    delay = self.backoff_base * 2 ** attempt
+                    print(f"Writing {len(batch)} records failed ({e}), retrying in {delay:.1f} seconds")
+                    self.stats["retries"] += 1
+                    await asyncio.sleep(delay)
+                    continue
+                if len(batch) == 1:
+                    print(f"Dropping a {type(batch[0]).__name__} record that cannot be written: {e}")
+                    self.stats["dropped"] += 1
+                    self.stats["rejected"] += 1
+                    return
+                # Write each half on its own, so one bad record does not take the rest with it
+                middle = len(batch) // 2
+                await self._flush(batch[:middle])
+                await self._flush(batch[middle:])
+                return
+
+    async def stop(self, timeout: float = float(os.getenv("DB_WRITER_SHUTDOWN_TIMEOUT", "10"))):
+        """Write what is still queued, then stop the worker."""
+        if self.worker is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            print(f"Shutting down with {self.queue.qsize()} records unwritten")
+        self.worker.cancel()
+        self.worker = None
+
+
+db_writer = PersistenceWriter()
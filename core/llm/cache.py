@@ -0,0 +1,110 @@
+from collections import OrderedDict
+from typing import Optional
+from dotenv import load_dotenv
+from core.db.redis_client import redis_client
+import hashlib
+import json
+import os
+import re
+import time
+
+load_dotenv("ops/.env")
+
+
+def normalize_text(text: str) -> str:
+    """Case and whitespace differences should not produce separate cache entries."""
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+class LLMResultCache:
+    """
+    Two-tier cache for processed LLM results. Entries are keyed by a hash of
+    the prompt template, the candidate models and the normalised input text.
+    The in-process tier is an LRU bounded by entry count; the optional Redis
+    tier is shared by all workers. Both tiers expire entries after their TTL.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000")),
+        ttl: float = float(os.getenv("LLM_CACHE_TTL", "3600")),
+        redis=redis_client if os.getenv("LLM_CACHE_REDIS", "false").lower() == "true" else None,
+        redis_ttl: int = int(os.getenv("LLM_CACHE_REDIS_TTL", "86400")),
+        prefix: str = "llm_cache:",
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.redis = redis
+        self.redis_ttl = redis_ttl
+        self.prefix = prefix
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.stats = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+        }
+
+    @staticmethod
+    def make_key(template: str, models: str, text: str) -> str:
+        template_hash = hashlib.sha256(template.encode("utf-8")).hexdigest()
+        payload = "\x00".join((template_hash, models, normalize_text(text)))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _get_local(self, key: str) -> Optional[dict]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def _set_local(self, key: str, value: dict):
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    async def get(self, key: str) -> Optional[dict]:
+        value = self._get_local(key)
+        if value is not None:
+            self.stats["local_hits"] += 1
+            return value
+
+        if self.redis is not None:
+            try:
+                cached = await self.redis.get(self.prefix + key)
+            except Exception as e:
+                print(f"LLM cache Redis read failed: {e}")
+                cached = None
+            if cached:
+                value = json.loads(cached)
+                self._set_local(key, value)
+                self.stats["redis_hits"] += 1
+                return value
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: dict):
+        self._set_local(key, value)
+        if self.redis is not None:
+            try:
+                await self.redis.set(self.prefix + key, json.dumps(value), ex=self.redis_ttl)
+            except Exception as e:
+                print(f"LLM cache Redis write failed: {e}")
+
+    def hit_rate(self) -> float:
+        hits = self.stats["local_hits"] + self.stats["redis_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def summary(self) -> dict:
+        return {**self.stats, "hit_rate": self.hit_rate(), "entries": len(self.entries)}
+
+
+llm_cache = LLMResultCache()
@@ -1,22 +1,27 @@
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic
 from pydantic import BaseModel, ValidationError
 from dotenv import load_dotenv
+from core.utils.http_utils import create_async_http_client
 import instructor
 import os
 
 load_dotenv("ops/.env")
 
 class Claude:
+    # One patched client per process, shared by every request
+    client = None
+
     def __init__(self):
-        api_key = os.getenv("CLAUDE_API_KEY")
-        self.client = Anthropic(
-            api_key=api_key,
-        )
+        if Claude.client is None:
+            api_key = os.getenv("CLAUDE_API_KEY")
+            Claude.client = instructor.from_anthropic(
+                AsyncAnthropic(api_key=api_key, http_client=create_async_http_client())
+            )
+        self.client = Claude.client
 
-    def inference(self, model_id: str, prompt: str, response_model: BaseModel) -> str:
-        self.client = instructor.from_anthropic(self.client)
+    async def inference(self, model_id: str, prompt: str, response_model: BaseModel) -> str:
         try:
-            message = self.client.messages.create(
+            message = await self.client.messages.create(
                 max_tokens=4096,
                 messages=[
                     {
@@ -30,4 +35,10 @@ class Claude:
             )
         except ValidationError as e:
             print(e)
-        return message
\ No newline at end of file
+            raise
+        return message
+
+
+    async def stream_inference(self, model_id: str, prompt: str, response_model: BaseModel):
+        # Partial tool-call streaming is not available for Anthropic in our instructor version
+        yield await self.inference(model_id, prompt, response_model)
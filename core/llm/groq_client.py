@@ -1,6 +1,7 @@
-from groq import Groq as _Groq
+from groq import AsyncGroq
 from pydantic import BaseModel
 from dotenv import load_dotenv
+from core.utils.http_utils import create_async_http_client
 import instructor
 import os
 
@@ -10,13 +11,34 @@ api_key = os.getenv("GROQ_API_KEY")
 
 
 class Groq:
+    # One patched client per process, shared by every request
+    client = None
+
     def __init__(self):
-        api_key = os.getenv("GROQ_API_KEY")
-        self.client = _Groq(api_key=api_key)
+        if Groq.client is None:
+            api_key = os.getenv("GROQ_API_KEY")
+            Groq.client = instructor.from_groq(
+                AsyncGroq(api_key=api_key, http_client=create_async_http_client())
+            )
+        self.client = Groq.client
+
+    async def inference(self, model_id: str, prompt: str, response_model: BaseModel) -> str:
+        chat_completion = await self.client.chat.completions.create(
+            response_model=response_model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": prompt,
+                }
+            ],
+            model=model_id,
+        )
+        return chat_completion
+
 
-    def inference(self, model_id: str, prompt: str, response_model: BaseModel) -> str:
-        self.client = instructor.patch(self.client)
-        chat_completion = self.client.chat.completions.create(
+    async def stream_inference(self, model_id: str, prompt: str, response_model: BaseModel):
+        """Yield partially filled response_model objects as tokens arrive."""
+        partials = self.client.chat.completions.create_partial(
             response_model=response_model,
             messages=[
                 {
@@ -26,4 +48,5 @@ class Groq:
             ],
             model=model_id,
         )
-        return chat_completion
\ No newline at end of file
+        async for partial in partials:
+            yield partial
@@ -1,8 +1,16 @@
 from core.llm.groq_client import Groq
 from core.llm.openai_client import OpenAi
 from core.llm.claude_client import Claude
+from core.llm.router import LLMRouter
 from typing import List, Tuple
 
+# Shared by every request in the process so latency and error history accumulate
+llm_router = LLMRouter({
+    "GROQ": Groq,
+    "OPENAI": OpenAi,
+    "CLAUDE": Claude,
+})
+
 class LLM:
     def __init__(self, language: str):
         self.language = language
@@ -43,12 +51,25 @@ class LLM:
     def list_models(self):
         return self.models
 
-    def inference(self, prompt: str, response_model: str = None) -> any:
-        if self.model_enum == "GROQ":
-            return Groq().inference(self.model_id, prompt, response_model)
-        elif self.model_enum == "OPENAI":
-            return OpenAi().inference(self.model_id, prompt, response_model)
-        elif self.model_enum == "CLAUDE":
-            return Claude().inference(self.model_id, prompt, response_model)
-        else:
-            return "Model not found"
\ No newline at end of file
+    def candidates(self) -> List[Tuple[str, str]]:
+        """Every (provider, model) pair that serves this language, in configured order."""
+        return [
+            (model_enum, lang_models[self.language])
+            for model_enum, lang_models in self.models.items()
+            if lang_models.get(self.language)
+        ]
+
+    def cache_id(self) -> str:
+        """
+        Identifies the models a result may come from, for cache keys. The
+        router can answer from any candidate, so the ordered candidate list
+        is used rather than the first configured model.
+        """
+        return ",".join(f"{provider}/{model_id}" for provider, model_id in self.candidates())
+
+    async def inference(self, prompt: str, response_model: str = None) -> any:
+        return await llm_router.inference(self.candidates(), prompt, response_model)
+
+    async def stream_inference(self, prompt: str, response_model: str = None):
+        async for partial in llm_router.stream(self.candidates(), prompt, response_model):
+            yield partial
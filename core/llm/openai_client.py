@@ -1,6 +1,7 @@
-from openai import OpenAI
+from openai import AsyncOpenAI
 from pydantic import BaseModel
 from dotenv import load_dotenv
+from core.utils.http_utils import create_async_http_client
 import instructor
 import os
 
@@ -9,14 +10,34 @@ load_dotenv(
 )
 
 class OpenAi:
+    # One patched client per process, shared by every request
+    client = None
+
     def __init__(self):
         self.api_key = os.getenv("OPENAI_API_KEY")
-        self.client = instructor.patch(
-            OpenAI(api_key=self.api_key)
+        if OpenAi.client is None:
+            OpenAi.client = instructor.from_openai(
+                AsyncOpenAI(api_key=self.api_key, http_client=create_async_http_client())
+            )
+        self.client = OpenAi.client
+
+    async def inference(self, model_id: str, prompt: str, response_model: BaseModel) -> str:
+        chat_completion = await self.client.chat.completions.create(
+            response_model=response_model,
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt.strip(),
+                }
+            ],
+            model=model_id,
         )
+        return chat_completion
+
 
-    def inference(self, model_id: str, prompt: str, response_model: BaseModel) -> str:
-        chat_completion = self.client.chat.completions.create(
+    async def stream_inference(self, model_id: str, prompt: str, response_model: BaseModel):
+        """Yield partially filled response_model objects as tokens arrive."""
+        partials = self.client.chat.completions.create_partial(
             response_model=response_model,
             messages=[
                 {
@@ -26,4 +47,5 @@ class OpenAi:
             ],
             model=model_id,
         )
-        return chat_completion
\ No newline at end of file
+        async for partial in partials:
+            yield partial
@@ -0,0 +1,261 @@
+from collections import deque
+from typing import List, Optional, Tuple
+from dotenv import load_dotenv
+import numpy as np
+import asyncio
+import os
+import time
+
+load_dotenv("ops/.env")
+
+
+class ProviderStats:
+    """Rolling latency and error rate for one provider/model pair."""
+
+    def __init__(self, window: int = 100):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)  # True for success
+
+    def record(self, latency: float, ok: bool):
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(latency)
+
+    @property
+    def samples(self) -> int:
+        return len(self.latencies)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        return float(np.percentile(self.latencies, q))
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1.0 - sum(self.outcomes) / len(self.outcomes)
+
+    def summary(self) -> dict:
+        return {
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "error_rate": self.error_rate,
+            "samples": len(self.outcomes),
+        }
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures and rejects calls for
+    cooldown seconds. After that a single trial call is let through; success
+    closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial_in_flight:
+            return True
+        return False
+
+    def on_start(self):
+        if self.state == "half_open":
+            self.trial_in_flight = True
+
+    def on_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def on_failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class LLMRouter:
+    """
+    Sends each request to the healthiest candidate provider. Candidates are
+    ranked by rolling p95 latency weighted by error rate, and providers
+    without enough samples keep their configured order. If the first call
+    has not finished after the hedge delay, a second candidate is started
+    and the first answer wins. Failed calls fall through to the next
+    candidate, and providers that keep failing are skipped by their circuit
+    breaker until the cooldown ends.
+
+    providers maps a provider name to a class whose instances have an async
+    inference(model_id, prompt, response_model) method, so fakes can be
+    passed in for tests.
+    """
+
+    def __init__(
+        self,
+        providers: dict,
+        hedge: bool = os.getenv("LLM_HEDGE", "true").lower() == "true",
+        hedge_delay: float = float(os.getenv("LLM_HEDGE_DELAY", "3.0")),
+        min_samples: int = int(os.getenv("LLM_ROUTER_MIN_SAMPLES", "5")),
+        default_latency: float = float(os.getenv("LLM_ROUTER_DEFAULT_LATENCY", "2.0")),
+        error_penalty: float = float(os.getenv("LLM_ROUTER_ERROR_PENALTY", "4.0")),
+        failure_threshold: int = int(os.getenv("LLM_BREAKER_FAILURES", "3")),
+        cooldown: float = float(os.getenv("LLM_BREAKER_COOLDOWN", "30")),
+    ):
+        self.providers = providers
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.min_samples = min_samples
+        self.default_latency = default_latency
+        self.error_penalty = error_penalty
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.stats = {}
+        self.breakers = {}
+
+    def _stats(self, candidate: Tuple[str, str]) -> ProviderStats:
+        if candidate not in self.stats:
+            self.stats[candidate] = ProviderStats()
+        return self.stats[candidate]
+
+    def _breaker(self, candidate: Tuple[str, str]) -> CircuitBreaker:
+        if candidate not in self.breakers:
+            self.breakers[candidate] = CircuitBreaker(self.failure_threshold, self.cooldown)
+        return self.breakers[candidate]
+
+    def score(self, candidate: Tuple[str, str]) -> float:
+        stats = self._stats(candidate)
+        latency = stats.percentile(95) if stats.samples >= self.min_samples else self.default_latency
+        return latency * (1 + self.error_penalty * stats.error_rate)
+
+    def rank(self, candidates: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """Healthy, implemented candidates ordered best first. The sort is stable, so ties keep the configured order."""
+        usable = [
+            candidate for candidate in candidates
+            if candidate[0] in self.providers and self._breaker(candidate).allow()
+        ]
+        return sorted(usable, key=self.score)
+
+    def hedge_delay_for(self, candidate: Tuple[str, str]) -> float:
+        stats = self._stats(candidate)
+        if stats.samples >= self.min_samples:
+            return stats.percentile(95)
+        return self.hedge_delay
+
+    async def _call(self, candidate: Tuple[str, str], prompt: str, response_model):
+        provider, model_id = candidate
+        breaker = self._breaker(candidate)
+        breaker.on_start()
+        start_time = time.monotonic()
+        try:
+            result = await self.providers[provider]().inference(model_id, prompt, response_model)
+        except asyncio.CancelledError:
+            # A hedged call that lost the race says nothing about the provider's health
+            breaker.trial_in_flight = False
+            raise
+        except Exception:
+            self._stats(candidate).record(time.monotonic() - start_time, ok=False)
+            breaker.on_failure()
+            raise
+        self._stats(candidate).record(time.monotonic() - start_time, ok=True)
+        breaker.on_success()
+        return result
+
+    async def inference(self, candidates: List[Tuple[str, str]], prompt: str, response_model=None):
+        remaining = self.rank(candidates)
+        if not remaining:
+            raise ValueError(f"No healthy LLM provider available among {candidates}")
+
+        pending = {}
+        last_error = None
+
+        def launch():
+            candidate = remaining.pop(0)
+            task = asyncio.create_task(self._call(candidate, prompt, response_model))
+            pending[task] = candidate
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if self.hedge and remaining and len(pending) == 1:
+                    timeout = self.hedge_delay_for(next(iter(pending.values())))
+
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    print(f"Hedging LLM request to {remaining[0]}")
+                    launch()
+                    continue
+
+                for task in done:
+                    candidate = pending.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+                    print(f"LLM provider {candidate} failed: {last_error}")
+
+                if not pending and remaining:
+                    launch()
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def stream(self, candidates: List[Tuple[str, str]], prompt: str, response_model=None):
+        """
+        Stream partial results from the best candidate. A candidate that fails
+        before producing anything falls through to the next one; once partial
+        output has been sent, errors are raised to the caller. Streams are not
+        hedged.
+        """
+        remaining = self.rank(candidates)
+        if not remaining:
+            raise ValueError(f"No healthy LLM provider available among {candidates}")
+
+        last_error = None
+        for candidate in remaining:
+            provider, model_id = candidate
+            breaker = self._breaker(candidate)
+            breaker.on_start()
+            start_time = time.monotonic()
+            started = False
+            try:
+                async for partial in self.providers[provider]().stream_inference(model_id, prompt, response_model):
+                    started = True
+                    yield partial
+            except Exception as e:
+                self._stats(candidate).record(time.monotonic() - start_time, ok=False)
+                breaker.on_failure()
+                if started:
+                    raise
+                last_error = e
+                print(f"LLM provider {candidate} failed: {e}")
+                continue
+            except BaseException:
+                breaker.trial_in_flight = False
+                raise
+            self._stats(candidate).record(time.monotonic() - start_time, ok=True)
+            breaker.on_success()
+            return
+        raise last_error
+
+    def summary(self) -> dict:
+        return {
+            f"{provider}/{model_id}": {**stats.summary(), "breaker": self._breaker((provider, model_id)).state}
+            for (provider, model_id), stats in self.stats.items()
+        }
@@ -1,6 +1,14 @@
 from sqlmodel import SQLModel, Field, Relationship, select
+from sqlalchemy import Index
+from datetime import datetime
 from typing import Optional, List
 
+# user_id columns hold User.user_id. They are not database foreign keys, so
+# history for a client that has not registered (e.g. "default_user") is still
+# written instead of failing the whole write batch.
+TRANSCRIPTION_USER_JOIN = {"primaryjoin": "User.user_id == foreign(TranscriptionDB.user_id)"}
+SPEECH_USER_JOIN = {"primaryjoin": "User.user_id == foreign(SpeechDB.user_id)"}
+
 # Define the User database model
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -9,28 +17,38 @@ class User(SQLModel, table=True):
     password_hash: str
 
     # Relationships
-    transcriptions: List["TranscriptionDB"] = Relationship(back_populates="user")
-    speeches: List["SpeechDB"] = Relationship(back_populates="user")
+    transcriptions: List["TranscriptionDB"] = Relationship(back_populates="user", sa_relationship_kwargs=TRANSCRIPTION_USER_JOIN)
+    speeches: List["SpeechDB"] = Relationship(back_populates="user", sa_relationship_kwargs=SPEECH_USER_JOIN)
 
 # Define the Transcription database model
 class TranscriptionDB(SQLModel, table=True):
+    # Per-user history is listed newest first, optionally for one language, and paged by (created_at, id)
+    __table_args__ = (
+        Index("ix_transcriptiondb_user_created", "user_id", "created_at", "id"),
+        Index("ix_transcriptiondb_user_language_created", "user_id", "language", "created_at", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: Optional[int] = Field(default=None, foreign_key="user.id")
+    user_id: Optional[str] = None
     transcription: str
     processed_text: Optional[str] = None
     word_count: int = 0  # Adding word_count to the model
     language: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
 
     # Relationships
-    user: Optional[User] = Relationship(back_populates="transcriptions")
+    user: Optional[User] = Relationship(back_populates="transcriptions", sa_relationship_kwargs=TRANSCRIPTION_USER_JOIN)
 
 # Define the Speech database model
 class SpeechDB(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: Optional[int] = Field(default=None, foreign_key="user.id")
-    audio: bytes
+    user_id: Optional[str] = Field(default=None, index=True)
+    audio: bytes  # Encoded as `codec`; see core.tts.storage
+    codec: str = "flac"  # flac, pcm_s16le, or legacy for rows not yet migrated
+    sample_rate: int = 0
+    duration: float = 0.0  # Seconds
     text: Optional[str] = None
     language: str
 
     # Relationships
-    user: Optional[User] = Relationship(back_populates="speeches")
\ No newline at end of file
+    user: Optional[User] = Relationship(back_populates="speeches", sa_relationship_kwargs=SPEECH_USER_JOIN)
\ No newline at end of file
@@ -5,4 +5,8 @@ class ProcessedText(BaseModel):
 
 
 class ProcessingDecision(BaseModel):
-    decision: bool
\ No newline at end of file
+    decision: bool
+
+class ProcessedCaption(BaseModel):
+    decision: bool
+    processed_text: str
@@ -1,4 +1,6 @@
 from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
 
 class Transcription(BaseModel):
     id: int
@@ -8,8 +10,29 @@ class ProcessedText(BaseModel):
     transcription: str
     processed_text: str
 
+class TranscriptionSummary(BaseModel):
+    """A history entry. The text fields are only filled when requested with `fields`."""
+    id: int
+    language: str
+    word_count: int
+    created_at: datetime
+    transcription: Optional[str] = None
+    processed_text: Optional[str] = None
+
 class TranscriptionResponse(BaseModel):
-    transcriptions: list[Transcription]
+    transcriptions: list[TranscriptionSummary]
+    next_cursor: Optional[str] = None  # Pass as `cursor` for the next page; null on the last page
+
+class TranscriptionSearchResult(BaseModel):
+    id: int
+    language: str
+    created_at: datetime
+    rank: float  # Higher is a better match; only comparable within one search
+    snippet: str  # Matching passage with the matched words in <b></b>
+
+class TranscriptionSearchResponse(BaseModel):
+    results: list[TranscriptionSearchResult]
+    next_offset: Optional[int] = None  # Pass as `offset` for more results; null when there are no more
 
 class SingleTranscriptionResponse(BaseModel):
     transcription: Transcription
@@ -17,4 +40,24 @@ class SingleTranscriptionResponse(BaseModel):
 class WebSocketResponse(BaseModel):
     message_id: str
     text: str
-    type: str
\ No newline at end of file
+    type: str
+    is_final: bool = True  # False for partial processed text that will be replaced
+
+class AudioStreamReady(BaseModel):
+    """Sent in reply to a "start" control message with the format the server will use."""
+    type: str = "ready"
+    codec: str
+    sample_rate: int
+
+
+class AdmissionStatus(BaseModel):
+    """
+    Sent when the server turns a connection away or changes what it does for
+    it: "overloaded" just before closing with code 1013, "degraded" when LLM
+    processing is paused and only raw transcription is sent, "normal" when it
+    resumes.
+    """
+    type: str = "admission"
+    status: str
+    reason: Optional[str] = None
+    retry_after: Optional[float] = None  # Seconds
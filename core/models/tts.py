@@ -1,6 +1,34 @@
 from pydantic import BaseModel
+from typing import Optional
 
 
 # Pydantic model for WebSocket response
 class TTSResponse(BaseModel):
-    audio: str
\ No newline at end of file
+    audio: str
+    chunk_index: int = 0  # Position of this chunk in the message when streaming
+    is_final: bool = True  # False while more chunks of the same message will follow
+    text: Optional[str] = None  # The text this chunk was synthesised from when streaming
+
+
+class TTSStreamEnd(BaseModel):
+    """Sent after the last audio chunk of a streamed message."""
+    type: str = "end"
+    chunks: int
+    sent: int  # Chunks that produced audio; the others were skipped
+
+
+class TTSModelStats(BaseModel):
+    name: str
+    load_time: float
+    memory_bytes: Optional[int] = None  # Resident memory growth while loading, where measurable
+    concurrency: int
+    active: int
+    requests: int
+    average_batch_size: Optional[float] = None
+    average_synthesis_time: Optional[float] = None  # Per batch
+
+
+class TTSModelsResponse(BaseModel):
+    available: list[str]
+    loaded: list[TTSModelStats]
+    cache: Optional[dict] = None  # Hit rate and size of the phrase audio cache
@@ -1,64 +1,111 @@
-import uuid
-import json
-import os
+from core.stt.bodhi_pool import bodhi_pool
+from core.utils.resample_utils import normalize_pcm
 import websockets
-import io
+import traceback
+import asyncio
 
 class BodhiSTT:
-    def __init__(self, model: str = "hi-general-v2-8khz", language: str = "hi"):
+    # Bodhi keeps its own decoding state, so callers send only new audio
+    streaming = True
+
+    def __init__(self, model: str = "hi-general-v2-8khz", language: str = "hi", pool=bodhi_pool):
         self.model = model
         self.language = language
-        self.server_addr = "wss://bodhi.navana.ai"
-        self.api_key = os.environ.get("BODHI_API_KEY")
-        self.customer_id = os.environ.get("BODHI_CUSTOMER_ID")
-
-    async def transcribe_stream(self, audio_buffer: io.BytesIO, chunk_size: int = 4096):
-        if not self.api_key or not self.customer_id:
-            raise ValueError("Please set API key and customer ID in environment variables.")
-
-        request_headers = {
-            "x-api-key": self.api_key,
-            "x-customer-id": self.customer_id,
-        }
-
-        async with websockets.connect(self.server_addr, extra_headers=request_headers) as ws:
-            await ws.send(json.dumps({
-                "config": {
-                    "sample_rate": 16000,
-                    "transaction_id": str(uuid.uuid4()),
-                    "model": self.model,
-                }
-            }))
+        self.pool = pool
+        # Model names end in their native rate, e.g. hi-general-v2-8khz
+        self.sample_rate = 8000 if model.endswith("8khz") else 16000
+        self.stream = None
+        self.segment_id = None
+        self.previous_text = ""  # Track the last transcription of the current segment
 
-            while True:
-                chunk = audio_buffer.read(chunk_size)
-                if not chunk:
-                    break
-                await ws.send(chunk)
+    async def _ensure_stream(self):
+        if self.stream is None:
+            self.stream = await self.pool.acquire(self.model, self.sample_rate)
+        else:
+            await self.pool.ensure_healthy(self.stream)
+
+    async def transcribe_stream(self, audio: memoryview, chunk_size: int = 4096):
+        """Stream mono int16 PCM at self.sample_rate; slices of the memoryview are sent without copying."""
+        await self._ensure_stream()
+
+        for offset in range(0, len(audio), chunk_size):
+            await self.stream.send(audio[offset:offset + chunk_size])
+
+        # Results arrive asynchronously; take what is ready now and leave the rest for poll() or the next call
+        for item in self.poll():
+            yield item
+
+    def poll(self) -> list:
+        """Results the reader task has already received, without waiting for more."""
+        ready = []
+        while self.stream is not None and not self.stream.responses.empty():
+            response_data = self.stream.responses.get_nowait()
+            if response_data is None:
+                # The server has gone; leave the marker for close()
+                self.stream.responses.put_nowait(None)
+                break
+            ready.extend(self._handle_response(response_data))
+        return ready
 
-            await ws.send('{"eof": 1}')
+    def _handle_response(self, response_data: dict):
+        if response_data.get("segment_id") != self.segment_id:
+            self.segment_id = response_data.get("segment_id")
+            self.previous_text = ""
 
-            previous_text = ""  # Track the last transcription
+        transcript_text = response_data.get("text", "")
 
-            async for response in ws:
-                response_data = json.loads(response)
-                transcript_text = response_data.get("text", "")
+        if transcript_text:
+            # Find the new part of the transcription
+            new_text = transcript_text[len(self.previous_text):]
+            self.previous_text = transcript_text  # Update previous_text for the next iteration
 
-                if transcript_text:
-                    # Find the new part of the transcription
-                    new_text = transcript_text[len(previous_text):]
-                    previous_text = transcript_text  # Update previous_text for the next iteration
+            if new_text:
+                yield new_text  # Yield only the new part
 
-                    yield new_text  # Yield only the new part
+        if response_data.get("type") == "complete":
+            self.previous_text = ""
 
+        if response_data.get("eos", False):
+            yield "<EOF>"
+
+    async def close(self):
+        """Send end-of-stream, collect the final results and return the connection to the pool."""
+        if self.stream is None:
+            return []
+
+        stream, self.stream = self.stream, None
+        remaining = []
+        try:
+            await stream.send('{"eof": 1}')
+            while True:
+                response_data = await asyncio.wait_for(stream.responses.get(), timeout=self.pool.connect_timeout)
+                if response_data is None:
+                    break
+                remaining.extend(self._handle_response(response_data))
                 if response_data.get("eos", False):
-                    yield "<EOF>"
+                    break
+        except asyncio.TimeoutError:
+            print(f"Bodhi sent no final result within {self.pool.connect_timeout} seconds; {len(remaining)} partials kept")
+        except websockets.ConnectionClosed as e:
+            print(f"Bodhi connection closed before the final result: {e}")
+        except Exception:
+            print("Collecting the final Bodhi results failed")
+            traceback.print_exc()
+        finally:
+            await self.pool.release(stream, send_eof=False)
+        return remaining
+
     async def transcribe(self, audio_file: str) -> str:
         with open(audio_file, "rb") as file:
-            audio_buffer = io.BytesIO(file.read())
+            audio = memoryview(normalize_pcm(file.read(), self.sample_rate))
 
         full_transcription = ""
-        async for partial_transcription in self.transcribe_stream(audio_buffer):
-            full_transcription += partial_transcription + " "
+        async for partial_transcription in self.transcribe_stream(audio):
+            if partial_transcription != "<EOF>":
+                full_transcription += partial_transcription + " "
+
+        for partial_transcription in await self.close():
+            if partial_transcription != "<EOF>":
+                full_transcription += partial_transcription + " "
 
-        return full_transcription.strip()
\ No newline at end of file
+        return full_transcription.strip()
@@ -0,0 +1,179 @@
+from dotenv import load_dotenv
+import websockets
+import asyncio
+import json
+import os
+import time
+import uuid
+
+load_dotenv(dotenv_path="ops/.env")
+
+
+class BodhiStream:
+    """
+    An authenticated Bodhi connection configured for one transaction. It stays
+    open for the life of a transcription session, and a background task reads
+    server messages into a queue so that sending audio never waits on results.
+    """
+
+    def __init__(self, pool: "BodhiConnectionPool", model: str, sample_rate: int):
+        self.pool = pool
+        self.model = model
+        self.sample_rate = sample_rate
+        self.ws = None
+        self.reader = None
+        self.responses = asyncio.Queue()
+        self.last_activity = 0.0
+
+    async def open(self):
+        self.ws = await websockets.connect(
+            self.pool.server_addr,
+            extra_headers=self.pool.request_headers(),
+            open_timeout=self.pool.connect_timeout,
+        )
+        await self.ws.send(json.dumps({
+            "config": {
+                "sample_rate": self.sample_rate,
+                "transaction_id": str(uuid.uuid4()),
+                "model": self.model,
+            }
+        }))
+        self.responses = asyncio.Queue()
+        self.reader = asyncio.create_task(self._read())
+        self.last_activity = time.monotonic()
+
+    async def _read(self):
+        try:
+            async for message in self.ws:
+                self.responses.put_nowait(json.loads(message))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            # None tells consumers that the server side has gone away
+            self.responses.put_nowait(None)
+
+    @property
+    def closed(self) -> bool:
+        return self.ws is None or self.ws.closed
+
+    async def is_healthy(self) -> bool:
+        if self.closed:
+            return False
+        if time.monotonic() - self.last_activity < self.pool.health_check_interval:
+            return True
+        try:
+            pong = await self.ws.ping()
+            await asyncio.wait_for(pong, timeout=self.pool.health_check_timeout)
+            self.last_activity = time.monotonic()
+            return True
+        except Exception:
+            return False
+
+    async def send(self, chunk):
+        await self.ws.send(chunk)
+        self.last_activity = time.monotonic()
+
+    async def close(self, send_eof: bool = True):
+        if not self.closed:
+            try:
+                if send_eof:
+                    await self.ws.send('{"eof": 1}')
+                await self.ws.close()
+            except websockets.ConnectionClosed:
+                pass
+        if self.reader is not None:
+            self.reader.cancel()
+            self.reader = None
+
+
+class BodhiConnectionPool:
+    """
+    Per-process limit and lifecycle manager for Bodhi streams. Connections are
+    opened with exponential backoff, checked with a ping when idle, and the
+    total number open at once is capped.
+    """
+
+    def __init__(
+        self,
+        server_addr: str = os.getenv("BODHI_SERVER_ADDR", "wss://bodhi.navana.ai"),
+        max_connections: int = int(os.getenv("BODHI_MAX_CONNECTIONS", "100")),
+        acquire_timeout: float = float(os.getenv("BODHI_ACQUIRE_TIMEOUT", "10")),
+        connect_timeout: float = float(os.getenv("BODHI_CONNECT_TIMEOUT", "10")),
+        max_retries: int = int(os.getenv("BODHI_MAX_RETRIES", "3")),
+        backoff_base: float = float(os.getenv("BODHI_BACKOFF_BASE", "0.5")),
+        health_check_interval: float = float(os.getenv("BODHI_HEALTH_CHECK_INTERVAL", "15")),
+        health_check_timeout: float = float(os.getenv("BODHI_HEALTH_CHECK_TIMEOUT", "5")),
+    ):
+        self.server_addr = server_addr
+        self.max_connections = max_connections
+        self.acquire_timeout = acquire_timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self.slots = asyncio.Semaphore(max_connections)
+        self.active = set()
+
+    def request_headers(self) -> dict:
+        api_key = os.environ.get("BODHI_API_KEY")
+        customer_id = os.environ.get("BODHI_CUSTOMER_ID")
+        if not api_key or not customer_id:
+            raise ValueError("Please set API key and customer ID in environment variables.")
+        return {
+            "x-api-key": api_key,
+            "x-customer-id": customer_id,
+        }
+
+    async def acquire(self, model: str, sample_rate: int) -> BodhiStream:
+        try:
+            await asyncio.wait_for(self.slots.acquire(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"No Bodhi connection available ({self.max_connections} in use)")
+
+        stream = BodhiStream(self, model, sample_rate)
+        try:
+            await self._connect(stream)
+        except Exception:
+            self.slots.release()
+            raise
+        self.active.add(stream)
+        return stream
+
+    async def ensure_healthy(self, stream: BodhiStream):
+        """Reconnect the stream in place if the server dropped it or it stopped answering pings."""
+        if await stream.is_healthy():
+            return
+        print("Bodhi connection unhealthy, reconnecting")
+        await stream.close(send_eof=False)
+        await self._connect(stream)
+
+    async def release(self, stream: BodhiStream, send_eof: bool = True):
+        if stream not in self.active:
+            return
+        self.active.discard(stream)
+        try:
+            await stream.close(send_eof=send_eof)
+        finally:
+            self.slots.release()
+
+    async def _connect(self, stream: BodhiStream):
+        attempt = 0
+        while True:
+            try:
+                await stream.open()
+                return
+            except (OSError, asyncio.TimeoutError, websockets.WebSocketException) as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                delay = self.backoff_base * (2 ** (attempt - 1))
+                print(f"Bodhi connection failed due to {type(e).__name__}: {e}. Retrying in {delay:.1f} seconds...")
+                await asyncio.sleep(delay)
+
+    async def close_all(self):
+        for stream in list(self.active):
+            await self.release(stream)
+
+
+bodhi_pool = BodhiConnectionPool()
@@ -1,18 +1,19 @@
 import os
-import io
 import time
 import numpy as np
-import uuid
 import traceback
 from dotenv import load_dotenv
 from groq import AsyncGroq
-from pydub import AudioSegment
 from core.utils.speech_utils import is_silent
+from core.utils.resample_utils import normalize_pcm
+from core.utils.codec_utils import encode_flac_async
 
 load_dotenv(dotenv_path="ops/.env")
 groq_api_key = os.getenv("GROQ_API_KEY")
 
 class GroqSTT:
+    sample_rate = 16000
+
     def __init__(self, model: str = "whisper-large-v3", language: str = "en"):
         self.client = AsyncGroq(api_key=groq_api_key)
         self.model = model
@@ -22,26 +23,21 @@ class GroqSTT:
         self.total_words = 0
         self.previous_word_count = 0  # Track the word count from the previous transcription
 
-    async def transcribe_stream(self, audio_buffer: io.BytesIO) -> str:
+    async def transcribe_stream(self, audio: memoryview) -> str:
+        """Transcribe mono int16 PCM at self.sample_rate."""
 
         start_time = time.time()
 
-        # Reset buffer to the start position
-        audio_buffer.seek(0)
-
-        # Preprocess the audio buffer to check if it is mostly silent
-        if self.is_speech_silent(audio_buffer):
+        # Preprocess the audio to check if it is mostly silent
+        if self.is_speech_silent(audio):
             yield "<EOF>"
             return
-        
-        # Reset the original buffer for transcription use
-        audio_buffer.seek(0)
 
-        audio_file_name = f"temp_{uuid.uuid4().hex}.m4a"
-        
         try:
+            # FLAC is lossless and roughly half the size of the PCM it encodes
+            flac_data = await encode_flac_async(audio, self.sample_rate)
             partial_transcription = await self.client.audio.transcriptions.create(
-                file=(audio_file_name, audio_buffer.read()),
+                file=("audio.flac", flac_data),
                 model=self.model,
                 language=self.language,
                 prompt=""
@@ -58,10 +54,10 @@ class GroqSTT:
 
     async def transcribe(self, audio_file: str) -> str:
         with open(audio_file, "rb") as file:
-            audio_buffer = io.BytesIO(file.read())
+            audio = memoryview(normalize_pcm(file.read(), self.sample_rate))
 
         full_transcription = ""
-        async for partial_transcription in self.transcribe_stream(audio_buffer):
+        async for partial_transcription in self.transcribe_stream(audio):
             if partial_transcription == "<EOF>":
                 break
             full_transcription += partial_transcription
@@ -69,28 +65,9 @@ class GroqSTT:
         return full_transcription.strip()
     
 
-    def is_speech_silent(self, audio_buffer: io.BytesIO) -> bool:
-        # Convert the buffer to an AudioSegment
-        audio_buffer.seek(0)
-        audio_segment = AudioSegment.from_file(audio_buffer, format="wav")  # Handling as WAV format
-        
-        # Convert to numpy array
-        audio_data = np.array(audio_segment.get_array_of_samples())
-
-        # If the audio has more than one channel, convert to mono
-        if audio_segment.channels > 1:
-            audio_data = audio_data.reshape((-1, audio_segment.channels))
-            audio_data = audio_data.mean(axis=1)
-
-        # Normalize the audio data to the range -1 to 1
-        audio_data = audio_data / np.iinfo(audio_data.dtype).max
+    def is_speech_silent(self, audio: memoryview) -> bool:
+        # View the PCM samples in numpy without copying
+        audio_data = np.frombuffer(audio, dtype=np.int16)
 
-        # Debugging: Check the type and shape of the loaded audio data
-        if not isinstance(audio_data, np.ndarray):
-            raise ValueError(f"Expected audio_data to be a numpy.ndarray, but got {type(audio_data)}")
-        
         # Check if the audio is mostly silent
         return is_silent(audio_data)
-
-
-    
\ No newline at end of file
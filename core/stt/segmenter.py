@@ -0,0 +1,133 @@
+from collections import Counter, deque
+from typing import Optional
+from dotenv import load_dotenv
+import numpy as np
+import os
+import re
+import time
+
+load_dotenv(dotenv_path="ops/.env")
+
+# Sentence-final punctuation, including the Devanagari danda
+SENTENCE_END = re.compile(r"[.?!।॥]['\")\]]*$")
+
+
+class Segmenter:
+    """
+    Decides when the transcribed text waiting in a session is ready for LLM
+    processing. A segment is closed when the speaker pauses, when a sentence
+    ends, when the provider reports the end of an utterance, or when the
+    oldest word has waited max_latency seconds, so the worst-case caption
+    delay is bounded regardless of how long someone speaks.
+    """
+
+    # Client overrides are clamped to these (low, high) bounds
+    TUNABLES = {
+        "pause_seconds": (0.1, 10.0),
+        "max_latency": (0.5, 30.0),
+        "min_words": (1, 100),
+        "sentence_min_words": (1, 200),
+        "max_words": (1, 500),
+    }
+
+    def __init__(
+        self,
+        pause_seconds: float = float(os.getenv("SEGMENT_PAUSE_SECONDS", "0.7")),
+        max_latency: float = float(os.getenv("SEGMENT_MAX_LATENCY", "6.0")),
+        min_words: int = int(os.getenv("SEGMENT_MIN_WORDS", "3")),
+        sentence_min_words: int = int(os.getenv("SEGMENT_SENTENCE_MIN_WORDS", "8")),
+        max_words: int = int(os.getenv("SEGMENT_MAX_WORDS", "60")),
+    ):
+        self.pause_seconds = pause_seconds
+        self.max_latency = max_latency
+        self.min_words = min_words
+        self.sentence_min_words = sentence_min_words
+        self.max_words = max_words
+
+        self.text = ""
+        self.word_count = 0
+        self.started_at = None  # When the oldest waiting word arrived
+        self.wait_times = deque(maxlen=500)
+        self.reasons = Counter()
+
+    def configure(self, settings: dict) -> list:
+        """
+        Apply per-session overrides sent by the client. Values are clamped to
+        TUNABLES' bounds. Unknown keys and values that are not finite numbers
+        are ignored and returned, so the caller can report them.
+        """
+        if not isinstance(settings, dict):
+            return [settings]
+
+        rejected = []
+        for name, value in settings.items():
+            if name not in self.TUNABLES or isinstance(value, bool):
+                rejected.append(name)
+                continue
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                rejected.append(name)
+                continue
+            if not np.isfinite(value):
+                rejected.append(name)
+                continue
+            low, high = self.TUNABLES[name]
+            value = min(max(value, low), high)
+            setattr(self, name, round(value) if isinstance(low, int) else value)
+
+        return rejected
+
+    def add(self, text: str):
+        if not text.strip():
+            return
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+        self.text += text + " "
+        self.word_count += len(text.split())
+
+    @property
+    def age(self) -> float:
+        return 0.0 if self.started_at is None else time.monotonic() - self.started_at
+
+    def time_until_deadline(self) -> Optional[float]:
+        """Seconds until the latency budget forces a segment, or None when nothing is waiting."""
+        if self.started_at is None:
+            return None
+        return max(0.0, self.max_latency - self.age)
+
+    def ready(self, trailing_silence: float = 0.0, end_of_speech: bool = False) -> Optional[str]:
+        """Return why the waiting text should be processed now, or None to keep waiting."""
+        if not self.word_count:
+            return None
+        if end_of_speech:
+            return "end_of_speech"
+        if self.word_count >= self.max_words:
+            return "max_words"
+        if self.age >= self.max_latency:
+            return "latency"
+        if trailing_silence >= self.pause_seconds and self.word_count >= self.min_words:
+            return "pause"
+        if self.word_count >= self.sentence_min_words and SENTENCE_END.search(self.text.strip()):
+            return "sentence"
+        return None
+
+    def pop(self, reason: str) -> str:
+        text = self.text.strip()
+        if text:
+            self.wait_times.append(self.age)
+            self.reasons[reason] += 1
+        self.text = ""
+        self.word_count = 0
+        self.started_at = None
+        return text
+
+    def metrics(self) -> dict:
+        waits = np.array(self.wait_times) if self.wait_times else np.zeros(1)
+        return {
+            "segments": sum(self.reasons.values()),
+            "reasons": dict(self.reasons),
+            "wait_mean": float(waits.mean()),
+            "wait_p95": float(np.percentile(waits, 95)),
+            "wait_max": float(waits.max()),
+        }
@@ -0,0 +1,208 @@
+from dotenv import load_dotenv
+from core.stt.stt import STT
+from core.utils.codec_utils import create_decoder
+from core.utils.vad_utils import VoiceActivityDetector
+import math
+import os
+import re
+
+load_dotenv(dotenv_path="ops/.env")
+
+# Longest run of words compared when aligning a new hypothesis with what was already sent
+MAX_ALIGNMENT_WORDS = 12
+
+
+def _normalize_word(word: str) -> str:
+    return re.sub(r"[^\w]", "", word.lower())
+
+
+class TranscriptionSession:
+    """
+    Long-lived transcription state for one WebSocket connection.
+
+    Incoming audio is kept in a rolling PCM buffer. Once enough new audio has
+    arrived, a window made of the new audio plus a short overlap from the
+    previous window is sent to the STT provider. Words that fall in the overlap
+    are held back until the next window confirms them, and each hypothesis is
+    aligned with the words already emitted so nothing is repeated or lost at
+    chunk boundaries.
+
+    Audio arrives in the codec and sample rate negotiated for the connection
+    and is decoded and resampled once, straight to the provider's native
+    rate, before it reaches the buffer.
+    """
+
+    def __init__(
+        self,
+        language: str,
+        codec: str = "pcm_s16le",
+        input_rate: int = 16000,
+        min_chunk_seconds: float = float(os.getenv("STT_MIN_CHUNK_SECONDS", "3.0")),
+        overlap_seconds: float = float(os.getenv("STT_OVERLAP_SECONDS", "1.0")),
+        max_window_seconds: float = float(os.getenv("STT_MAX_WINDOW_SECONDS", "15.0")),
+    ):
+        self.language = language
+        self.codec = codec
+        self.input_rate = input_rate
+        self.stt = STT(language=language)
+        self.sample_rate = self.stt.sample_rate
+        self.decoder = create_decoder(codec, self.sample_rate, input_rate)
+        self.min_chunk_bytes = self._to_bytes(min_chunk_seconds)
+        self.overlap_bytes = self._to_bytes(overlap_seconds)
+        self.max_window_bytes = self._to_bytes(max_window_seconds)
+
+        self.ring = bytearray()
+        self.pending_bytes = 0  # Audio in the ring that has not been transcribed yet
+        self.emitted_words = []  # Normalised tail of the words already sent
+        self.held_back = []  # Words from the overlap waiting for confirmation
+        self.upstream_calls = 0
+        self.received_seconds = 0.0  # Decoded audio received, for usage limits
+
+        self.vad = VoiceActivityDetector(sample_rate=self.sample_rate)
+        self.vad_events = []  # Speech start/end points since the last transcription
+        self.pending_speech = False  # Whether the untranscribed audio contains speech
+
+    def _to_bytes(self, seconds: float) -> int:
+        # Keep the size aligned to whole int16 samples
+        return int(seconds * self.sample_rate) * 2
+
+    async def feed(self, audio_data: bytes) -> bytes:
+        return self._append(await self.decoder.decode(audio_data))
+
+    def _append(self, pcm_data: bytes) -> bytes:
+        self.received_seconds += len(pcm_data) / 2 / self.sample_rate
+        self.ring.extend(pcm_data)
+        self.pending_bytes += len(pcm_data)
+
+        self.vad_events.extend(self.vad.process(pcm_data))
+        self.pending_speech = self.pending_speech or self.vad.in_speech or bool(self.vad_events)
+
+        # Drop audio that can no longer be part of a window
+        excess = len(self.ring) - self.max_window_bytes
+        if excess > 0:
+            del self.ring[:excess]
+            self.pending_bytes = min(self.pending_bytes, len(self.ring))
+        return pcm_data
+
+    @property
+    def trailing_silence(self) -> float:
+        """Seconds of non-speech at the end of the audio received so far."""
+        return self.vad.trailing_silence
+
+    @property
+    def streaming(self) -> bool:
+        return self.stt.streaming
+
+    def poll(self) -> list:
+        """Text a streaming provider has produced since audio was last sent."""
+        return self.stt.poll() if self.stt.streaming else []
+
+    def ready(self) -> bool:
+        return self.pending_bytes >= self.min_chunk_bytes
+
+    async def transcribe_stream(self, audio_data: bytes = b"", flush: bool = False):
+        """
+        Add audio to the session and yield newly confirmed text. Yields "<EOF>"
+        when the provider reports the end of an utterance. With flush=True any
+        buffered audio and held-back words are emitted.
+        """
+        if self.stt.streaming:
+            # The provider keeps its own stream state, so forward new audio as-is
+            async for partial_transcription in self._transcribe_streaming(audio_data, flush):
+                yield partial_transcription
+            return
+
+        if audio_data:
+            await self.feed(audio_data)
+        if flush:
+            # The decoder may still hold audio back, e.g. a WebM demuxer waiting for more data
+            pcm_data = await self.decoder.flush()
+            if pcm_data:
+                self._append(pcm_data)
+
+        if not self.pending_bytes or (not flush and not self.ready()):
+            if flush and self.held_back:
+                yield self._release_held_back()
+            return
+
+        window_bytes = min(self.pending_bytes + self.overlap_bytes, len(self.ring))
+        # Slicing copies the window once, so the ring can still be resized below
+        window = memoryview(self.ring[-window_bytes:])
+        overlap_fraction = 0.0 if flush else (window_bytes - self.pending_bytes) / window_bytes
+
+        has_speech = self.pending_speech
+        self.pending_bytes = 0
+        self.pending_speech = self.vad.in_speech
+        self.vad_events = []
+        del self.ring[:-self.overlap_bytes or None]
+
+        hypothesis = []
+        end_of_speech = not has_speech
+        if has_speech:
+            self.upstream_calls += 1
+            async for partial_transcription in self.stt.transcribe_stream(window):
+                if partial_transcription == "<EOF>":
+                    end_of_speech = True
+                    continue
+                hypothesis.append(partial_transcription)
+
+        new_text = self._merge(" ".join(hypothesis), overlap_fraction, release=flush or end_of_speech)
+        if new_text:
+            yield new_text
+        if end_of_speech:
+            yield "<EOF>"
+
+    async def _transcribe_streaming(self, audio_data: bytes, flush: bool):
+        pcm_data = await self.decoder.decode(audio_data) if audio_data else b""
+        if flush:
+            pcm_data += await self.decoder.flush()
+        if pcm_data:
+            self.received_seconds += len(pcm_data) / 2 / self.sample_rate
+            self.vad.process(pcm_data)
+            self.upstream_calls += 1
+            async for partial_transcription in self.stt.transcribe_stream(memoryview(pcm_data)):
+                yield partial_transcription
+        if flush:
+            for partial_transcription in await self.stt.close():
+                yield partial_transcription
+
+    async def close(self):
+        self.decoder.close()
+        await self.stt.close()
+
+    def _merge(self, hypothesis: str, overlap_fraction: float, release: bool) -> str:
+        words = hypothesis.split()
+        if not words:
+            # Nothing new was heard, so the previous overlap words will not be re-confirmed
+            return self._release_held_back() if release else ""
+        normalized = [_normalize_word(word) for word in words]
+
+        # Skip the words at the start of the hypothesis that were already emitted
+        skip = 0
+        best = (0, 0)  # (matching words, -mismatches) of the chosen alignment
+        tail = self.emitted_words[-MAX_ALIGNMENT_WORDS:]
+        for k in range(1, min(len(tail), len(normalized)) + 1):
+            score = sum(a == b for a, b in zip(tail[-k:], normalized[:k]))
+            # Short overlaps must match exactly, or a common word lining up by chance drops a real one.
+            # Longer ones tolerate one mismatch (a word cut at the boundary).
+            if score < (k if k < 3 else k - 1):
+                continue
+            if (score, score - k) > best:
+                skip, best = k, (score, score - k)
+
+        words = words[skip:]
+        if release:
+            hold = 0
+        else:
+            hold = min(len(words), math.ceil(len(words) * overlap_fraction))
+
+        confirmed = words[:len(words) - hold]
+        self.held_back = words[len(words) - hold:]
+        self.emitted_words = (self.emitted_words + [_normalize_word(word) for word in confirmed])[-MAX_ALIGNMENT_WORDS:]
+        return " ".join(confirmed)
+
+    def _release_held_back(self) -> str:
+        text = " ".join(self.held_back)
+        self.emitted_words = (self.emitted_words + [_normalize_word(word) for word in self.held_back])[-MAX_ALIGNMENT_WORDS:]
+        self.held_back = []
+        return text
@@ -1,7 +1,8 @@
-from io import BytesIO
-from typing import Tuple, Union
+from typing import Tuple
 from core.stt.groq_client import GroqSTT
 from core.stt.bodhi_client import BodhiSTT
+from core.stt.whisper_client import LocalWhisperSTT, WHISPER_MODEL
+import os
 
 class STT:
     def __init__(self, language: str):
@@ -14,11 +15,21 @@ class STT:
                 "hi": "hi-general-v2-8khz",  # Default model for Hindi in Bodhi
                 "kn": "kn-general-v2-8khz",  # Default model for Kannada
                 # Add other languages and corresponding models
+            },
+            "WHISPER": {
+                "en": WHISPER_MODEL,  # Local faster-whisper, used when STT_PROVIDER=WHISPER
+                "hi": WHISPER_MODEL,
+                "kn": WHISPER_MODEL,
+                "ml": WHISPER_MODEL,
             }
         }
         self.model_id, self.model_enum = self._select_model()
+        self.provider = self._load_provider()
 
     def _select_model(self) -> Tuple[str, str]:
+        preferred = os.getenv("STT_PROVIDER")
+        if preferred and self.language in self.models.get(preferred, {}):
+            return self.models[preferred][self.language], preferred
         for model_enum, lang_models in self.models.items():
             if self.language in lang_models:
                 return lang_models[self.language], model_enum
@@ -27,14 +38,38 @@ class STT:
     def list_models(self):
         return self.models
 
-    async def transcribe_stream(self, audio_buffer: Union[str, BytesIO]):
+    def _load_provider(self):
         if self.model_enum == "GROQ":
-            groq_stt = GroqSTT(self.model_id, language=self.language)
-            async for partial_transcription in groq_stt.transcribe_stream(audio_buffer):
-                yield partial_transcription
+            return GroqSTT(self.model_id, language=self.language)
         elif self.model_enum == "BODHI":
-            bodhi_stt = BodhiSTT(self.model_id, language=self.language)
-            async for partial_transcription in bodhi_stt.transcribe_stream(audio_buffer):
-                yield partial_transcription
+            return BodhiSTT(self.model_id, language=self.language)
+        elif self.model_enum == "WHISPER":
+            return LocalWhisperSTT(self.model_id, language=self.language)
         else:
-            raise ValueError(f"Unsupported language: {self.language}")
\ No newline at end of file
+            raise ValueError(f"Unsupported language: {self.language}")
+
+    @property
+    def sample_rate(self) -> int:
+        """Native rate of the provider; audio must be resampled to it before transcribe_stream."""
+        return self.provider.sample_rate
+
+    @property
+    def streaming(self) -> bool:
+        return getattr(self.provider, "streaming", False)
+
+    async def transcribe_stream(self, audio: memoryview):
+        """Transcribe mono int16 PCM at self.sample_rate."""
+        async for partial_transcription in self.provider.transcribe_stream(audio):
+            yield partial_transcription
+
+    def poll(self) -> list:
+        """Results a streaming provider received since the last call, without sending audio."""
+        if hasattr(self.provider, "poll"):
+            return self.provider.poll()
+        return []
+
+    async def close(self) -> list:
+        """Release provider resources and return any final results it still had."""
+        if hasattr(self.provider, "close"):
+            return await self.provider.close()
+        return []
@@ -0,0 +1,224 @@
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from core.utils.resample_utils import normalize_pcm
+import numpy as np
+import threading
+import asyncio
+import time
+import os
+
+load_dotenv(dotenv_path="ops/.env")
+
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "small")
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")  # "int8", "int8_float32", "float32"
+WHISPER_CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", "0"))  # 0 lets CTranslate2 decide
+WHISPER_WORKERS = int(os.getenv("WHISPER_WORKERS", "1"))
+WHISPER_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "8"))
+WHISPER_BATCH_WAIT = float(os.getenv("WHISPER_BATCH_WAIT_MS", "50")) / 1000
+WHISPER_BEAM_SIZE = int(os.getenv("WHISPER_BEAM_SIZE", "1"))
+WHISPER_NO_SPEECH_THRESHOLD = float(os.getenv("WHISPER_NO_SPEECH_THRESHOLD", "0.6"))
+
+# Inference gets its own threads so it never queues behind the shared executor
+whisper_executor = ThreadPoolExecutor(max_workers=WHISPER_WORKERS, thread_name_prefix="whisper")
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """Load the CTranslate2 Whisper model once per worker process."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from faster_whisper import WhisperModel
+
+                start_time = time.time()
+                _model = WhisperModel(
+                    WHISPER_MODEL,
+                    device="cpu",
+                    compute_type=WHISPER_COMPUTE_TYPE,
+                    cpu_threads=WHISPER_CPU_THREADS,
+                    num_workers=WHISPER_WORKERS,
+                )
+                print(f"Loaded Whisper model {WHISPER_MODEL} ({WHISPER_COMPUTE_TYPE}) in {time.time() - start_time:.2f} seconds")
+    return _model
+
+
+def transcribe_batch(audios: list, languages: list) -> list:
+    """
+    Run one padded encoder/decoder pass over several 16 kHz float32 clips.
+    Returns one string per clip, empty when the model reports no speech.
+    """
+    import ctranslate2
+    from faster_whisper.tokenizer import Tokenizer
+
+    model = get_model()
+    max_frames = model.feature_extractor.nb_max_frames
+
+    features = []
+    for audio in audios:
+        # Clips are padded (or trimmed) to the 30 second window Whisper expects
+        feature = model.feature_extractor(audio)[:, :max_frames]
+        if feature.shape[1] < max_frames:
+            feature = np.pad(feature, ((0, 0), (0, max_frames - feature.shape[1])))
+        features.append(feature)
+    features = ctranslate2.StorageView.from_array(np.ascontiguousarray(np.stack(features), dtype=np.float32))
+
+    tokenizers = {}
+    prompts = []
+    for language in languages:
+        if language not in tokenizers:
+            tokenizers[language] = Tokenizer(
+                model.hf_tokenizer,
+                model.model.is_multilingual,
+                task="transcribe",
+                language=language,
+            )
+        prompts.append(model.get_prompt(tokenizers[language], [], without_timestamps=True))
+
+    results = model.model.generate(
+        features,
+        prompts,
+        beam_size=WHISPER_BEAM_SIZE,
+        max_length=448,  # Whisper's decoder context
+        suppress_blank=True,
+        suppress_tokens=[-1],
+        return_no_speech_prob=True,
+    )
+
+    texts = []
+    for result, language in zip(results, languages):
+        tokenizer = tokenizers[language]
+        if result.no_speech_prob > WHISPER_NO_SPEECH_THRESHOLD:
+            texts.append("")
+            continue
+        tokens = [token for token in result.sequences_ids[0] if token < tokenizer.eot]
+        texts.append(tokenizer.decode(tokens).strip())
+    return texts
+
+
+class WhisperBatcher:
+    """
+    Collects clips from every session in the process and runs them through
+    the model together. A batch is sent once it is full or the oldest clip
+    has waited batch_wait seconds.
+    """
+
+    def __init__(self, batch_size: int = WHISPER_BATCH_SIZE, batch_wait: float = WHISPER_BATCH_WAIT):
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.queue = None
+        self.worker = None
+        self.in_flight = set()
+        self.stats = {
+            "batches": 0,
+            "clips": 0,
+            "audio_seconds": 0.0,
+            "inference_seconds": 0.0,
+        }
+
+    def _ensure_worker(self):
+        if self.worker is None or self.worker.done():
+            self.queue = asyncio.Queue()
+            self.worker = asyncio.create_task(self._run())
+
+    async def transcribe(self, audio: np.ndarray, language: str) -> str:
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((audio, language, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout=timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Several batches may be in flight when the executor has more than one worker
+            task = asyncio.create_task(self._process(batch))
+            self.in_flight.add(task)
+            task.add_done_callback(self.in_flight.discard)
+
+    async def _process(self, batch: list):
+        audios = [item[0] for item in batch]
+        languages = [item[1] for item in batch]
+        start_time = time.time()
+        try:
+            texts = await asyncio.get_running_loop().run_in_executor(
+                whisper_executor, transcribe_batch, audios, languages
+            )
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        elapsed = time.time() - start_time
+        audio_seconds = sum(len(audio) for audio in audios) / 16000
+        self.stats["batches"] += 1
+        self.stats["clips"] += len(batch)
+        self.stats["audio_seconds"] += audio_seconds
+        self.stats["inference_seconds"] += elapsed
+        print(f"Whisper batch of {len(batch)} ({audio_seconds:.1f}s audio) in {elapsed:.4f} seconds")
+
+        for (_, _, future), text in zip(batch, texts):
+            if not future.done():
+                future.set_result(text)
+
+    def throughput(self) -> dict:
+        """Audio seconds transcribed per second of inference, overall and per CPU core."""
+        inference_seconds = self.stats["inference_seconds"] or 1.0
+        realtime_factor = self.stats["audio_seconds"] / inference_seconds
+        cores = WHISPER_CPU_THREADS or os.cpu_count() or 1
+        return {
+            **self.stats,
+            "realtime_factor": realtime_factor,
+            "realtime_factor_per_core": realtime_factor / cores,
+        }
+
+
+whisper_batcher = WhisperBatcher()
+
+
+class LocalWhisperSTT:
+    sample_rate = 16000  # Whisper's feature extractor expects 16 kHz
+
+    def __init__(self, model: str = WHISPER_MODEL, language: str = "en", batcher: WhisperBatcher = whisper_batcher):
+        self.model = model
+        self.language = language
+        self.batcher = batcher
+
+    async def transcribe_stream(self, audio: memoryview):
+        """Transcribe mono int16 PCM at self.sample_rate."""
+        start_time = time.time()
+
+        samples = np.frombuffer(audio, dtype=np.int16).astype(np.float32) / 32768.0
+
+        text = await self.batcher.transcribe(samples, self.language)
+        print(f"Transcription time: {time.time() - start_time:.4f} seconds")
+
+        if not text:
+            yield "<EOF>"
+            return
+        yield text
+
+    async def transcribe(self, audio_file: str) -> str:
+        with open(audio_file, "rb") as file:
+            audio = memoryview(normalize_pcm(file.read(), self.sample_rate))
+
+        full_transcription = ""
+        async for partial_transcription in self.transcribe_stream(audio):
+            if partial_transcription == "<EOF>":
+                break
+            full_transcription += partial_transcription
+
+        return full_transcription.strip()
@@ -1,14 +1,15 @@
-from core.utils.speech_utils import convert_audio_to_wav
-from core.tts.bhashini_api import *
-import json
+from core.tts.bhashini_api import Bhashini
+import os
 
 class Ai4BharatTTS:
     def __init__(self, model_name: str, language: str):
         self.model_name = model_name
         self.language = language
-        self.TTS = Bhashini()
+        self.sample_rate = int(os.getenv("BHASHINI_TTS_SAMPLE_RATE", "8000"))
+        self.batchable = False  # Remote API, one utterance per request
+        self.TTS = Bhashini()  # Shares one connection pool and pipeline config across instances
 
-    def speech(self, text: str) -> bytes:
+    async def speech(self, text: str) -> str:
         targetLanguage = self.language
         ttsServiceId = self.model_name
         text = text
@@ -17,7 +18,7 @@ class Ai4BharatTTS:
         print(ttsServiceId)
         print(text)
 
-        response = self.TTS.textToSpeech(ttsServiceId,text,targetLanguage)
+        response = await self.TTS.textToSpeech(ttsServiceId,text,targetLanguage,self.sample_rate)
         print(response)
         #print(response.text)
 
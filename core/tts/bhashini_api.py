@@ -1,18 +1,78 @@
-import requests
+import asyncio
+import httpx
+import time
 import os
 from dotenv import load_dotenv
+from core.utils.http_utils import create_async_http_client
 
 load_dotenv(
     dotenv_path="ops/.env"
 )
 
+availableLang = ['bn', 'en', 'gu', 'hi', 'kn', 'ml', 'mr', 'or', 'pa','ta','te']
+
+# Worth retrying: the server is overloaded or a gateway timed out
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+
+class BhashiniError(Exception):
+    pass
+
+
 class Bhashini:
+    """
+    Async client for the ULCA pipeline-config API and the Dhruva inference
+    API. All instances share one pooled HTTP client and one pipeline config,
+    which is fetched on first use and refreshed after BHASHINI_CONFIG_TTL
+    seconds. Creating an instance does no I/O.
+    """
     ulcaBaseURL = os.getenv("ulcaBaseURL")
     modelPipelineEndpoint = os.getenv("modelPipelineEndpoint")
     userId = os.getenv("userId")
     ulcaApiKey =  os.getenv("ulcaApiKey")
+    pipelineId = os.getenv("BHASHINI_PIPELINE_ID", "64392f96daac500b55c543cd")
+
+    # Used when the pipeline config does not name an inference endpoint
+    defaultCallbackUrl = os.getenv(
+        "BHASHINI_INFERENCE_URL", "https://dhruva-api.bhashini.gov.in/services/inference/pipeline"
+    )
+    defaultInferenceApiKey = os.getenv(
+        "BHASHINI_INFERENCE_API_KEY", "hXd6A71xfDHygwnSEXUjFsmd64Vi8vpmhV4geokrx37JZQYXLf0QKsEaABvz4GRX"
+    )
+
+    configTtl = float(os.getenv("BHASHINI_CONFIG_TTL", "3600"))
+    maxRetries = int(os.getenv("BHASHINI_MAX_RETRIES", "2"))
+    backoffBase = float(os.getenv("BHASHINI_BACKOFF_BASE", "0.5"))
+
+    # Shared by every instance in the process
+    client = None
+    config = None
+    configFetchedAt = 0.0
+    configLock = None
 
     def __init__(self):
+        if Bhashini.client is None:
+            Bhashini.client = create_async_http_client(timeout=float(os.getenv("BHASHINI_TIMEOUT", "10")))
+            Bhashini.configLock = asyncio.Lock()
+
+    async def _post(self, url: str, body: dict, headers: dict) -> dict:
+        """POST with retries and exponential backoff on connection errors and overload responses."""
+        for attempt in range(self.maxRetries + 1):
+            try:
+                response = await self.client.post(url, json=body, headers=headers)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    return response.json()
+                error = BhashiniError(f"{url} returned {response.status_code}")
+            except httpx.TransportError as e:
+                error = e
+            if attempt < self.maxRetries:
+                delay = self.backoffBase * 2 ** attempt
+                print(f"Bhashini request failed ({error}), retrying in {delay:.1f} seconds")
+                await asyncio.sleep(delay)
+        raise BhashiniError(f"Bhashini request to {url} failed after {self.maxRetries + 1} attempts: {error}")
+
+    async def _fetchConfig(self) -> dict:
         body = {
             "pipelineTasks" : [
                 {
@@ -21,49 +81,75 @@ class Bhashini:
                 {
                     "taskType": "translation"
                 },
-                {  
+                {
                     "taskType": "tts"
                 }
             ],
             "pipelineRequestConfig" : {
-                "pipelineId": "64392f96daac500b55c543cd"
+                "pipelineId": self.pipelineId
             }
         }
-        
-        self.response = requests.post(url=self.ulcaBaseURL + self.modelPipelineEndpoint,
-                                      json=body, 
-                                      headers={
-                                            "userID": self.userId, 
-                                            "ulcaApiKey": self.ulcaApiKey}).json()
-
-        self.nmtData = self.response['pipelineResponseConfig'][1]['config']
-        self.ttsData = self.response['pipelineResponseConfig'][2]['config']
-        availableLang = ['bn', 'en', 'gu', 'hi', 'kn', 'ml', 'mr', 'or', 'pa','ta','te']
-        self.asrConfigs = {}
-        self.nmtConfigs = {}
-        self.ttsConfigs = {}
 
-        for i in availableLang:
-            self.nmtConfigs[i] = []
+        response = await self._post(self.ulcaBaseURL + self.modelPipelineEndpoint,
+                                    body,
+                                    {
+                                        "userID": self.userId,
+                                        "ulcaApiKey": self.ulcaApiKey})
+
+        nmtData = response['pipelineResponseConfig'][1]['config']
+        ttsData = response['pipelineResponseConfig'][2]['config']
+        nmtConfigs = {}
+        ttsConfigs = {}
 
         for i in availableLang:
             data = []
-            for j in self.nmtData:
+            for j in nmtData:
                 if (j['language']['sourceLanguage'] == i):
                     data.append({'targetLanguage':j['language']['targetLanguage'],'serviceId': j['serviceId']})
-            self.nmtConfigs[i] = data
+            nmtConfigs[i] = data
 
-        for i in self.ttsData:
+        for i in ttsData:
             if (i['language']['sourceLanguage'] in availableLang):
-                self.ttsConfigs[i['language']['sourceLanguage']] = i['serviceId']
+                ttsConfigs[i['language']['sourceLanguage']] = i['serviceId']
 
-        self.inferenceApiKey = {
-            "Authorization": "hXd6A71xfDHygwnSEXUjFsmd64Vi8vpmhV4geokrx37JZQYXLf0QKsEaABvz4GRX"
+        # The config names the inference endpoint and key to use; fall back to the configured ones
+        endpoint = response.get('pipelineInferenceAPIEndPoint') or {}
+        apiKey = (endpoint.get('inferenceApiKey') or {}).get('value') or self.defaultInferenceApiKey
+
+        return {
+            "response": response,
+            "nmtConfigs": nmtConfigs,
+            "ttsConfigs": ttsConfigs,
+            "callbackUrl": endpoint.get('callbackUrl') or self.defaultCallbackUrl,
+            "inferenceApiKey": {"Authorization": apiKey},
         }
 
-        self.callbackUrl = "https://dhruva-api.bhashini.gov.in/services/inference/pipeline"
+    def _configFresh(self) -> bool:
+        return Bhashini.config is not None and time.monotonic() - Bhashini.configFetchedAt < self.configTtl
+
+    async def getConfig(self) -> dict:
+        if self._configFresh():
+            return Bhashini.config
 
-    def sendHeaderWithConfig(self, sourceLanguage, targetLanguage):
+        async with Bhashini.configLock:
+            # Another request may have refreshed it while we waited
+            if self._configFresh():
+                return Bhashini.config
+            try:
+                Bhashini.config = await self._fetchConfig()
+            except Exception as e:
+                if Bhashini.config is None:
+                    raise
+                # Keep serving with the old config rather than failing every request
+                print(f"Bhashini config refresh failed, using cached config: {e}")
+            Bhashini.configFetchedAt = time.monotonic()
+        return Bhashini.config
+
+    async def _infer(self, body: dict) -> dict:
+        config = await self.getConfig()
+        return await self._post(config["callbackUrl"], body, config["inferenceApiKey"])
+
+    async def sendHeaderWithConfig(self, sourceLanguage, targetLanguage):
         header = {
             "pipelineTasks": [
                 {
@@ -97,16 +183,15 @@ class Bhashini:
             }
         }
         try:
-            response = requests.post(url=self.ulcaBaseURL + self.modelPipelineEndpoint, 
-                                     json=header, 
-                                     headers={"userID": self.userId, "ulcaApiKey": self.apiKey})
-            return response.json()
+            return await self._post(self.ulcaBaseURL + self.modelPipelineEndpoint,
+                                    header,
+                                    {"userID": self.userId, "ulcaApiKey": self.ulcaApiKey})
         except Exception as e:
             print(f"Error: {e}")
             return None
-    
 
-    def speechToText(self, sourceLanguage, asrServiceId, payload):
+
+    async def speechToText(self, sourceLanguage, asrServiceId, payload):
         body = {
                 "pipelineTasks": [
                     {
@@ -130,14 +215,12 @@ class Bhashini:
                 }
             }
 
-        response = requests.post(self.callbackUrl,
-                                 headers=self.inferenceApiKey,
-                                 json=body).json()['pipelineResponse'][0]['output'][0]['source']
-        return response
+        response = await self._infer(body)
+        return response['pipelineResponse'][0]['output'][0]['source']
 
-    def textToSpeech(self,ttsServiceId,text,targetLanguage):
+    async def textToSpeech(self,ttsServiceId,text,targetLanguage,samplingRate=8000):
         body = {
-                "pipelineTasks": [       
+                "pipelineTasks": [
                 {
                     "taskType": "tts",
                     "config": {
@@ -146,7 +229,7 @@ class Bhashini:
                         },
                         "serviceId": ttsServiceId,
                         "gender": "male",
-                        "samplingRate": 8000
+                        "samplingRate": samplingRate
                     }
                 }
             ],
@@ -159,9 +242,4 @@ class Bhashini:
             }
         }
 
-        response = requests.post(self.callbackUrl,
-                                 headers=self.inferenceApiKey,
-                                 json=body)
-        return response.json() #audiodata in base 64
-    
-    
\ No newline at end of file
+        return await self._infer(body) #audiodata in base 64
@@ -0,0 +1,246 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Union
+from dotenv import load_dotenv
+import asyncio
+import hashlib
+import os
+import re
+
+load_dotenv(dotenv_path="ops/.env")
+
+# File reads, writes and evictions, kept off the event loop
+cache_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("TTS_CACHE_IO_WORKERS", "2")), thread_name_prefix="tts-cache"
+)
+
+# Providers return WAV bytes (Coqui) or base64 text (ai4bharat); the file suffix records which
+SUFFIXES = {bytes: ".wav", str: ".b64"}
+
+
+def normalize_phrase(text: str) -> str:
+    """Whitespace and case do not change the audio, punctuation does, so it is kept."""
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+class TTSAudioCache:
+    """
+    Cache of synthesised audio for short phrases, keyed by model, language,
+    voice and normalised text.
+
+    Recently used entries are kept in memory in an LRU bounded by total
+    bytes. Every entry is also written to one file per phrase under
+    cache_dir, bounded by disk_bytes with least-recently-used eviction, so
+    the cache survives restarts and is shared by workers on the same host.
+    Disk entries are read whole, since a hit is promoted to the memory tier
+    and handed to code that needs bytes. File modification times record last
+    use, so the LRU order is rebuilt from the directory on startup. Each
+    worker only counts the files it knows about, so with several workers
+    the disk bound is approximate. File I/O runs in cache_executor; the
+    index itself is only touched on the event loop.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = os.getenv("TTS_CACHE_DIR", ".cache/tts"),
+        memory_bytes: int = int(os.getenv("TTS_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024))),
+        disk_bytes: int = int(os.getenv("TTS_CACHE_DISK_BYTES", str(1024 * 1024 * 1024))),
+        max_text_chars: int = int(os.getenv("TTS_CACHE_MAX_TEXT_CHARS", "200")),
+        enabled: bool = os.getenv("TTS_CACHE", "true").lower() == "true",
+    ):
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.max_text_chars = max_text_chars
+        self.enabled = enabled
+        self.memory = OrderedDict()  # key -> audio
+        self.memory_used = 0
+        self.disk = OrderedDict()  # key -> (path, size), least recently used first
+        self.disk_used = 0
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+        }
+        if self.enabled:
+            self._load_index()
+
+    def _load_index(self):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                key, suffix = os.path.splitext(name)
+                if suffix not in SUFFIXES.values():
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, key, path, stat.st_size))
+        except OSError as e:
+            print(f"TTS cache directory {self.cache_dir} is not usable, caching in memory only: {e}")
+            self.disk_bytes = 0
+            return
+
+        for _, key, path, size in sorted(entries):
+            self.disk[key] = (path, size)
+            self.disk_used += size
+        self._remove_files(self._evict_disk())
+
+    @staticmethod
+    def make_key(model: str, language: str, voice: str, text: str) -> str:
+        payload = "\x00".join((model, language, voice, normalize_phrase(text)))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def cacheable(self, text: str) -> bool:
+        return self.enabled and 0 < len(text) <= self.max_text_chars
+
+    async def get(self, key: str) -> Optional[Union[bytes, str]]:
+        audio = self.memory.get(key)
+        if audio is not None:
+            self.memory.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return audio
+
+        audio = await self._read_disk(key)
+        if audio is not None:
+            self._set_memory(key, audio)
+            self.stats["disk_hits"] += 1
+            return audio
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, audio: Union[bytes, str]):
+        if type(audio) not in SUFFIXES:
+            return
+        self._set_memory(key, audio)
+        await self._write_disk(key, audio)
+
+    def _set_memory(self, key: str, audio: Union[bytes, str]):
+        if key in self.memory:
+            self.memory_used -= len(self.memory.pop(key))
+        self.memory[key] = audio
+        self.memory_used += len(audio)
+        while self.memory_used > self.memory_bytes and self.memory:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_used -= len(evicted)
+            self.stats["memory_evictions"] += 1
+
+    def _locate_file(self, key: str):
+        """Find an entry written by another worker since the index was loaded. Runs in cache_executor."""
+        for suffix in SUFFIXES.values():
+            path = os.path.join(self.cache_dir, key + suffix)
+            try:
+                return path, os.path.getsize(path)
+            except OSError:
+                continue
+        return None
+
+    def _read_file(self, key: str, entry):
+        """Returns (path, size, data), or None if there is no file. Runs in cache_executor."""
+        entry = entry or self._locate_file(key)
+        if entry is None:
+            return None
+        path, size = entry
+        with open(path, "rb") as file:
+            data = file.read()
+        os.utime(path)  # Record the use for LRU order after a restart
+        return path, size, data
+
+    async def _read_disk(self, key: str) -> Optional[Union[bytes, str]]:
+        if not self.disk_bytes:
+            return None
+        entry = self.disk.get(key)
+        try:
+            found = await asyncio.get_running_loop().run_in_executor(cache_executor, self._read_file, key, entry)
+        except OSError as e:
+            # Removed by another worker; forget it
+            print(f"TTS cache read failed for {entry[0] if entry else key}: {e}")
+            if key in self.disk:
+                self._forget_disk(key)
+            return None
+        if found is None:
+            return None
+
+        path, size, data = found
+        if not data:
+            # Truncated, so it cannot be played; forget it
+            if key in self.disk:
+                self._forget_disk(key)
+            return None
+        if key not in self.disk:
+            self.disk[key] = (path, size)
+            self.disk_used += size
+        self.disk.move_to_end(key)
+        return data.decode("ascii") if path.endswith(SUFFIXES[str]) else data
+
+    @staticmethod
+    def _write_file(path: str, data: bytes):
+        """Runs in cache_executor."""
+        temp_path = f"{path}.{os.getpid()}.{id(data)}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(data)
+        # Readers never see a partly written file
+        os.replace(temp_path, path)
+
+    async def _write_disk(self, key: str, audio: Union[bytes, str]):
+        if not self.disk_bytes or key in self.disk:
+            return
+        data = audio.encode("ascii") if isinstance(audio, str) else audio
+        if len(data) > self.disk_bytes:
+            return
+
+        path = os.path.join(self.cache_dir, key + SUFFIXES[type(audio)])
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(cache_executor, self._write_file, path, data)
+        except OSError as e:
+            print(f"TTS cache write failed for {path}: {e}")
+            return
+
+        if key in self.disk:  # Written concurrently by another request for the same phrase
+            return
+        self.disk[key] = (path, len(data))
+        self.disk_used += len(data)
+        evicted = self._evict_disk()
+        if evicted:
+            await loop.run_in_executor(cache_executor, self._remove_files, evicted)
+
+    def _forget_disk(self, key: str):
+        path, size = self.disk.pop(key)
+        self.disk_used -= size
+        return path
+
+    def _evict_disk(self) -> list:
+        """Drop least recently used entries from the index until it fits; returns their paths to remove."""
+        evicted = []
+        while self.disk_used > self.disk_bytes and self.disk:
+            key = next(iter(self.disk))
+            evicted.append(self._forget_disk(key))
+            self.stats["disk_evictions"] += 1
+        return evicted
+
+    @staticmethod
+    def _remove_files(paths: list):
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def summary(self) -> dict:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": hits / total if total else 0.0,
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory_used,
+            "disk_entries": len(self.disk),
+            "disk_bytes": self.disk_used,
+        }
+
+
+tts_cache = TTSAudioCache()
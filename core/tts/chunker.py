@@ -0,0 +1,68 @@
+from dotenv import load_dotenv
+import re
+import os
+
+load_dotenv(dotenv_path="ops/.env")
+
+# Sentence ends, including the Devanagari danda and double danda
+SENTENCE_END = re.compile(r"(?<=[.!?।॥])\s+|\n+")
+# Clause boundaries used when a single sentence is too long
+CLAUSE_END = re.compile(r"(?<=[,;:—])\s+")
+
+
+def _split_long(piece: str, max_chars: int) -> list:
+    if len(piece) <= max_chars:
+        return [piece]
+
+    parts = []
+    current = ""
+    for clause in CLAUSE_END.split(piece):
+        # A clause with no punctuation inside is broken at the last space that fits
+        if len(clause) > max_chars and current:
+            parts.append(current)
+            current = ""
+        while len(clause) > max_chars:
+            cut = clause.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            parts.append(clause[:cut].strip())
+            clause = clause[cut:].strip()
+        if current and len(current) + 1 + len(clause) > max_chars:
+            parts.append(current)
+            current = clause
+        else:
+            current = f"{current} {clause}".strip()
+    if current:
+        parts.append(current)
+    return parts
+
+
+def split_for_synthesis(
+    text: str,
+    max_chars: int = int(os.getenv("TTS_CHUNK_MAX_CHARS", "200")),
+    min_chars: int = int(os.getenv("TTS_CHUNK_MIN_CHARS", "20")),
+) -> list:
+    """
+    Split text into pieces that can be synthesised on their own: sentences,
+    then clauses or words for sentences longer than max_chars. Pieces shorter
+    than min_chars are joined to the next one so very short fragments do not
+    come out with clipped prosody.
+    """
+    pieces = []
+    for sentence in SENTENCE_END.split(text):
+        sentence = sentence.strip()
+        if sentence:
+            pieces.extend(_split_long(sentence, max_chars))
+
+    chunks = []
+    pending = ""
+    for piece in pieces:
+        pending = f"{pending} {piece}".strip()
+        if len(pending) >= min_chars:
+            chunks.append(pending)
+            pending = ""
+    if pending:
+        if chunks and len(chunks[-1]) + 1 + len(pending) <= max_chars:
+            chunks[-1] = f"{chunks[-1]} {pending}"
+        else:
+            chunks.append(pending)
+    return chunks
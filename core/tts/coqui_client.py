@@ -1,17 +1,77 @@
 from TTS.api import TTS
 from core.utils.speech_utils import convert_audio_to_wav
+import numpy as np
 
 class CoquiTTS:
     def __init__(self, model_name: str = "tts_models/en/ljspeech/tacotron2-DDC", language: str="en"):
         self.tts = TTS(model_name=model_name)
         self.language = language
+        # Native output rate of the vocoder, e.g. 22050 Hz for the LJSpeech models
+        self.sample_rate = self.tts.synthesizer.output_sample_rate
+        self.batchable = self._supports_batching(model_name)
+
+    def _supports_batching(self, model_name: str) -> bool:
+        """
+        Only glow-tts takes a padded batch (x_lengths masks the padding).
+        Tacotron2 decodes autoregressively one utterance at a time, and a
+        vocoder at another sample rate needs per-utterance interpolation.
+        """
+        synthesizer = self.tts.synthesizer
+        if "glow-tts" not in model_name or synthesizer.vocoder_model is None:
+            return False
+        return synthesizer.vocoder_config["audio"]["sample_rate"] == synthesizer.tts_model.ap.sample_rate
 
     def speech(self, text: str) -> bytes:
         audio = self.tts.tts(
             text
         )
         if audio is not None:
-            wav_data = convert_audio_to_wav(audio)
+            wav_data = convert_audio_to_wav(audio, self.sample_rate)
         else:
             wav_data = None
-        return wav_data
\ No newline at end of file
+        return wav_data
+
+    def speech_batch(self, texts: list) -> list:
+        """Synthesise several utterances in one forward pass where the model allows it."""
+        if not self.batchable or len(texts) == 1:
+            return [self.speech(text) for text in texts]
+
+        import torch
+        from TTS.tts.utils.synthesis import trim_silence
+
+        synthesizer = self.tts.synthesizer
+        model = synthesizer.tts_model
+        ids = [model.tokenizer.text_to_ids(text) for text in texts]
+        lengths = [len(token_ids) for token_ids in ids]
+        x = torch.zeros(len(ids), max(lengths), dtype=torch.long)
+        for row, token_ids in enumerate(ids):
+            x[row, :len(token_ids)] = torch.tensor(token_ids, dtype=torch.long)
+
+        with torch.no_grad():
+            outputs = model.inference(x, aux_input={"x_lengths": torch.tensor(lengths), "d_vectors": None, "speaker_ids": None})
+            mels = outputs["model_outputs"].cpu().numpy()  # [B, T, C]
+            # Frames past an utterance's end attend to no input token
+            frame_counts = (outputs["alignments"].sum(dim=-1) > 0).sum(dim=-1).tolist()
+
+            vocoder_inputs = []
+            for mel, frames in zip(mels, frame_counts):
+                mel = model.ap.denormalize(mel[:frames].T).T
+                vocoder_inputs.append(synthesizer.vocoder_ap.normalize(mel.T))  # [C, T]
+            max_frames = max(frame_counts)
+            # Repeat the last frame as padding so the vocoder does not see a hard edge
+            batch = np.stack([
+                np.pad(mel, ((0, 0), (0, max_frames - mel.shape[1])), mode="edge") for mel in vocoder_inputs
+            ])
+            waveforms = synthesizer.vocoder_model.inference(torch.tensor(batch, dtype=torch.float32)).cpu().numpy()
+
+        hop_length = synthesizer.vocoder_ap.hop_length
+        results = []
+        for waveform, frames in zip(waveforms, frame_counts):
+            waveform = waveform.squeeze()[:frames * hop_length]
+            audio_config = synthesizer.tts_config.audio
+            if "do_trim_silence" in audio_config and audio_config["do_trim_silence"]:
+                waveform = trim_silence(waveform, model.ap)
+            # Same trailing pause Synthesizer.tts adds after each sentence
+            audio = list(waveform) + [0] * 10000
+            results.append(convert_audio_to_wav(audio, self.sample_rate))
+        return results
@@ -0,0 +1,144 @@
+from typing import Optional
+from dotenv import load_dotenv
+from core.tts.tts import TTS, TTS_MODELS
+from core.utils.executor_utils import executor
+import asyncio
+import time
+import os
+
+load_dotenv(dotenv_path="ops/.env")
+
+
+def _current_rss() -> Optional[int]:
+    """Resident memory of this process in bytes, where /proc is available."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def resolve_model_name(base_model: str, language: str) -> str:
+    """ai4bharat models are configured per language, e.g. ai4bharat -> ai4bharat-hi."""
+    if base_model.startswith("ai4bharat"):
+        return base_model + "-" + language
+    return base_model
+
+
+class TTSModelEntry:
+    def __init__(self, name: str, model: TTS, load_time: float, memory_bytes: Optional[int], concurrency: int):
+        self.name = name
+        self.model = model
+        self.load_time = load_time
+        self.memory_bytes = memory_bytes
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.concurrency = concurrency
+        self.requests = 0
+        self.batches = 0
+        self.active = 0
+        self.synthesis_time = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "load_time": self.load_time,
+            "memory_bytes": self.memory_bytes,
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "requests": self.requests,
+            "average_batch_size": self.requests / self.batches if self.batches else None,
+            "average_synthesis_time": self.synthesis_time / self.batches if self.batches else None,
+        }
+
+
+class TTSModelRegistry:
+    """
+    Process-wide cache of loaded TTS models. Each model is loaded once, at
+    startup for the names in TTS_PRELOAD_MODELS or on first use otherwise,
+    and then shared by every connection. Synthesis runs in the executor,
+    with at most `concurrency` calls per model at a time because Coqui
+    models are not safe to call from several threads at once. Remote models
+    (ai4bharat through Bhashini) are awaited on the event loop with a higher
+    limit, remote_concurrency.
+
+    Loads are serialised so the resident memory growth measured around a
+    load belongs to that model alone.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = int(os.getenv("TTS_MODEL_CONCURRENCY", "1")),
+        remote_concurrency: int = int(os.getenv("TTS_REMOTE_CONCURRENCY", "16")),
+        preload: str = os.getenv("TTS_PRELOAD_MODELS", ""),
+    ):
+        self.concurrency = concurrency
+        self.remote_concurrency = remote_concurrency
+        self.preload_models = [name.strip() for name in preload.split(",") if name.strip()]
+        self.entries = {}
+        self.load_lock = asyncio.Lock()
+
+    def _load(self, name: str, language: str) -> TTSModelEntry:
+        rss_before = _current_rss()
+        start_time = time.monotonic()
+        model = TTS(model_name=name, language=language)
+        load_time = time.monotonic() - start_time
+        rss_after = _current_rss()
+        memory_bytes = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+        print(f"Loaded TTS model {name} in {load_time:.2f} seconds")
+        # Remote APIs only wait on the network, so they can take many requests at once
+        concurrency = self.remote_concurrency if model.asynchronous else self.concurrency
+        return TTSModelEntry(name, model, load_time, memory_bytes, concurrency)
+
+    async def get(self, base_model: str, language: str) -> TTSModelEntry:
+        return await self._get(resolve_model_name(base_model, language), language)
+
+    async def _get(self, name: str, language: str) -> TTSModelEntry:
+        entry = self.entries.get(name)
+        if entry is not None:
+            return entry
+
+        async with self.load_lock:
+            # Another connection may have loaded it while we waited
+            if name not in self.entries:
+                self.entries[name] = await asyncio.get_running_loop().run_in_executor(
+                    executor, self._load, name, language
+                )
+        return self.entries[name]
+
+    async def preload(self):
+        """Load the models named in TTS_PRELOAD_MODELS, e.g. "coqui-tacotron2,ai4bharat-hi"."""
+        for name in self.preload_models:
+            # ai4bharat names end in their language; the Coqui models are English only
+            language = name.rsplit("-", 1)[-1] if name.startswith("ai4bharat-") else "en"
+            try:
+                await self._get(name, language)
+            except Exception as e:
+                print(f"Failed to preload TTS model {name}: {e}")
+
+    async def run(self, entry: TTSModelEntry, texts: list) -> list:
+        """Synthesise texts in one call on the model. The caller must hold entry.semaphore."""
+        entry.active += 1
+        start_time = time.monotonic()
+        try:
+            if entry.model.asynchronous:
+                return list(await asyncio.gather(*(entry.model.speech(text) for text in texts)))
+            return await asyncio.get_running_loop().run_in_executor(executor, entry.model.speech_batch, texts)
+        finally:
+            entry.active -= 1
+            entry.requests += len(texts)
+            entry.batches += 1
+            entry.synthesis_time += time.monotonic() - start_time
+
+    async def speech(self, text: str, base_model: str, language: str) -> bytes:
+        entry = await self.get(base_model, language)
+        async with entry.semaphore:
+            return (await self.run(entry, [text]))[0]
+
+    def stats(self) -> dict:
+        return {
+            "available": [model[0] for models in TTS_MODELS.values() for model in models],
+            "loaded": [entry.stats() for entry in self.entries.values()],
+        }
+
+
+tts_registry = TTSModelRegistry()
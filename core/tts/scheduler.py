@@ -0,0 +1,135 @@
+from collections import OrderedDict, deque
+from dotenv import load_dotenv
+from core.tts.registry import TTSModelEntry, tts_registry, resolve_model_name
+import asyncio
+import time
+import os
+
+load_dotenv(dotenv_path="ops/.env")
+
+
+class TTSRequest:
+    def __init__(self, text: str):
+        self.text = text
+        self.future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.monotonic()
+
+
+class TTSBatchScheduler:
+    """
+    Groups pending utterances for the same model into batches.
+
+    A batch is dispatched when it is full or when its oldest request has
+    waited max_wait seconds, whichever comes first. Requests are queued per
+    session and batches are filled round-robin, one request per session per
+    round, so a long streamed message cannot push out other users' short
+    replies. Models that cannot run a padded batch get batches of one, which
+    still keeps the fair ordering.
+
+    A model never has more than its registry concurrency of batches running
+    at once. While a batch runs, new requests gather for the next one.
+    """
+
+    def __init__(
+        self,
+        registry=tts_registry,
+        max_batch: int = int(os.getenv("TTS_BATCH_SIZE", "8")),
+        max_wait: float = float(os.getenv("TTS_BATCH_WAIT_MS", "20")) / 1000,
+        enabled: bool = os.getenv("TTS_BATCHING", "true").lower() == "true",
+    ):
+        self.registry = registry
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.enabled = enabled
+        self.queues = {}  # model name -> OrderedDict(session -> deque of TTSRequest)
+        self.wakeups = {}  # model name -> asyncio.Event set when a request arrives
+        self.workers = {}
+        self.in_flight = set()  # Keep references so running batches are not garbage collected
+
+    async def speech(self, text: str, base_model: str, language: str, session: str = None) -> bytes:
+        if not self.enabled:
+            return await self.registry.speech(text, base_model, language)
+
+        entry = await self.registry.get(base_model, language)
+        name = resolve_model_name(base_model, language)
+        if name not in self.queues:
+            self.queues[name] = OrderedDict()
+            self.wakeups[name] = asyncio.Event()
+        if name not in self.workers or self.workers[name].done():
+            self.workers[name] = asyncio.create_task(self._run(name, entry))
+
+        request = TTSRequest(text)
+        self.queues[name].setdefault(session, deque()).append(request)
+        self.wakeups[name].set()
+        return await request.future
+
+    def _pending(self, name: str) -> int:
+        return sum(len(requests) for requests in self.queues[name].values())
+
+    def _oldest(self, name: str) -> float:
+        return min(requests[0].enqueued_at for requests in self.queues[name].values())
+
+    def _take(self, name: str, max_batch: int) -> list:
+        queue = self.queues[name]
+        batch = []
+        while queue and len(batch) < max_batch:
+            for session in list(queue):
+                requests = queue[session]
+                request = requests.popleft()
+                if not requests:
+                    del queue[session]
+                else:
+                    # Sessions with more waiting go to the back for the next round and batch
+                    queue.move_to_end(session)
+                if not request.future.done():  # Skip callers that have gone away
+                    batch.append(request)
+                if len(batch) >= max_batch:
+                    break
+        return batch
+
+    async def _run(self, name: str, entry: TTSModelEntry):
+        wakeup = self.wakeups[name]
+        max_batch = self.max_batch if entry.model.batchable else 1
+        while True:
+            if not self.queues[name]:
+                wakeup.clear()
+                await wakeup.wait()
+                continue
+
+            # Wait for a full batch, but no longer than the oldest request may wait
+            while self._pending(name) < max_batch:
+                remaining = self.max_wait - (time.monotonic() - self._oldest(name))
+                if remaining <= 0:
+                    break
+                wakeup.clear()
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            await entry.semaphore.acquire()
+            batch = self._take(name, max_batch)
+            if not batch:
+                entry.semaphore.release()
+                continue
+            task = asyncio.create_task(self._process(entry, batch))
+            self.in_flight.add(task)
+            task.add_done_callback(self.in_flight.discard)
+
+    async def _process(self, entry: TTSModelEntry, batch: list):
+        try:
+            results = await self.registry.run(entry, [request.text for request in batch])
+        except Exception as e:
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+        finally:
+            entry.semaphore.release()
+
+        for request, audio in zip(batch, results):
+            if not request.future.done():
+                request.future.set_result(audio)
+
+
+tts_scheduler = TTSBatchScheduler()
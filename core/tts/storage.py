@@ -0,0 +1,113 @@
+from typing import Union
+from dotenv import load_dotenv
+from sqlmodel import select
+from core.models.db import SpeechDB
+from core.utils.codec_utils import codec_executor, encode_flac
+from core.utils.resample_utils import read_wav, float_to_pcm
+from core.utils.speech_utils import pcm_to_wav
+import numpy as np
+import asyncio
+import base64
+import pickle
+import io
+import os
+
+load_dotenv(dotenv_path="ops/.env")
+
+# flac (lossless, about half the size of PCM) or pcm_s16le (no encoder needed)
+SPEECH_STORAGE_CODEC = os.getenv("SPEECH_STORAGE_CODEC", "flac")
+
+# Codec recorded for rows written before audio was stored compactly
+LEGACY_CODEC = "legacy"
+
+
+def compact_speech(wav_data: Union[bytes, str], codec: str = SPEECH_STORAGE_CODEC) -> dict:
+    """
+    Convert TTS output (WAV bytes, or base64 WAV from ai4bharat) into the
+    stored form. Returns the SpeechDB audio, codec, sample_rate and duration
+    fields.
+    """
+    if isinstance(wav_data, str):
+        wav_data = base64.b64decode(wav_data)
+    samples, sample_rate = read_wav(wav_data)
+    pcm_data = float_to_pcm(samples)
+
+    if codec == "flac":
+        audio = encode_flac(pcm_data, sample_rate)
+    elif codec == "pcm_s16le":
+        audio = pcm_data
+    else:
+        raise ValueError(f"Unsupported speech storage codec: {codec}")
+
+    return {
+        "audio": audio,
+        "codec": codec,
+        "sample_rate": sample_rate,
+        "duration": len(samples) / sample_rate if sample_rate else 0.0,
+    }
+
+
+async def compact_speech_async(wav_data: Union[bytes, str]) -> dict:
+    return await asyncio.get_running_loop().run_in_executor(codec_executor, compact_speech, wav_data)
+
+
+def stored_speech_to_wav(audio: bytes, codec: str, sample_rate: int) -> bytes:
+    """Turn a stored SpeechDB audio value back into a playable WAV."""
+    if codec == "pcm_s16le":
+        return pcm_to_wav(audio, sample_rate)
+    if codec == "flac":
+        import av
+
+        pcm = bytearray()
+        with av.open(io.BytesIO(audio), mode="r", format="flac") as container:
+            for frame in container.decode(audio=0):
+                pcm.extend(frame.to_ndarray().tobytes())
+        return pcm_to_wav(bytes(pcm), sample_rate)
+    raise ValueError(f"Unsupported speech storage codec: {codec}")
+
+
+def _legacy_to_wav(audio: bytes) -> bytes:
+    """Legacy rows hold a WAV, possibly pickled; older ones a pickled list of float samples."""
+    if audio.startswith(b"\x80"):
+        audio = pickle.loads(audio)
+    if isinstance(audio, str):
+        audio = base64.b64decode(audio)
+    if isinstance(audio, (bytes, bytearray)):
+        return bytes(audio)
+    # A list of float samples at the synthesiser's rate, which was not recorded
+    legacy_rate = int(os.getenv("SPEECH_LEGACY_SAMPLE_RATE", "22050"))
+    return pcm_to_wav(float_to_pcm(np.asarray(audio, dtype=np.float32)), legacy_rate)
+
+
+async def migrate_speech_storage(session_factory, batch_size: int = 100) -> int:
+    """
+    Re-encode legacy speech rows into the compact format in batches. The
+    columns it fills are added by schema migration 2. Safe to run
+    repeatedly. Returns the number of rows converted.
+    """
+    converted = 0
+    last_id = 0
+    while True:
+        async with session_factory() as session:
+            rows = (await session.execute(
+                select(SpeechDB)
+                .where(SpeechDB.codec == LEGACY_CODEC, SpeechDB.id > last_id)
+                .order_by(SpeechDB.id)
+                .limit(batch_size)
+            )).scalars().all()
+            if not rows:
+                return converted
+
+            for row in rows:
+                last_id = row.id
+                try:
+                    stored = await compact_speech_async(_legacy_to_wav(row.audio))
+                except Exception as e:
+                    # Leave unreadable rows as they are rather than stopping the migration
+                    print(f"Could not convert speech row {row.id}: {e}")
+                    continue
+                for field, value in stored.items():
+                    setattr(row, field, value)
+                converted += 1
+            await session.commit()
+            print(f"Converted {converted} speech rows to {SPEECH_STORAGE_CODEC}")
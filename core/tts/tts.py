@@ -2,24 +2,32 @@ from core.tts.coqui_client import CoquiTTS
 from core.tts.ai4bharat_client import Ai4BharatTTS
 
 from typing import Tuple
+import asyncio
+
+TTS_MODELS = {
+    "ai4bharat": [
+        ("ai4bharat-en", "ai4bharat/indic-tts-coqui-misc-gpu--t4"),
+        ("ai4bharat-kn", "ai4bharat/indic-tts-coqui-dravidian-gpu--t4"),
+        ("ai4bharat-ml", "ai4bharat/indic-tts-coqui-dravidian-gpu--t4"),
+        ("ai4bharat-hi", "ai4bharat/indic-tts-coqui-indo_aryan-gpu--t4")
+    ],
+    "coqui": [
+        ("coqui-tacotron2", "tts_models/en/ljspeech/tacotron2-DDC"),
+        ("coqui-glow-tts", "tts_models/en/ljspeech/glow-tts"),
+        ("coqui-waveglow", "tts_models/en/ljspeech/waveglow"),
+    ]
+}
 
 class TTS:
+    """
+    One loaded TTS model. Loading is slow, so instances are created and
+    shared through core.tts.registry.tts_registry rather than per request.
+    """
+
     def __init__(self, model_name: str, language: str):
         self.model = model_name
         self.language = language
-        self.models = {
-            "ai4bharat": [
-                ("ai4bharat-en", "ai4bharat/indic-tts-coqui-misc-gpu--t4"),
-                ("ai4bharat-kn", "ai4bharat/indic-tts-coqui-dravidian-gpu--t4"),
-                ("ai4bharat-ml", "ai4bharat/indic-tts-coqui-dravidian-gpu--t4"),
-                ("ai4bharat-hi", "ai4bharat/indic-tts-coqui-indo_aryan-gpu--t4")
-            ],
-            "coqui": [
-                ("coqui-tacotron2", "tts_models/en/ljspeech/tacotron2-DDC"),
-                ("coqui-glow-tts", "tts_models/en/ljspeech/glow-tts"),
-                ("coqui-waveglow", "tts_models/en/ljspeech/waveglow"),
-            ]
-        }
+        self.models = TTS_MODELS
         self.loaded_model = self._load_model()
 
     def list_models(self):
@@ -46,6 +54,26 @@ class TTS:
             # Raise an exception if the model is not found
             raise ValueError(f"Model {self.model} not found in the available models")
 
+    @property
+    def sample_rate(self) -> int:
+        """Native output rate of the loaded model."""
+        return self.loaded_model.sample_rate
+
+    @property
+    def asynchronous(self) -> bool:
+        """Remote models are awaited on the event loop instead of running in the executor."""
+        return asyncio.iscoroutinefunction(self.loaded_model.speech)
+
+    @property
+    def batchable(self) -> bool:
+        """Whether speech_batch runs one padded forward pass instead of a loop."""
+        return getattr(self.loaded_model, "batchable", False)
+
+    def speech_batch(self, texts: list) -> list:
+        if hasattr(self.loaded_model, "speech_batch"):
+            return self.loaded_model.speech_batch(texts)
+        return [self.speech(text) for text in texts]
+
     def speech(self, text: str) -> bytes:
         if self.loaded_model:
             # Generate speech using the pre-loaded model
@@ -0,0 +1,252 @@
+from collections import OrderedDict
+from typing import Optional, Tuple
+from fastapi import WebSocket
+from starlette.requests import HTTPConnection
+from dotenv import load_dotenv
+from core.models.stt import AdmissionStatus
+from core.utils.jwt_utils import decode_access_cookie, JWT_SECRET_KEY, JWT_ALGORITHM
+import ipaddress
+import time
+import os
+
+load_dotenv(dotenv_path="ops/.env")
+
+# Addresses or networks of reverse proxies whose X-Forwarded-For is believed, comma separated
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(proxy.strip(), strict=False)
+    for proxy in os.getenv("ADMISSION_TRUSTED_PROXIES", "").split(",")
+    if proxy.strip()
+]
+
+# WebSocket close code for "try again later"
+OVERLOADED_CLOSE_CODE = 1013
+
+
+class TokenBucket:
+    """
+    Refills at rate tokens per second up to capacity. consume() may
+    overdraw, so work that was already done is always charged, and
+    available() stays False until the debt is paid back.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self) -> bool:
+        self._refill()
+        return self.tokens > 0
+
+    def consume(self, amount: float = 1.0):
+        self._refill()
+        self.tokens -= amount
+
+    def retry_after(self) -> float:
+        """Seconds until available() is True again."""
+        self._refill()
+        return 0.0 if self.tokens > 0 else -self.tokens / self.rate
+
+
+def create_bucket(rate: float, capacity: float) -> Optional[TokenBucket]:
+    """A rate of 0 or less turns the limit off."""
+    return TokenBucket(rate, capacity) if rate > 0 else None
+
+
+class Admission:
+    """A connection that was let in. Checks and charges its user's budgets and the global ones."""
+
+    def __init__(self, controller: "AdmissionController", key: str, audio: Optional[TokenBucket], llm: Optional[TokenBucket]):
+        self.controller = controller
+        self.key = key
+        self.audio_buckets = [bucket for bucket in (audio, controller.global_audio) if bucket]
+        self.llm_buckets = [bucket for bucket in (llm, controller.global_llm) if bucket]
+        self.released = False
+
+    def audio_allowed(self) -> bool:
+        if all(bucket.available() for bucket in self.audio_buckets):
+            return True
+        self.controller.stats["audio_limited"] += 1
+        return False
+
+    def audio_retry_after(self) -> float:
+        return max((bucket.retry_after() for bucket in self.audio_buckets), default=0.0)
+
+    def charge_audio(self, seconds: float):
+        for bucket in self.audio_buckets:
+            bucket.consume(seconds)
+
+    def llm_allowed(self) -> bool:
+        if all(bucket.available() for bucket in self.llm_buckets):
+            return True
+        self.controller.stats["llm_limited"] += 1
+        return False
+
+    def charge_llm_calls(self, calls: int):
+        for bucket in self.llm_buckets:
+            bucket.consume(calls)
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.controller._release(self.key)
+
+
+class AdmissionController:
+    """
+    Admission control for the WebSocket endpoints. A connection is only
+    accepted while the process has fewer than max_sessions connections
+    and its user fewer than max_sessions_per_user. There is no waiting
+    queue: a connection over a limit is turned away at once, so a client
+    can retry elsewhere or later.
+
+    Admitted connections draw on token buckets per user and for the
+    process as a whole. One bucket is for seconds of audio transcribed or
+    synthesised, the other for LLM calls. Handlers close a connection that
+    runs out of audio budget. A connection without LLM budget carries on
+    with raw transcription only until the budget refills. Budgets of
+    recently seen users outlive their connections, so reconnecting does
+    not reset them.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = int(os.getenv("ADMISSION_MAX_SESSIONS", "200")),
+        max_sessions_per_user: int = int(os.getenv("ADMISSION_MAX_SESSIONS_PER_USER", "4")),
+        audio_rate: float = float(os.getenv("ADMISSION_AUDIO_RATE", "1.5")),
+        audio_burst: float = float(os.getenv("ADMISSION_AUDIO_BURST", "60")),
+        global_audio_rate: float = float(os.getenv("ADMISSION_GLOBAL_AUDIO_RATE", "0")),
+        global_audio_burst: float = float(os.getenv("ADMISSION_GLOBAL_AUDIO_BURST", "600")),
+        llm_rate: float = float(os.getenv("ADMISSION_LLM_RATE", "1")),
+        llm_burst: float = float(os.getenv("ADMISSION_LLM_BURST", "10")),
+        global_llm_rate: float = float(os.getenv("ADMISSION_GLOBAL_LLM_RATE", "20")),
+        global_llm_burst: float = float(os.getenv("ADMISSION_GLOBAL_LLM_BURST", "40")),
+        max_tracked_users: int = int(os.getenv("ADMISSION_MAX_TRACKED_USERS", "10000")),
+    ):
+        self.max_sessions = max_sessions
+        self.max_sessions_per_user = max_sessions_per_user
+        self.audio_rate = audio_rate
+        self.audio_burst = audio_burst
+        self.llm_rate = llm_rate
+        self.llm_burst = llm_burst
+        self.max_tracked_users = max_tracked_users
+        self.global_audio = create_bucket(global_audio_rate, global_audio_burst)
+        self.global_llm = create_bucket(global_llm_rate, global_llm_burst)
+        self.active = 0
+        self.sessions = {}  # key -> open connections
+        self.budgets = OrderedDict()  # key -> (audio bucket, llm bucket), least recently used first
+        self.stats = {
+            "admitted": 0,
+            "rejected": 0,
+            "audio_limited": 0,
+            "llm_limited": 0,
+        }
+
+    def _budgets(self, key: str) -> tuple:
+        if key in self.budgets:
+            self.budgets.move_to_end(key)
+        else:
+            self.budgets[key] = (
+                create_bucket(self.audio_rate, self.audio_burst),
+                create_bucket(self.llm_rate, self.llm_burst),
+            )
+            while len(self.budgets) > self.max_tracked_users:
+                oldest = next(iter(self.budgets))
+                if oldest in self.sessions:
+                    # Still connected; keep it and stop evicting for now
+                    self.budgets.move_to_end(oldest)
+                    break
+                del self.budgets[oldest]
+        return self.budgets[key]
+
+    def admit(self, key: str) -> Optional[Admission]:
+        """An Admission for the connection, or None if a concurrency limit is reached."""
+        if self.active >= self.max_sessions or self.sessions.get(key, 0) >= self.max_sessions_per_user:
+            self.stats["rejected"] += 1
+            return None
+        self.active += 1
+        self.sessions[key] = self.sessions.get(key, 0) + 1
+        self.stats["admitted"] += 1
+        return Admission(self, key, *self._budgets(key))
+
+    def _release(self, key: str):
+        self.active -= 1
+        self.sessions[key] -= 1
+        if not self.sessions[key]:
+            del self.sessions[key]
+
+    def summary(self) -> dict:
+        return {**self.stats, "active": self.active, "users": len(self.sessions)}
+
+
+admission_controller = AdmissionController()
+
+
+def is_trusted_proxy(address: str, trusted_proxies: list) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted_proxies)
+
+
+def client_address(connection: HTTPConnection, trusted_proxies: list = TRUSTED_PROXIES) -> str:
+    """
+    The address of the client behind any trusted proxies. X-Forwarded-For
+    is only read when the peer is a trusted proxy, and only from the right
+    up to the first address that is not one, because everything further
+    left was sent by the client and could be anything.
+    """
+    address = connection.client.host if connection.client else "unknown"
+    if not is_trusted_proxy(address, trusted_proxies):
+        return address
+    forwarded = ",".join(connection.headers.getlist("x-forwarded-for"))
+    for hop in reversed([hop.strip() for hop in forwarded.split(",") if hop.strip()]):
+        address = hop
+        if not is_trusted_proxy(hop, trusted_proxies):
+            break
+    return address
+
+
+def connection_identity(connection: HTTPConnection) -> Tuple[Optional[str], str]:
+    """
+    The user id from a valid access_token cookie (None without one) and the
+    key the connection's quotas are kept under. Connections without a valid
+    cookie are limited by client address, because a user_id sent in a
+    message could be anything.
+    """
+    claims = None
+    if JWT_SECRET_KEY:
+        claims = decode_access_cookie(connection.cookies.get("access_token"), JWT_SECRET_KEY, JWT_ALGORITHM)
+    user_id = claims.get("user_id") if claims else None
+    if user_id:
+        return user_id, f"user:{user_id}"
+    return None, f"address:{client_address(connection)}"
+
+
+def session_key(authenticated_user_id: Optional[str], quota_key: str, user_id: str) -> str:
+    """
+    The key a user's unsaved session state is kept under. Without a valid
+    cookie the user_id sent by the client is only taken within the
+    connection's quota key, so it cannot reach another user's session.
+    """
+    if authenticated_user_id:
+        return authenticated_user_id
+    return f"{quota_key}/{user_id}"
+
+
+async def close_overloaded(websocket: WebSocket, reason: str, retry_after: float = None):
+    """Tell the client why, then close with 1013 (try again later)."""
+    try:
+        status = AdmissionStatus(status="overloaded", reason=reason, retry_after=retry_after)
+        await websocket.send_text(status.model_dump_json())
+        await websocket.close(code=OVERLOADED_CLOSE_CODE, reason=reason)
+    except Exception as e:
+        # The client may already be gone
+        print(f"Could not close overloaded connection: {e}")
@@ -0,0 +1,244 @@
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from core.utils.speech_utils import wav_to_pcm
+from core.utils.resample_utils import StreamingResampler, detect_sample_rate
+import numpy as np
+import threading
+import asyncio
+import queue
+import os
+import io
+
+load_dotenv(dotenv_path="ops/.env")
+
+# Short encode/decode jobs, e.g. one Opus packet or one FLAC upload
+codec_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("CODEC_WORKERS", "4")), thread_name_prefix="codec"
+)
+
+# Container streams (WebM/Ogg) keep a demuxer thread for the life of the session
+MAX_CONTAINER_STREAMS = int(os.getenv("CODEC_MAX_CONTAINER_STREAMS", "64"))
+container_executor = ThreadPoolExecutor(
+    max_workers=MAX_CONTAINER_STREAMS, thread_name_prefix="demux"
+)
+container_slots = threading.BoundedSemaphore(MAX_CONTAINER_STREAMS)
+
+# How long to wait for the demuxer to consume a chunk before returning what is decoded so far
+DEMUX_WAIT = float(os.getenv("CODEC_DEMUX_WAIT", "0.2"))
+# How long flush() waits for the demuxer to decode what is left of a stream
+DEMUX_FLUSH_WAIT = float(os.getenv("CODEC_DEMUX_FLUSH_WAIT", "1.0"))
+
+CONTAINER_FORMATS = {
+    "webm": "matroska",
+    "ogg": "ogg",
+}
+
+
+def _to_pcm(frames, resampler) -> bytes:
+    pcm = bytearray()
+    for frame in frames:
+        for resampled in resampler.resample(frame):
+            pcm.extend(resampled.to_ndarray().tobytes())
+    return bytes(pcm)
+
+
+def _resampler(sample_rate: int):
+    import av
+    return av.AudioResampler(format="s16", layout="mono", rate=sample_rate)
+
+
+class PcmDecoder:
+    """
+    Raw int16 PCM or WAV chunks, which need no codec, resampled from
+    input_rate to sample_rate. A WAV header on the first chunk overrides
+    input_rate; the format is detected once per stream.
+    """
+
+    def __init__(self, sample_rate: int = 16000, input_rate: int = 16000):
+        self.sample_rate = sample_rate
+        self.input_rate = input_rate
+        self.resampler = None
+
+    async def decode(self, chunk: bytes) -> bytes:
+        if self.resampler is None:
+            self.input_rate = detect_sample_rate(chunk) or self.input_rate
+            self.resampler = StreamingResampler(self.input_rate, self.sample_rate)
+        return self.resampler.process(wav_to_pcm(chunk))
+
+    async def flush(self) -> bytes:
+        return b""
+
+    def close(self):
+        pass
+
+
+class OpusPacketDecoder:
+    """One raw Opus packet per chunk, decoded to mono int16 PCM at sample_rate."""
+
+    def __init__(self, sample_rate: int = 16000):
+        import av
+
+        self.context = av.CodecContext.create("libopus", "r")
+        self.context.sample_rate = 48000
+        self.resampler = _resampler(sample_rate)
+        self.lock = threading.Lock()  # Packets must be decoded in order
+
+    def _decode(self, chunk: bytes) -> bytes:
+        import av
+
+        with self.lock:
+            return _to_pcm(self.context.decode(av.Packet(chunk)), self.resampler)
+
+    async def decode(self, chunk: bytes) -> bytes:
+        return await asyncio.get_running_loop().run_in_executor(codec_executor, self._decode, chunk)
+
+    async def flush(self) -> bytes:
+        return b""
+
+    def close(self):
+        pass
+
+
+class _ChunkPipe(io.RawIOBase):
+    """
+    Blocking, non-seekable file object fed from the event loop. The demuxer
+    thread reads from it as if it were a network stream.
+    """
+
+    def __init__(self):
+        self.chunks = queue.Queue()
+        self.pending = b""
+        self.starved = threading.Event()  # Set while the reader waits for more data
+        self.ended = False  # The demuxer may read again after the end of stream
+
+    def readable(self) -> bool:
+        return True
+
+    def feed(self, chunk):
+        self.starved.clear()
+        self.chunks.put(chunk)
+
+    def readinto(self, buffer) -> int:
+        if not self.pending:
+            if self.ended:
+                return 0
+            if self.chunks.empty():
+                self.starved.set()
+            chunk = self.chunks.get()
+            if chunk is None:
+                self.ended = True
+                return 0  # End of stream
+            self.pending = chunk
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+
+class ContainerDecoder:
+    """
+    Decodes a continuous WebM or Ogg stream, such as MediaRecorder output,
+    where only the first chunk carries the container header. Chunks go
+    through an in-memory pipe to a demuxer thread, so nothing is written to
+    disk and no ffmpeg process is started.
+    """
+
+    def __init__(self, codec: str, sample_rate: int = 16000):
+        if not container_slots.acquire(blocking=False):
+            raise RuntimeError(f"Too many concurrent {codec} streams ({MAX_CONTAINER_STREAMS})")
+        self.format = CONTAINER_FORMATS[codec]
+        self.sample_rate = sample_rate
+        self.pipe = _ChunkPipe()
+        self.pcm = bytearray()
+        self.lock = threading.Lock()
+        self.error = None
+        self.worker = container_executor.submit(self._run)
+
+    def _run(self):
+        import av
+
+        try:
+            container = av.open(
+                self.pipe,
+                mode="r",
+                format=self.format,
+                # Live input: do not wait for megabytes of data to probe the stream
+                options={"probesize": "4096", "analyzeduration": "0"},
+            )
+            resampler = _resampler(self.sample_rate)
+            for frame in container.decode(audio=0):
+                pcm = _to_pcm([frame], resampler)
+                with self.lock:
+                    self.pcm.extend(pcm)
+            # Samples the resampler still holds back
+            pcm = _to_pcm([None], resampler)
+            with self.lock:
+                self.pcm.extend(pcm)
+            container.close()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.pipe.starved.set()
+            container_slots.release()
+
+    def _take(self) -> bytes:
+        with self.lock:
+            pcm = bytes(self.pcm)
+            self.pcm.clear()
+        return pcm
+
+    async def decode(self, chunk: bytes) -> bytes:
+        if self.error is not None:
+            raise RuntimeError(f"{self.format} stream could not be decoded: {self.error}")
+        self.pipe.feed(chunk)
+        # Give the demuxer a moment to consume the chunk so its audio is returned now
+        await asyncio.get_running_loop().run_in_executor(None, self.pipe.starved.wait, DEMUX_WAIT)
+        return self._take()
+
+    async def flush(self) -> bytes:
+        """End the stream and return the audio not taken yet, including what the demuxer still held."""
+        self.pipe.feed(None)
+        try:
+            await asyncio.wait_for(asyncio.wrap_future(self.worker), DEMUX_FLUSH_WAIT)
+        except asyncio.TimeoutError:
+            print(f"{self.format} demuxer did not finish within {DEMUX_FLUSH_WAIT} seconds")
+        return self._take()
+
+    def close(self):
+        self.pipe.feed(None)
+
+
+def create_decoder(codec: str, sample_rate: int = 16000, input_rate: int = 16000):
+    """
+    Decoder from codec to mono int16 PCM at sample_rate. input_rate only
+    matters for raw PCM; compressed formats carry their own rate.
+    """
+    if codec in ("pcm_s16le", "wav"):
+        return PcmDecoder(sample_rate, input_rate)
+    if codec == "opus":
+        return OpusPacketDecoder(sample_rate)
+    if codec in CONTAINER_FORMATS:
+        return ContainerDecoder(codec, sample_rate)
+    raise ValueError(f"Unsupported audio codec: {codec}")
+
+
+def encode_flac(pcm_data, sample_rate: int = 16000) -> bytes:
+    """Encode mono int16 PCM as FLAC in memory. Accepts bytes or a memoryview."""
+    import av
+
+    output = io.BytesIO()
+    with av.open(output, mode="w", format="flac") as container:
+        stream = container.add_stream("flac", rate=sample_rate)
+        stream.layout = "mono"
+        samples = np.frombuffer(pcm_data, dtype=np.int16).reshape(1, -1)
+        frame = av.AudioFrame.from_ndarray(samples, format="s16", layout="mono")
+        frame.sample_rate = sample_rate
+        for packet in stream.encode(frame):
+            container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return output.getvalue()
+
+
+async def encode_flac_async(pcm_data, sample_rate: int = 16000) -> bytes:
+    return await asyncio.get_running_loop().run_in_executor(codec_executor, encode_flac, pcm_data, sample_rate)
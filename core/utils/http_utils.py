@@ -0,0 +1,25 @@
+from dotenv import load_dotenv
+import httpx
+import os
+
+load_dotenv(dotenv_path="ops/.env")
+
+
+def create_async_http_client(
+    max_connections: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")),
+    keepalive_expiry: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60")),
+    timeout: float = float(os.getenv("HTTP_TIMEOUT", "60")),
+) -> httpx.AsyncClient:
+    """
+    Build an httpx client whose connections stay open between requests.
+    Create one per upstream service and reuse it for the life of the process.
+    """
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        ),
+        timeout=timeout,
+    )
@@ -1,5 +1,28 @@
+from typing import Optional
 from fastapi import HTTPException, status
 from jose import JWTError, jwt
+from dotenv import load_dotenv
+import os
+
+load_dotenv(dotenv_path="ops/.env")
+
+# Shared by the user routes, which issue tokens, and everything that checks them
+JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
+JWT_ALGORITHM = "HS256"
+
+
+def decode_access_cookie(access_token: Optional[str], SECRET_KEY, ALGORITHM) -> Optional[dict]:
+    """
+    The claims of a 'Bearer <token>' cookie value, or None when it is
+    missing, malformed, expired or badly signed. Never raises, for callers
+    where a token is optional.
+    """
+    if not access_token or not access_token.startswith("Bearer "):
+        return None
+    try:
+        return jwt.decode(access_token.split(" ")[1], SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
 
 
 """
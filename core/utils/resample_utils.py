@@ -0,0 +1,219 @@
+from functools import lru_cache
+from math import gcd
+from typing import Optional, Tuple
+from dotenv import load_dotenv
+from core.utils.speech_utils import pcm_to_wav
+import numpy as np
+import struct
+import os
+
+load_dotenv(dotenv_path="ops/.env")
+
+# Filter length in zero crossings of the sinc on each side; longer is sharper and slower
+ZERO_CROSSINGS = int(os.getenv("RESAMPLE_ZERO_CROSSINGS", "10"))
+KAISER_BETA = float(os.getenv("RESAMPLE_KAISER_BETA", "5.0"))
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+@lru_cache(maxsize=32)
+def polyphase_filter(src_rate: int, dst_rate: int) -> Tuple[int, int, np.ndarray, int]:
+    """
+    Kaiser-windowed sinc low-pass filter for resampling by dst_rate/src_rate,
+    split into one row per polyphase branch. Returns (up, down, bank, delay),
+    where bank[p, k] is tap p + k * up and delay is the filter's group delay
+    in upsampled samples. Built once per rate pair.
+    """
+    divisor = gcd(src_rate, dst_rate)
+    up, down = dst_rate // divisor, src_rate // divisor
+
+    half_length = ZERO_CROSSINGS * max(up, down)
+    length = 2 * half_length + 1
+    cutoff = 1.0 / max(up, down)
+    n = np.arange(length) - half_length
+    taps = cutoff * np.sinc(cutoff * n) * np.kaiser(length, KAISER_BETA) * up
+
+    branch_length = -(-length // up)
+    padded = np.zeros(branch_length * up)
+    padded[:length] = taps
+    bank = padded.reshape(branch_length, up).T.astype(np.float32)
+    return up, down, np.ascontiguousarray(bank), half_length
+
+
+class StreamingResampler:
+    """
+    Resamples a stream of mono audio chunk by chunk. The filter history and
+    output phase carry over between chunks, so the result matches resampling
+    the whole stream at once. Equal rates pass through unchanged.
+    """
+
+    def __init__(self, src_rate: int, dst_rate: int):
+        self.src_rate = src_rate
+        self.dst_rate = dst_rate
+        if src_rate == dst_rate:
+            return
+
+        self.up, self.down, self.bank, self.delay = polyphase_filter(src_rate, dst_rate)
+        self.branch_length = self.bank.shape[1]
+        # Absolute input index of buffer[0]; the zeros stand in for audio before the stream started
+        self.offset = -(self.branch_length - 1)
+        self.buffer = np.zeros(self.branch_length - 1, dtype=np.float32)
+        self.consumed = 0  # Input samples received
+        self.produced = 0  # Output samples returned
+
+    @property
+    def passthrough(self) -> bool:
+        return self.src_rate == self.dst_rate
+
+    def _produce(self) -> np.ndarray:
+        end = self.offset + len(self.buffer)
+        # Output n sits at n * down + delay in the upsampled signal and needs input up to that point
+        available = -(-(end * self.up - self.delay) // self.down)
+        count = max(0, available - self.produced)
+        if count == 0:
+            return np.empty(0, dtype=np.float32)
+
+        t = (self.produced + np.arange(count)) * self.down + self.delay
+        base, phase = np.divmod(t, self.up)
+        indices = (base - self.offset)[:, None] - np.arange(self.branch_length)[None, :]
+        output = np.einsum("nk,nk->n", self.buffer[indices], self.bank[phase])
+        self.produced += count
+
+        # Keep only the history the next output needs
+        next_base = ((self.produced * self.down + self.delay) // self.up)
+        drop = next_base - (self.branch_length - 1) - self.offset
+        if drop > 0:
+            self.buffer = self.buffer[drop:]
+            self.offset += drop
+        return output
+
+    def process_float(self, samples: np.ndarray) -> np.ndarray:
+        """Resample float32 samples, returning the output that is complete so far."""
+        if self.passthrough:
+            return samples
+        self.buffer = np.concatenate((self.buffer, samples.astype(np.float32, copy=False)))
+        self.consumed += len(samples)
+        return self._produce()
+
+    def flush_float(self) -> np.ndarray:
+        """Return the output still held back by the filter delay."""
+        if self.passthrough:
+            return np.empty(0, dtype=np.float32)
+        remaining = -(-self.consumed * self.up // self.down) - self.produced
+        # Zeros past the end let the filter reach the last input samples
+        self.buffer = np.concatenate((self.buffer, np.zeros(self.branch_length, dtype=np.float32)))
+        return self._produce()[:max(0, remaining)]
+
+    def process(self, pcm_data) -> bytes:
+        """Resample mono int16 PCM (bytes or a memoryview)."""
+        if self.passthrough:
+            return bytes(pcm_data)
+        samples = np.frombuffer(pcm_data, dtype=np.int16).astype(np.float32) / 32768.0
+        return float_to_pcm(self.process_float(samples))
+
+    def flush(self) -> bytes:
+        if self.passthrough:
+            return b""
+        return float_to_pcm(self.flush_float())
+
+
+def float_to_pcm(samples: np.ndarray) -> bytes:
+    """Convert float samples in -1 to 1 to int16 PCM, clipping overshoot from the filter."""
+    return (np.clip(samples, -1.0, 1.0) * 32767).round().astype(np.int16).tobytes()
+
+
+def resample(samples: np.ndarray, src_rate: int, dst_rate: int) -> np.ndarray:
+    """Resample a complete float32 signal."""
+    if src_rate == dst_rate:
+        return samples
+    resampler = StreamingResampler(src_rate, dst_rate)
+    return np.concatenate((resampler.process_float(samples), resampler.flush_float()))
+
+
+def resample_pcm(pcm_data, src_rate: int, dst_rate: int) -> bytes:
+    """Resample complete mono int16 PCM."""
+    if src_rate == dst_rate:
+        return bytes(pcm_data)
+    samples = np.frombuffer(pcm_data, dtype=np.int16).astype(np.float32) / 32768.0
+    return float_to_pcm(resample(samples, src_rate, dst_rate))
+
+
+def detect_sample_rate(audio_data: bytes) -> Optional[int]:
+    """Sample rate from a WAV header, or None if the data is not WAV."""
+    try:
+        return read_wav_header(audio_data)[2]
+    except ValueError:
+        return None
+
+
+def read_wav_header(audio_data: bytes) -> Tuple[int, int, int, int, int, int]:
+    """
+    Parse a RIFF/WAVE header. Returns (format, channels, sample_rate,
+    bits_per_sample, data_offset, data_length). Handles the IEEE float and
+    extensible formats that the wave module rejects.
+    """
+    if len(audio_data) < 12 or audio_data[:4] != b"RIFF" or audio_data[8:12] != b"WAVE":
+        raise ValueError("Not a WAV file")
+
+    fmt = None
+    position = 12
+    while position + 8 <= len(audio_data):
+        chunk_id = audio_data[position:position + 4]
+        chunk_size = struct.unpack("<I", audio_data[position + 4:position + 8])[0]
+        body = position + 8
+        if chunk_id == b"fmt ":
+            audio_format, channels, sample_rate = struct.unpack("<HHI", audio_data[body:body + 8])
+            bits_per_sample = struct.unpack("<H", audio_data[body + 14:body + 16])[0]
+            if audio_format == WAVE_FORMAT_EXTENSIBLE and chunk_size >= 26:
+                # The real format is the first two bytes of the sub-format GUID
+                audio_format = struct.unpack("<H", audio_data[body + 24:body + 26])[0]
+            fmt = (audio_format, channels, sample_rate, bits_per_sample)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV data chunk before fmt chunk")
+            # Streamed WAVs often leave the size as 0 or 0xFFFFFFFF, so clamp to what is there
+            length = min(chunk_size, len(audio_data) - body)
+            return (*fmt, body, length)
+        position = body + chunk_size + (chunk_size & 1)
+    raise ValueError("WAV file has no data chunk")
+
+
+def read_wav(audio_data: bytes) -> Tuple[np.ndarray, int]:
+    """Decode a 16-bit PCM or 32-bit float WAV to mono float32 samples and its sample rate."""
+    audio_format, channels, sample_rate, bits_per_sample, offset, length = read_wav_header(audio_data)
+    data = audio_data[offset:offset + length]
+
+    if audio_format == WAVE_FORMAT_PCM and bits_per_sample == 16:
+        samples = np.frombuffer(data[:len(data) // 2 * 2], dtype="<i2").astype(np.float32) / 32768.0
+    elif audio_format == WAVE_FORMAT_IEEE_FLOAT and bits_per_sample == 32:
+        samples = np.frombuffer(data[:len(data) // 4 * 4], dtype="<f4").astype(np.float32)
+    else:
+        raise ValueError(f"Unsupported WAV format {audio_format} with {bits_per_sample} bits per sample")
+
+    if channels > 1:
+        samples = samples[:len(samples) // channels * channels].reshape(-1, channels).mean(axis=1)
+    return samples, sample_rate
+
+
+def normalize_wav(audio_data: bytes, sample_rate: int = 0) -> bytes:
+    """
+    Re-encode a WAV as mono 16-bit PCM at sample_rate. With sample_rate 0 the
+    audio is returned unchanged.
+    """
+    if not sample_rate:
+        return audio_data
+    samples, source_rate = read_wav(audio_data)
+    return pcm_to_wav(float_to_pcm(resample(samples, source_rate, sample_rate)), sample_rate)
+
+
+def normalize_pcm(audio_data: bytes, sample_rate: int, default_rate: int = 16000) -> bytes:
+    """
+    Mono int16 PCM at sample_rate from a complete WAV file or raw PCM. Raw
+    PCM carries no header and is taken to be at default_rate.
+    """
+    if audio_data.startswith(b"RIFF"):
+        samples, source_rate = read_wav(audio_data)
+        return float_to_pcm(resample(samples, source_rate, sample_rate))
+    return resample_pcm(audio_data, default_rate, sample_rate)
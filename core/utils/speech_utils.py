@@ -6,28 +6,43 @@ import base64
 import asyncio
 import io
 import os
-import subprocess
-import librosa
+from core.utils.vad_utils import frame_features
 
 def float32_to_int16(audio_array):
     """Scale float32 array to int16."""
     return np.int16(audio_array * 32767)
 
-def convert_audio_to_wav(audio_data: np.ndarray) -> bytes:
+def convert_audio_to_wav(audio_data: np.ndarray, sample_rate: int = 16000) -> bytes:
     """Convert float32 numpy array to int16 and create a WAV file in memory."""
     audio_int16 = float32_to_int16(np.array(audio_data, dtype=np.float32))
-    audio_bytes = audio_int16.tobytes()
-    
+    return pcm_to_wav(audio_int16.tobytes(), sample_rate)
+
+def pcm_to_wav(pcm_data: bytes, sample_rate: int = 16000) -> bytes:
+    """Wrap mono int16 PCM in a WAV container in memory."""
     wav_io = io.BytesIO()
     with wave.open(wav_io, 'wb') as wav_file:
         wav_file.setnchannels(1)
         wav_file.setsampwidth(2)  # 2 bytes per sample
-        wav_file.setframerate(16000)
-        wav_file.writeframes(audio_bytes)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm_data)
     
     wav_io.seek(0)
     return wav_io.read()
 
+def wav_to_pcm(audio_data: bytes) -> bytes:
+    """Return mono int16 PCM from a WAV chunk, or the data unchanged if it is already raw PCM."""
+    if not audio_data.startswith(b"RIFF"):
+        return audio_data
+
+    with wave.open(io.BytesIO(audio_data), 'rb') as wav_file:
+        channels = wav_file.getnchannels()
+        pcm_data = wav_file.readframes(wav_file.getnframes())
+
+    if channels > 1:
+        samples = np.frombuffer(pcm_data, dtype=np.int16).reshape((-1, channels))
+        pcm_data = samples.mean(axis=1).astype(np.int16).tobytes()
+    return pcm_data
+
 def encode_wav_to_base64(wav_data: bytes) -> str:
     """Encode WAV file to base64."""
     return base64.b64encode(wav_data).decode('utf-8')
@@ -42,6 +57,19 @@ async def handle_tts_request(text: str, executor: ThreadPoolExecutor, tts_method
     
     return ""
 
+def negotiate_audio_format(message: dict, codecs: list, sample_rates: list) -> dict:
+    """
+    Pick the codec and sample rate for a binary audio stream from a client's
+    "start" control message. Unsupported requests fall back to the first
+    supported value, and the client learns the result from the "ready" reply.
+    """
+    codec = message.get("codec", codecs[0])
+    sample_rate = message.get("sample_rate", sample_rates[0])
+    return {
+        "codec": codec if codec in codecs else codecs[0],
+        "sample_rate": sample_rate if sample_rate in sample_rates else sample_rates[0],
+    }
+
 def decode_audio_data(message: dict) -> bytes:
     """Decode the base64 audio data from the received message."""
     audio_base64 = message["audio"]
@@ -58,24 +86,6 @@ def save_audio_to_file(audio_buffer: io.BytesIO) -> str:
         wf.writeframes(audio_buffer.getvalue())
     return audio_filename
 
-def save_audio_to_m4a_ffmpeg(audio_buffer: io.BytesIO) -> str:
-    """Save the audio buffer to a temporary M4A file using FFmpeg."""
-    audio_filename = f"temp_{uuid.uuid4().hex}.m4a"
-
-    # Write the BytesIO buffer to a temporary WAV file
-    with open("temp.wav", "wb") as temp_wav:
-        temp_wav.write(audio_buffer.getvalue())
-
-    # Use FFmpeg to convert the WAV file to M4A
-    subprocess.run(["ffmpeg", "-i", "temp.wav", audio_filename, "-y"], check=True)
-
-    # Optionally, remove the temporary WAV file
-    if os.path.exists("temp_*.wav"):
-        os.remove("temp.wav")
-
-
-    return audio_filename
-
 def cleanup_audio_file(audio_filename: str):
     """Remove the temporary audio file."""
     os.remove(audio_filename)
@@ -89,24 +99,18 @@ def generate_message_id() -> str:
     return str(uuid.uuid4())
 
 
-def is_silent(audio_data: np.ndarray, energy_threshold: float = 0.02, silent_proportion_threshold: float = 0.75) -> bool:
-    # Convert audio data to float32 if it's not already
-    if audio_data.dtype != np.float32 and audio_data.dtype != np.float64:
+def is_silent(audio_data: np.ndarray, energy_threshold: float = 0.02, silent_proportion_threshold: float = 0.75, frame_length: int = 480) -> bool:
+    """Return True when most frames of the audio have an RMS below energy_threshold."""
+    # Accept raw int16 samples as well as normalised floats
+    if audio_data.dtype == np.int16:
+        audio_data = audio_data.astype(np.float32) / 32768.0
+    elif audio_data.dtype != np.float32 and audio_data.dtype != np.float64:
         audio_data = audio_data.astype(np.float32)
 
-    # Calculate STFT
-    try:
-        S = np.abs(librosa.stft(audio_data))
-    except Exception as e:
-        raise ValueError(f"STFT calculation failed: {e}")
-
-    # Calculate the energy of each frame
-    frame_energies = np.mean(S, axis=0)
+    rms, _ = frame_features(audio_data, frame_length)
+    if len(rms) == 0:
+        return True
 
     # Proportion of frames with energy below the threshold
-    low_energy_frames = np.sum(frame_energies < energy_threshold)
-    proportion_low_energy = low_energy_frames / len(frame_energies)
-
-    # Determine if the audio is mostly silent based on the proportion of low-energy frames
-    is_silent = proportion_low_energy >= silent_proportion_threshold or proportion_low_energy == 0.0
-    return is_silent
+    proportion_low_energy = np.count_nonzero(rms < energy_threshold) / len(rms)
+    return proportion_low_energy >= silent_proportion_threshold
@@ -0,0 +1,115 @@
+from dotenv import load_dotenv
+import numpy as np
+import os
+
+load_dotenv(dotenv_path="ops/.env")
+
+
+def frame_features(audio_data: np.ndarray, frame_length: int):
+    """
+    Split audio into non-overlapping frames and return per-frame RMS and
+    zero-crossing rate. Samples that do not fill a whole frame are ignored.
+    """
+    n_frames = len(audio_data) // frame_length
+    if n_frames == 0:
+        return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.float32)
+
+    # Reshaping a contiguous array is a view, so no copy is made per frame
+    frames = audio_data[:n_frames * frame_length].reshape(n_frames, frame_length)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (frame_length - 1)
+    return rms, zcr
+
+
+def pcm_to_float(pcm_data: bytes) -> np.ndarray:
+    """Interpret mono int16 PCM as float32 samples in the range -1 to 1."""
+    return np.frombuffer(pcm_data, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+class VoiceActivityDetector:
+    """
+    Streaming voice activity detector over mono int16 PCM.
+
+    A frame counts as speech when its RMS is above energy_threshold and its
+    zero-crossing rate is below zcr_threshold (which filters broadband hiss).
+    Speech starts after min_speech_ms of speech frames and ends after
+    hangover_ms of non-speech, so short gaps between words do not split an
+    utterance. State carries over between chunks of one session.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        frame_ms: int = int(os.getenv("VAD_FRAME_MS", "30")),
+        energy_threshold: float = float(os.getenv("VAD_ENERGY_THRESHOLD", "0.02")),
+        zcr_threshold: float = float(os.getenv("VAD_ZCR_THRESHOLD", "0.35")),
+        min_speech_ms: int = int(os.getenv("VAD_MIN_SPEECH_MS", "90")),
+        hangover_ms: int = int(os.getenv("VAD_HANGOVER_MS", "300")),
+    ):
+        self.sample_rate = sample_rate
+        self.frame_length = int(sample_rate * frame_ms / 1000)
+        self.frame_seconds = self.frame_length / sample_rate
+        self.energy_threshold = energy_threshold
+        self.zcr_threshold = zcr_threshold
+        self.min_speech_frames = max(1, round(min_speech_ms / frame_ms))
+        self.hangover_frames = max(1, round(hangover_ms / frame_ms))
+        self.reset()
+
+    def reset(self):
+        self.remainder = np.empty(0, dtype=np.float32)
+        self.in_speech = False
+        self.speech_run = 0  # Consecutive speech frames while not in speech
+        self.silence_run = 0  # Consecutive non-speech frames
+        self.frames_processed = 0
+        self.speech_frames = 0
+
+    @property
+    def position(self) -> float:
+        """Seconds of audio processed so far."""
+        return self.frames_processed * self.frame_seconds
+
+    @property
+    def trailing_silence(self) -> float:
+        """Seconds of non-speech at the end of the audio processed so far."""
+        return self.silence_run * self.frame_seconds
+
+    def classify(self, audio_data: np.ndarray) -> np.ndarray:
+        rms, zcr = frame_features(audio_data, self.frame_length)
+        return (rms >= self.energy_threshold) & (zcr <= self.zcr_threshold)
+
+    def process(self, pcm_data: bytes) -> list:
+        """
+        Feed int16 PCM and return the endpoints found in it as a list of
+        ("start" | "end", seconds) tuples, timed from the start of the session.
+        """
+        audio_data = pcm_to_float(pcm_data)
+        if len(self.remainder):
+            audio_data = np.concatenate((self.remainder, audio_data))
+
+        usable = len(audio_data) - len(audio_data) % self.frame_length
+        self.remainder = audio_data[usable:]
+        is_speech = self.classify(audio_data[:usable])
+
+        events = []
+        for index, speech in enumerate(is_speech):
+            frame = self.frames_processed + index
+            if speech:
+                self.silence_run = 0
+                self.speech_frames += 1
+                if not self.in_speech:
+                    self.speech_run += 1
+                    if self.speech_run >= self.min_speech_frames:
+                        self.in_speech = True
+                        start = frame - self.speech_run + 1
+                        events.append(("start", start * self.frame_seconds))
+            else:
+                self.silence_run += 1
+                self.speech_run = 0
+                if self.in_speech and self.silence_run >= self.hangover_frames:
+                    self.in_speech = False
+                    end = frame - self.silence_run + 1
+                    events.append(("end", end * self.frame_seconds))
+
+        self.frames_processed += len(is_speech)
+        return events
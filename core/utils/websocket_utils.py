@@ -0,0 +1,13 @@
+from typing import Optional, Tuple
+from fastapi import WebSocket, WebSocketDisconnect
+
+
+async def receive_frame(websocket: WebSocket) -> Tuple[Optional[str], Optional[bytes]]:
+    """
+    Receive the next frame, text or binary. Returns (text, None) for text
+    frames and (None, data) for binary frames.
+    """
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    return message.get("text"), message.get("bytes")
@@ -1,9 +1,17 @@
 from fastapi import FastAPI
-from core.db.init_db import init_db, shutdown_db
-from core.db.database import init_db, shutdown
-from fastapi.responses import FileResponse
+from core.db.database import init_db, check_ready, shutdown, async_session, schema_ready
+from fastapi.responses import FileResponse, JSONResponse
 from core.api import stt, tts, user, language
+from core.tts.registry import tts_registry
+from core.tts.storage import migrate_speech_storage
+from core.db.writer import db_writer
+from core.llm.cache import llm_cache
+from core.llm.llm import llm_router
+from core.stt.whisper_client import whisper_batcher
+from core.utils.admission_utils import admission_controller
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
+import os
 
 app = FastAPI()
 
@@ -37,12 +45,48 @@ async def get():
 def is_alive():
     return {"status": "alive"}
 
+@app.get("/is-ready")
+async def is_ready():
+    # Ready once migrations have run and the database answers; used by load balancers
+    if not schema_ready.is_set():
+        return JSONResponse(status_code=503, content={"status": "starting", "reason": "schema not ready"})
+    if not await check_ready():
+        return JSONResponse(status_code=503, content={"status": "unavailable"})
+    return {"status": "ready"}
+
+@app.get("/stats")
+def get_stats():
+    # Counters for this worker process only
+    return {
+        "llm_cache": llm_cache.summary(),
+        "llm_router": llm_router.summary(),
+        "admission": admission_controller.summary(),
+        "db_writer": db_writer.stats,
+        "whisper": whisper_batcher.throughput(),
+    }
+
+async def prepare_database():
+    try:
+        await init_db()
+        if os.getenv("SPEECH_MIGRATE_ON_STARTUP", "false").lower() == "true":
+            # Re-encode speech rows stored before the compact format
+            await migrate_speech_storage(async_session)
+    except Exception as e:
+        # Keep serving; /is-ready stays 503 and database routes answer 503
+        print(f"Database preparation failed: {e}")
+
 @app.on_event("startup")
 async def on_startup():
-    await init_db(3)
+    # The database may still be starting, so wait for it in the background instead of holding up startup
+    app.state.database_task = asyncio.create_task(prepare_database())
+    await tts_registry.preload()
+    db_writer.start()
 
 @app.on_event("shutdown")
 async def on_shutdown():
+    app.state.database_task.cancel()
+    # Write queued history before the engine is disposed
+    await db_writer.stop()
     await shutdown()
 
 
@@ -0,0 +1,123 @@
+import asyncio
+import httpx
+import pytest
+from core.tts.bhashini_api import Bhashini, BhashiniError
+
+ULCA_URL = "https://ulca.test"
+CONFIG_PATH = "/pipeline/config"
+INFERENCE_URL = "https://dhruva.test/inference"
+
+PIPELINE_CONFIG = {
+    "pipelineResponseConfig": [
+        {"config": []},
+        {"config": [{"language": {"sourceLanguage": "hi", "targetLanguage": "en"}, "serviceId": "nmt-hi-en"}]},
+        {"config": [{"language": {"sourceLanguage": "hi"}, "serviceId": "tts-hi"}]},
+    ],
+    "pipelineInferenceAPIEndPoint": {
+        "callbackUrl": INFERENCE_URL,
+        "inferenceApiKey": {"value": "inference-key"},
+    },
+}
+
+TTS_RESPONSE = {"pipelineResponse": [{"audio": [{"audioContent": "UklGRg=="}]}]}
+
+
+class MockBhashiniServer:
+    """
+    Answers the pipeline-config and inference endpoints through an httpx
+    MockTransport. Entries in failures are used up one per request before
+    normal answers resume: a status code to return, or a transport
+    exception class to raise.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.failures = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if self.failures:
+            failure = self.failures.pop(0)
+            if isinstance(failure, int):
+                return httpx.Response(failure)
+            raise failure("mock failure", request=request)
+        if request.url == ULCA_URL + CONFIG_PATH:
+            return httpx.Response(200, json=PIPELINE_CONFIG)
+        if request.url == INFERENCE_URL:
+            return httpx.Response(200, json=TTS_RESPONSE)
+        return httpx.Response(404)
+
+    def paths(self) -> list:
+        return [request.url.path for request in self.requests]
+
+
+@pytest.fixture
+def mock_bhashini(monkeypatch):
+    server = MockBhashiniServer()
+    monkeypatch.setattr(Bhashini, "client", httpx.AsyncClient(transport=httpx.MockTransport(server.handle)))
+    monkeypatch.setattr(Bhashini, "configLock", asyncio.Lock())
+    monkeypatch.setattr(Bhashini, "config", None)
+    monkeypatch.setattr(Bhashini, "configFetchedAt", 0.0)
+    monkeypatch.setattr(Bhashini, "ulcaBaseURL", ULCA_URL)
+    monkeypatch.setattr(Bhashini, "modelPipelineEndpoint", CONFIG_PATH)
+    monkeypatch.setattr(Bhashini, "userId", "test-user")
+    monkeypatch.setattr(Bhashini, "ulcaApiKey", "ulca-key")
+    monkeypatch.setattr(Bhashini, "maxRetries", 2)
+    monkeypatch.setattr(Bhashini, "backoffBase", 0.0)
+    return server
+
+
+def test_text_to_speech_fetches_config_once(mock_bhashini):
+    async def synthesise_twice():
+        client = Bhashini()
+        first = await client.textToSpeech("tts-hi", "namaste", "hi")
+        second = await client.textToSpeech("tts-hi", "dhanyavaad", "hi")
+        return first, second
+
+    first, second = asyncio.run(synthesise_twice())
+
+    assert first == second == TTS_RESPONSE
+    assert mock_bhashini.paths() == [CONFIG_PATH, "/inference", "/inference"]
+    assert mock_bhashini.requests[1].headers["Authorization"] == "inference-key"
+    assert Bhashini.config["ttsConfigs"] == {"hi": "tts-hi"}
+
+
+def test_overloaded_responses_are_retried(mock_bhashini):
+    mock_bhashini.failures = [503, 429]
+
+    response = asyncio.run(Bhashini().textToSpeech("tts-hi", "namaste", "hi"))
+
+    assert response == TTS_RESPONSE
+    assert mock_bhashini.paths() == [CONFIG_PATH, CONFIG_PATH, CONFIG_PATH, "/inference"]
+
+
+def test_timeouts_give_up_after_max_retries(mock_bhashini):
+    mock_bhashini.failures = [httpx.ReadTimeout] * 3
+
+    with pytest.raises(BhashiniError):
+        asyncio.run(Bhashini().textToSpeech("tts-hi", "namaste", "hi"))
+
+    assert mock_bhashini.paths() == [CONFIG_PATH] * 3
+
+
+def test_client_errors_are_not_retried(mock_bhashini):
+    mock_bhashini.failures = [400]
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(Bhashini().textToSpeech("tts-hi", "namaste", "hi"))
+
+    assert mock_bhashini.paths() == [CONFIG_PATH]
+
+
+def test_failed_refresh_keeps_the_cached_config(mock_bhashini, monkeypatch):
+    async def refresh_after_expiry():
+        client = Bhashini()
+        await client.getConfig()
+        monkeypatch.setattr(Bhashini, "configFetchedAt", -Bhashini.configTtl)
+        mock_bhashini.failures = [httpx.ConnectTimeout] * 3
+        return await client.textToSpeech("tts-hi", "namaste", "hi")
+
+    response = asyncio.run(refresh_after_expiry())
+
+    assert response == TTS_RESPONSE
+    assert mock_bhashini.paths() == [CONFIG_PATH] * 4 + ["/inference"]
@@ -0,0 +1,169 @@
+import asyncio
+import contextlib
+import http
+import json
+import pytest
+import websockets
+from core.stt.bodhi_pool import BodhiConnectionPool
+from core.stt.bodhi_client import BodhiSTT
+
+
+class FakeBodhiServer:
+    """
+    Local stand-in for the Bodhi streaming endpoint. Each connection sends a
+    config message, then audio; every audio frame is answered with a partial
+    transcript and {"eof": 1} with a final one. refuse is the number of
+    upcoming handshakes to reject with 503, and drop() closes every open
+    connection as a server restart would.
+    """
+
+    def __init__(self):
+        self.configs = []
+        self.connections = set()
+        self.refuse = 0
+        self.handshakes = 0
+        self.final_reply = True
+
+    async def process_request(self, path, headers):
+        self.handshakes += 1
+        if self.refuse:
+            self.refuse -= 1
+            return http.HTTPStatus.SERVICE_UNAVAILABLE, [], b"busy"
+        return None
+
+    async def handle(self, websocket, path=None):
+        self.connections.add(websocket)
+        try:
+            self.configs.append(json.loads(await websocket.recv())["config"])
+            words = 0
+            async for message in websocket:
+                if message == '{"eof": 1}':
+                    if self.final_reply:
+                        await websocket.send(json.dumps({"segment_id": 0, "text": "hello world", "eos": True}))
+                    continue
+                words += 1
+                await websocket.send(json.dumps({"segment_id": 0, "text": "hello" if words == 1 else "hello world"}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.connections.discard(websocket)
+
+    async def drop(self):
+        for websocket in list(self.connections):
+            await websocket.close()
+
+
+@contextlib.asynccontextmanager
+async def running(server: FakeBodhiServer, **options):
+    async with websockets.serve(server.handle, "127.0.0.1", 0, process_request=server.process_request) as listener:
+        port = listener.sockets[0].getsockname()[1]
+        pool = BodhiConnectionPool(
+            server_addr=f"ws://127.0.0.1:{port}",
+            **{"acquire_timeout": 0.1, "connect_timeout": 1, "backoff_base": 0.01, **options},
+        )
+        try:
+            yield pool
+        finally:
+            await pool.close_all()
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setenv("BODHI_API_KEY", "test-key")
+    monkeypatch.setenv("BODHI_CUSTOMER_ID", "test-customer")
+    return FakeBodhiServer()
+
+
+def test_acquire_waits_for_a_free_slot_then_times_out(server):
+    async def run():
+        async with running(server, max_connections=1) as pool:
+            first = await pool.acquire("hi-general-v2-8khz", 8000)
+            with pytest.raises(RuntimeError):
+                await pool.acquire("hi-general-v2-8khz", 8000)
+
+            # Released slots are handed out again
+            await pool.release(first)
+            second = await pool.acquire("hi-general-v2-8khz", 8000)
+            return len(pool.active), second.closed
+
+    assert asyncio.run(run()) == (1, False)
+    assert [config["sample_rate"] for config in server.configs] == [8000, 8000]
+
+
+def test_ensure_healthy_reconnects_a_dropped_stream(server):
+    async def run():
+        async with running(server) as pool:
+            stream = await pool.acquire("hi-general-v2-8khz", 8000)
+            await server.drop()
+            for _ in range(100):
+                if stream.closed:
+                    break
+                await asyncio.sleep(0.01)
+            dropped = stream.closed
+            await pool.ensure_healthy(stream)
+            return dropped, stream.closed
+
+    assert asyncio.run(run()) == (True, False)
+    # The reconnected stream starts a new transaction
+    assert len(server.configs) == 2
+    assert server.configs[0]["transaction_id"] != server.configs[1]["transaction_id"]
+
+
+def test_refused_connections_are_retried_with_backoff(server):
+    server.refuse = 2
+
+    async def run():
+        async with running(server, max_retries=3) as pool:
+            stream = await pool.acquire("hi-general-v2-8khz", 8000)
+            return stream.closed
+
+    assert asyncio.run(run()) is False
+    assert server.handshakes == 3
+
+
+def test_giving_up_on_a_connection_frees_its_slot(server):
+    server.refuse = 2
+
+    async def run():
+        async with running(server, max_connections=1, max_retries=1) as pool:
+            with pytest.raises(websockets.WebSocketException):
+                await pool.acquire("hi-general-v2-8khz", 8000)
+            # The failed attempt must not keep the only slot
+            stream = await pool.acquire("hi-general-v2-8khz", 8000)
+            return stream.closed
+
+    assert asyncio.run(run()) is False
+    assert server.handshakes == 3
+
+
+def test_close_collects_the_final_result(server):
+    async def run():
+        async with running(server) as pool:
+            stt = BodhiSTT(pool=pool)
+            partials = [text async for text in stt.transcribe_stream(memoryview(bytes(3200)), chunk_size=1600)]
+            # Results arrive between frames; wait for both, then take them without blocking
+            for _ in range(100):
+                if stt.stream.responses.qsize() >= 2:
+                    break
+                await asyncio.sleep(0.01)
+            partials += stt.poll()
+            return partials, await stt.close(), len(pool.active)
+
+    partials, final, active = asyncio.run(run())
+
+    assert "".join(partials) == "hello world"
+    assert final == ["<EOF>"]
+    assert active == 0
+
+
+def test_close_reports_a_missing_final_result(server, capsys):
+    server.final_reply = False
+
+    async def run():
+        async with running(server, connect_timeout=0.1) as pool:
+            stt = BodhiSTT(pool=pool)
+            await stt._ensure_stream()
+            return await stt.close(), len(pool.active)
+
+    assert asyncio.run(run()) == ([], 0)
+    assert "no final result" in capsys.readouterr().out
@@ -0,0 +1,55 @@
+from core.stt.session import TranscriptionSession
+
+
+def make_session(emitted: str = "") -> TranscriptionSession:
+    # _merge only needs the alignment state, so skip the provider and decoder setup
+    session = TranscriptionSession.__new__(TranscriptionSession)
+    session.emitted_words = emitted.split()
+    session.held_back = []
+    return session
+
+
+def merge(session: TranscriptionSession, hypothesis: str) -> str:
+    return session._merge(hypothesis, overlap_fraction=0.0, release=True)
+
+
+def test_exact_overlap_is_skipped():
+    session = make_session("she sells sea shells by the")
+
+    assert merge(session, "by the sea shore") == "sea shore"
+
+
+def test_word_cut_at_the_boundary_is_replaced():
+    # The previous window ended mid-word, so "fo" was heard instead of "fox"
+    session = make_session("the quick brown fo")
+
+    assert merge(session, "quick brown fox jumps over") == "jumps over"
+
+
+def test_no_overlap_keeps_every_word():
+    session = make_session("good morning everyone")
+
+    assert merge(session, "today we will talk") == "today we will talk"
+
+
+def test_repeated_function_word_does_not_drop_a_word():
+    # "the" lines up with the emitted "the" by position only; "cat" must survive
+    session = make_session("the dog")
+
+    assert merge(session, "the cat ran") == "the cat ran"
+
+
+def test_exact_short_overlap_wins_over_a_longer_one_with_a_mismatch():
+    # Three words with one mismatch would also line up, but would swallow "wait"
+    session = make_session("she said no no no")
+
+    assert merge(session, "no no wait") == "wait"
+
+
+def test_overlap_words_are_held_back_until_confirmed():
+    session = make_session("hello")
+
+    assert session._merge("hello there my friend", overlap_fraction=0.5, release=False) == "there"
+    assert session.held_back == ["my", "friend"]
+    # Held-back words are sent once the next window hears them again
+    assert merge(session, "my friend how are you") == "my friend how are you"
@@ -0,0 +1,130 @@
+import asyncio
+import pytest
+from core.ai import text
+from core.llm.cache import LLMResultCache
+
+
+class FakeCalls:
+    """
+    Stands in for the three LLM calls of speculative processing. Each call
+    waits until release(name) is called, and the calls that were cancelled
+    are recorded.
+    """
+
+    def __init__(self, decision=True):
+        self.decision = decision
+        self.released = {}
+        self.started = set()
+        self.cancelled = set()
+
+    async def _call(self, name: str, result):
+        self.started.add(name)
+        try:
+            await self._event(name).wait()
+        except asyncio.CancelledError:
+            self.cancelled.add(name)
+            raise
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _event(self, name: str) -> asyncio.Event:
+        if name not in self.released:
+            self.released[name] = asyncio.Event()
+        return self.released[name]
+
+    def release(self, *names: str):
+        for name in names:
+            self._event(name).set()
+
+    def install(self, monkeypatch, concise="short", highlight="**marked**"):
+        async def should_summarize(transcription, language):
+            return await self._call("decision", self.decision)
+
+        async def concise_transcription(transcription, language):
+            return await self._call("concise", concise)
+
+        async def highlight_keywords(transcription, language):
+            return await self._call("highlight", highlight)
+
+        monkeypatch.setattr(text, "should_summarize", should_summarize)
+        monkeypatch.setattr(text, "concise_transcription", concise_transcription)
+        monkeypatch.setattr(text, "highlight_keywords", highlight_keywords)
+
+
+@pytest.fixture
+def fake_calls(monkeypatch):
+    calls = FakeCalls()
+    calls.install(monkeypatch)
+    return calls
+
+
+def test_speculative_keeps_the_chosen_branch(fake_calls):
+    async def run():
+        task = asyncio.create_task(text.process_transcription_speculative("hello", "en"))
+        await asyncio.sleep(0.01)
+        fake_calls.release("decision")
+        await asyncio.sleep(0.01)
+        fake_calls.release("concise")
+        return await task
+
+    assert asyncio.run(run()) == {"text": "short", "type": "concise"}
+    assert fake_calls.started == {"decision", "concise", "highlight"}
+    assert fake_calls.cancelled == {"highlight"}
+
+
+def test_cancelling_speculative_cancels_every_call(fake_calls):
+    async def run():
+        task = asyncio.create_task(text.process_transcription_speculative("hello", "en"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # Checked before asyncio.run cancels whatever is left
+        await asyncio.sleep(0.01)
+        return set(fake_calls.cancelled)
+
+    assert asyncio.run(run()) == {"decision", "concise", "highlight"}
+
+    assert fake_calls.started == {"decision", "concise", "highlight"}
+    assert fake_calls.cancelled == {"decision", "concise", "highlight"}
+
+
+def test_failed_decision_cancels_both_branches(monkeypatch):
+    calls = FakeCalls(decision=RuntimeError("provider down"))
+    calls.install(monkeypatch)
+
+    async def run():
+        task = asyncio.create_task(text.process_transcription_speculative("hello", "en"))
+        await asyncio.sleep(0.01)
+        calls.release("decision")
+        with pytest.raises(RuntimeError):
+            await task
+        await asyncio.sleep(0.01)
+        return set(calls.cancelled)
+
+    assert asyncio.run(run()) == {"concise", "highlight"}
+
+
+def test_fallbacks_and_cache_hits_are_charged_as_made(monkeypatch):
+    async def combined(transcription, language):
+        raise RuntimeError("malformed response")
+
+    async def sequential(transcription, language):
+        return {"text": "short", "type": "concise"}
+
+    monkeypatch.setattr(text, "llm_cache", LLMResultCache(redis=None))
+    monkeypatch.setattr(text, "process_transcription_combined", combined)
+    monkeypatch.setattr(text, "process_transcription_sequential", sequential)
+    charges = []
+
+    async def run():
+        first = await text.process_transcription("hello there", "en", "combined", charge=charges.append)
+        second = await text.process_transcription("hello there", "en", "combined", charge=charges.append)
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first == second == {"text": "short", "type": "concise"}
+    # One call for the combined prompt and two for the sequential fallback; the cache hit is free
+    assert charges == [1, 2]
@@ -0,0 +1,156 @@
+import asyncio
+import os
+import pytest
+from typing import Optional
+from sqlalchemy import select, func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel, Field
+
+# core.db.database builds its engine on import
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+
+from core.db.database import schema_ready  # noqa: E402
+from core.db.writer import PersistenceWriter  # noqa: E402
+
+
+class WriterNote(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    text: str = Field(nullable=False)
+
+
+class GatedSessions:
+    """
+    Session factory over a test database. Sessions are handed out only while
+    open is set, and the first failures sessions raise OperationalError, as
+    if the database were restarting.
+    """
+
+    def __init__(self, session_factory, failures: int = 0):
+        self.session_factory = session_factory
+        self.failures = failures
+        self.open = asyncio.Event()
+        self.open.set()
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        await self.open.wait()
+        if self.failures:
+            self.failures -= 1
+            raise OperationalError("INSERT", {}, Exception("database is restarting"))
+        self.session = self.session_factory()
+        return await self.session.__aenter__()
+
+    async def __aexit__(self, *exc_info):
+        return await self.session.__aexit__(*exc_info)
+
+
+@pytest.fixture
+def database(tmp_path):
+    schema_ready.set()
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'history.db'}")
+
+    async def create():
+        async with engine.begin() as connection:
+            await connection.run_sync(WriterNote.__table__.create)
+
+    asyncio.run(create())
+    return sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def count_notes(session_factory) -> int:
+    async with session_factory() as session:
+        return (await session.execute(select(func.count()).select_from(WriterNote))).scalar_one()
+
+
+def notes(count: int, start: int = 0) -> list:
+    return [WriterNote(text=f"note {index}") for index in range(start, start + count)]
+
+
+def test_flushes_when_the_batch_is_full(database):
+    async def run():
+        writer = PersistenceWriter(session_factory=database, batch_size=3, flush_interval=60)
+        await writer.put_many(notes(3))
+        await asyncio.wait_for(writer.queue.join(), timeout=2)
+        written = await count_notes(database)
+        await writer.stop()
+        return written, writer.stats
+
+    written, stats = asyncio.run(run())
+
+    assert written == 3
+    assert stats["flushes"] == 1
+
+
+def test_flushes_after_the_interval(database):
+    async def run():
+        writer = PersistenceWriter(session_factory=database, batch_size=100, flush_interval=0.05)
+        await writer.put_many(notes(2))
+        await asyncio.sleep(0.02)
+        early = await count_notes(database)
+        await asyncio.wait_for(writer.queue.join(), timeout=2)
+        late = await count_notes(database)
+        await writer.stop()
+        return early, late
+
+    assert asyncio.run(run()) == (0, 2)
+
+
+def test_a_full_queue_makes_producers_wait(database):
+    async def run():
+        sessions = GatedSessions(database)
+        sessions.open.clear()
+        writer = PersistenceWriter(session_factory=sessions, max_queue=2, batch_size=1, flush_interval=0)
+        # The worker takes one record and waits for the database; two more fill the queue
+        await writer.put_many(notes(3))
+        blocked = asyncio.create_task(writer.put(WriterNote(text="waiting")))
+        await asyncio.sleep(0.05)
+        was_blocked = not blocked.done()
+        sessions.open.set()
+        await asyncio.wait_for(blocked, timeout=2)
+        await asyncio.wait_for(writer.queue.join(), timeout=2)
+        written = await count_notes(database)
+        await writer.stop()
+        return was_blocked, written
+
+    assert asyncio.run(run()) == (True, 4)
+
+
+def test_transient_errors_are_retried(database):
+    async def run():
+        writer = PersistenceWriter(
+            session_factory=GatedSessions(database, failures=2), batch_size=5, flush_interval=0.01, backoff_base=0
+        )
+        await writer.put_many(notes(5))
+        await asyncio.wait_for(writer.queue.join(), timeout=2)
+        written = await count_notes(database)
+        await writer.stop()
+        return written, writer.stats
+
+    written, stats = asyncio.run(run())
+
+    assert written == 5
+    assert stats["retries"] == 2
+    assert stats["dropped"] == 0
+
+
+def test_a_bad_record_is_dropped_alone(database):
+    async def run():
+        writer = PersistenceWriter(session_factory=database, batch_size=8, flush_interval=0.01, backoff_base=0)
+        # text is NOT NULL, so this record can never be written
+        batch = notes(3) + [WriterNote.model_construct(text=None)] + notes(4, start=3)
+        await writer.put_many(batch)
+        await asyncio.wait_for(writer.queue.join(), timeout=2)
+        written = await count_notes(database)
+        await writer.stop()
+        return written, writer.stats
+
+    written, stats = asyncio.run(run())
+
+    assert written == 7
+    assert stats["written"] == 7
+    assert stats["dropped"] == stats["rejected"] == 1
+    assert stats["retries"] == 0